@@ -0,0 +1,114 @@
+"""Benchmark: per-element vs. batched DOM extraction of reel fields.
+
+Renders a synthetic reel modal in headless Chromium and runs both extraction
+paths against it, reporting browser round trips and latency per reel.
+
+    python benchmarks/bench_dom_extract.py [--iterations 50] [--noise 200]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from playwright.async_api import async_playwright
+
+from scraper.dom_extract import extract_fields_batched, extract_fields_per_element
+
+FIELDS = ["caption", "posted_at", "likes", "video_view_count", "comments"]
+
+
+def build_reel_html(noise: int) -> str:
+    """A reel modal whose matching elements sit behind ``noise`` decoy spans."""
+    decoys = "".join(f'<div dir="auto"><span>tag{i}</span></div>' for i in range(noise))
+    return f"""
+    <html><body>
+      <article>
+        {decoys}
+        <div dir="auto"><span>An evening walk along the harbour with friends #sunset</span></div>
+        <section role="tablist"></section>
+        <div>
+          <button aria-label="like"><span>1.2K</span></button>
+          <button aria-label="comment"><span>87</span></button>
+        </div>
+        <div role="button"><span>34,567 views</span></div>
+        <time datetime="2024-05-01T12:34:56.000Z" title="May 1, 2024"></time>
+      </article>
+    </body></html>
+    """
+
+
+class RoundTripCounter:
+    """Wraps a page/element handle and counts awaited browser calls."""
+
+    CALLS = ("query_selector_all", "text_content", "get_attribute", "evaluate")
+
+    def __init__(self, target, counter=None):
+        self._target = target
+        self._counter = counter if counter is not None else {"calls": 0}
+
+    @property
+    def calls(self) -> int:
+        return self._counter["calls"]
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name not in self.CALLS:
+            return attr
+
+        async def wrapper(*args, **kwargs):
+            self._counter["calls"] += 1
+            result = await attr(*args, **kwargs)
+            if isinstance(result, list):
+                return [RoundTripCounter(item, self._counter) for item in result]
+            return result
+
+        return wrapper
+
+
+async def measure(page, extractor, iterations: int):
+    latencies = []
+    round_trips = []
+    result = None
+    for _ in range(iterations):
+        counted = RoundTripCounter(page)
+        started = time.perf_counter()
+        result = await extractor(counted, FIELDS)
+        latencies.append((time.perf_counter() - started) * 1000)
+        round_trips.append(counted.calls)
+    return result, latencies, round_trips
+
+
+async def main(iterations: int, noise: int) -> None:
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(build_reel_html(noise))
+
+        rows = []
+        outputs = {}
+        for name, extractor in (("per-element", extract_fields_per_element), ("batched", extract_fields_batched)):
+            result, latencies, round_trips = await measure(page, extractor, iterations)
+            outputs[name] = result
+            rows.append((name, statistics.mean(round_trips), statistics.median(latencies), max(latencies)))
+
+        await browser.close()
+
+    print(f"{'path':<12} {'round trips':>12} {'median ms':>10} {'max ms':>8}")
+    for name, trips, median, worst in rows:
+        print(f"{name:<12} {trips:>12.0f} {median:>10.2f} {worst:>8.2f}")
+    baseline, batched = rows
+    print(f"round-trip reduction: {baseline[1] / batched[1]:.0f}x, latency reduction: {baseline[2] / batched[2]:.1f}x")
+    if outputs["per-element"] != outputs["batched"]:
+        print("WARNING: extraction results differ:", outputs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--noise", type=int, default=200, help="decoy elements matched by fallback selectors")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.noise))
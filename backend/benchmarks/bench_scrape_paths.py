@@ -0,0 +1,232 @@
+"""Benchmark: scraper hot paths against saved Instagram page fixtures.
+
+Serves the fixtures in ``benchmarks/fixtures`` from a local HTTP server and
+drives the real scraper functions in headless Chromium, without an Instagram
+account:
+
+- ``grid``: first-reel detection and click on a profile and a hashtag grid
+- ``details``: ``scrape_reel_details`` per reel, DOM-only and with the API collector
+- ``next``: ``navigate_to_next_reel`` per reel
+
+For each it reports per-reel latency, browser round trips (awaited Playwright
+calls), HTTP requests to the server, Python allocation peak and Chromium JS
+heap growth. ``--json`` saves the report; ``--compare`` fails (exit 1) when
+a median latency or round-trip count regresses beyond ``--tolerance``.
+
+    python benchmarks/bench_scrape_paths.py [--reels 30] [--latency-ms 0] [--json out.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# キャッシュと待機を無効化し、抽出そのものを計測する
+os.environ.setdefault("REEL_CACHE", "0")
+os.environ.setdefault("POLITE_DELAY_MIN_SEC", "0")
+os.environ.setdefault("POLITE_DELAY_MAX_SEC", "0")
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from playwright.async_api import async_playwright
+
+from fixture_server import FixtureServer
+from scraper.fetch import navigate_to_next_reel, scrape_reel_details, scrape_user_reels_from_page
+from scraper.network import ReelResponseCollector
+
+COLUMNS = ["likes", "comments", "video_view_count"]
+
+
+class RoundTripCounter:
+    """Wraps a Playwright object and counts every awaited browser call.
+
+    Returned handles are wrapped too, so calls on elements found through the
+    page count towards the same total.
+    """
+
+    def __init__(self, target, counter=None):
+        self._target = target
+        self._counter = counter if counter is not None else {"calls": 0}
+
+    @property
+    def calls(self) -> int:
+        return self._counter["calls"]
+
+    def _wrap(self, value):
+        if isinstance(value, list):
+            return [self._wrap(item) for item in value]
+        if value is not None and type(value).__module__.startswith("playwright."):
+            return RoundTripCounter(value, self._counter)
+        return value
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def wrapper(*args, **kwargs):
+            self._counter["calls"] += 1
+            args = [arg._target if isinstance(arg, RoundTripCounter) else arg for arg in args]
+            return self._wrap(await attr(*args, **kwargs))
+
+        return wrapper
+
+
+async def js_heap_used(cdp) -> float:
+    metrics = await cdp.send("Performance.getMetrics")
+    return next((m["value"] for m in metrics["metrics"] if m["name"] == "JSHeapUsedSize"), 0.0)
+
+
+class Measurement:
+    """Latency, round trips and HTTP requests per iteration, plus memory for the phase."""
+
+    def __init__(self, name: str, server: FixtureServer, cdp):
+        self.name = name
+        self.server = server
+        self.cdp = cdp
+        self.latencies = []
+        self.round_trips = []
+        self.requests = []
+        self.failures = 0
+
+    async def __aenter__(self):
+        tracemalloc.start()
+        self.heap_before = await js_heap_used(self.cdp)
+        return self
+
+    async def __aexit__(self, *exc):
+        _, self.py_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.heap_delta = await js_heap_used(self.cdp) - self.heap_before
+
+    async def run(self, page, call):
+        """Time one call of ``call(counted_page)``; a falsy result counts as a failure."""
+        counted = RoundTripCounter(page)
+        self.server.reset_counts()
+        started = time.perf_counter()
+        result = await call(counted)
+        self.latencies.append((time.perf_counter() - started) * 1000)
+        self.round_trips.append(counted.calls)
+        self.requests.append(sum(self.server.requests.values()))
+        if not result:
+            self.failures += 1
+        return result
+
+    def report(self) -> dict:
+        return {
+            "name": self.name,
+            "iterations": len(self.latencies),
+            "failures": self.failures,
+            "median_ms": statistics.median(self.latencies),
+            "p95_ms": statistics.quantiles(self.latencies, n=20)[-1] if len(self.latencies) > 1 else self.latencies[0],
+            "round_trips": statistics.mean(self.round_trips),
+            "http_requests": statistics.mean(self.requests),
+            "py_peak_kib": self.py_peak / 1024,
+            "js_heap_delta_kib": self.heap_delta / 1024,
+        }
+
+
+async def bench_grid(page, server, cdp, iterations: int) -> list:
+    reports = []
+    for kind, path in (("grid-profile", "/benchuser/reels/"), ("grid-hashtag", "/explore/tags/bench/")):
+        async with Measurement(kind, server, cdp) as m:
+            for _ in range(iterations):
+                await page.goto(server.url(path))
+
+                async def detect(counted):
+                    # max_items=0 なら最初のリールを特定・クリックしたところで終わる
+                    await scrape_user_reels_from_page(counted, "benchuser", 0, COLUMNS)
+                    return "/reel/" in page.url
+
+                await m.run(page, detect)
+        reports.append(m.report())
+    return reports
+
+
+async def bench_details(page, server, cdp, reels: int) -> list:
+    reports = []
+    for name, collector in (("details-dom", None), ("details-api", ReelResponseCollector())):
+        if collector is not None:
+            collector.attach(page)
+        async with Measurement(name, server, cdp) as m:
+            for index in range(reels):
+                await page.goto(server.reel_url(index))
+                await m.run(page, lambda counted: scrape_reel_details(counted, "benchuser", COLUMNS, collector))
+        if collector is not None:
+            collector.detach(page)
+        reports.append(m.report())
+    return reports
+
+
+async def bench_next(page, server, cdp, reels: int) -> list:
+    await page.goto(server.reel_url(0))
+    async with Measurement("next-reel", server, cdp) as m:
+        for _ in range(reels - 1):
+            await m.run(page, navigate_to_next_reel)
+    return [m.report()]
+
+
+def print_reports(reports: list) -> None:
+    print(f"{'path':<14} {'n':>4} {'fail':>4} {'median ms':>10} {'p95 ms':>8} {'trips':>6} {'http':>5} {'py KiB':>8} {'heap KiB':>9}")
+    for r in reports:
+        print(
+            f"{r['name']:<14} {r['iterations']:>4} {r['failures']:>4} {r['median_ms']:>10.2f} {r['p95_ms']:>8.2f} "
+            f"{r['round_trips']:>6.1f} {r['http_requests']:>5.1f} {r['py_peak_kib']:>8.0f} {r['js_heap_delta_kib']:>9.0f}"
+        )
+
+
+def compare(reports: list, baseline_path: Path, tolerance: float) -> list:
+    """Regressions of median latency or round trips against a saved report."""
+    baseline = {r["name"]: r for r in json.loads(baseline_path.read_text(encoding="utf-8"))["reports"]}
+    regressions = []
+    for r in reports:
+        base = baseline.get(r["name"])
+        if not base:
+            continue
+        for key in ("median_ms", "round_trips"):
+            if base[key] and r[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{r['name']} {key}: {base[key]:.2f} -> {r[key]:.2f}")
+        if r["failures"] > base["failures"]:
+            regressions.append(f"{r['name']} failures: {base['failures']} -> {r['failures']}")
+    return regressions
+
+
+async def main(args) -> int:
+    with FixtureServer(reels=args.reels, latency_ms=args.latency_ms, noise=args.noise) as server:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            page = await browser.new_page()
+            cdp = await page.context.new_cdp_session(page)
+            await cdp.send("Performance.enable")
+
+            reports = []
+            reports += await bench_grid(page, server, cdp, args.grid_iterations)
+            reports += await bench_details(page, server, cdp, args.reels)
+            reports += await bench_next(page, server, cdp, args.reels)
+            await browser.close()
+
+    print_reports(reports)
+    if args.json:
+        Path(args.json).write_text(json.dumps({"reels": args.reels, "latency_ms": args.latency_ms, "reports": reports}, indent=2), encoding="utf-8")
+    if args.compare:
+        regressions = compare(reports, Path(args.compare), args.tolerance)
+        for line in regressions:
+            print("REGRESSION:", line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reels", type=int, default=30, help="reels in each fixture grid")
+    parser.add_argument("--grid-iterations", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every fixture response")
+    parser.add_argument("--noise", type=int, default=50, help="decoy elements in each reel modal")
+    parser.add_argument("--json", help="save the report to this file")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before failing")
+    sys.exit(asyncio.run(main(parser.parse_args())))
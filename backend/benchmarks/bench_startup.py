@@ -0,0 +1,170 @@
+"""Benchmark: API process startup (import cost and time to the first /health response).
+
+Runs each measurement in a fresh interpreter from an empty working
+directory, so no module is already cached:
+
+- ``import``: wall time of ``import main`` and the slowest imports by
+  cumulative time from ``python -X importtime``
+- ``heavy``: which of numpy, pyarrow, playwright and the scraper modules
+  ``import main`` loaded (they should load only when a job needs them)
+- ``first_response``: starting ``uvicorn main:app`` until ``/health`` answers
+
+``--json`` saves the report; ``--compare`` fails (exit 1) when a median time
+regresses beyond ``--tolerance`` or a heavy module is imported again.
+
+    python benchmarks/bench_startup.py [--iterations 5] [--role all] [--json out.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ["numpy", "pyarrow", "playwright", "scraper.fetch", "scraper.worker", "scraper.pool"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def backend_env(workdir: str, role: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(BACKEND_DIR), SCRAPER_ROLE=role)
+    # 計測用の作業ディレクトリにジョブDBと出力を置く
+    env.setdefault("JOB_DB_PATH", str(Path(workdir) / "jobs.sqlite3"))
+    env.setdefault("OUTPUT_DIR", str(Path(workdir) / "output"))
+    return env
+
+
+def parse_importtime(stderr: str, top: int) -> list:
+    """``(module, cumulative ms)`` of the slowest imports made directly by ``main``, from ``-X importtime`` output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # main の直下（インデント1段）だけを数える。さらに下のモジュールの時間は累計に含まれる
+        if not name.startswith("  ") or name.startswith("    "):
+            continue
+        imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+
+
+def bench_import(workdir: str, role: str, iterations: int, top: int) -> dict:
+    env = backend_env(workdir, role)
+    seconds, loaded = [], []
+    for _ in range(iterations):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=workdir, env=env, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        seconds.append(result["seconds"])
+        loaded = result["loaded"]
+    trace = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return {
+        "median_ms": statistics.median(seconds) * 1000,
+        "heavy_loaded": loaded,
+        "slowest_imports": parse_importtime(trace.stderr, top),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response(workdir: str, role: str, timeout_sec: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=backend_env(workdir, role),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout_sec:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as res:
+                    if res.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"/health did not answer within {timeout_sec:.0f}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def bench_first_response(workdir: str, role: str, iterations: int, timeout_sec: float) -> dict:
+    seconds = [time_to_first_response(workdir, role, timeout_sec) for _ in range(iterations)]
+    return {"median_ms": statistics.median(seconds) * 1000, "max_ms": max(seconds) * 1000}
+
+
+def print_report(report: dict) -> None:
+    print(f"role={report['role']}")
+    print(f"import main       {report['import']['median_ms']:>8.1f} ms")
+    print(f"first /health     {report['first_response']['median_ms']:>8.1f} ms (max {report['first_response']['max_ms']:.1f})")
+    print(f"heavy modules     {', '.join(report['import']['heavy_loaded']) or '-'}")
+    print("slowest imports (cumulative):")
+    for name, ms in report["import"]["slowest_imports"]:
+        print(f"  {ms:>8.1f} ms  {name}")
+
+
+def compare(report: dict, baseline_path: Path, tolerance: float) -> list:
+    """Regressions of median startup times or newly loaded heavy modules against a saved report."""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    regressions = []
+    for key in ("import", "first_response"):
+        base, current = baseline[key]["median_ms"], report[key]["median_ms"]
+        if base and current > base * (1 + tolerance):
+            regressions.append(f"{key} median_ms: {base:.1f} -> {current:.1f}")
+    added = sorted(set(report["import"]["heavy_loaded"]) - set(baseline["import"]["heavy_loaded"]))
+    if added:
+        regressions.append(f"heavy modules imported at startup: {', '.join(added)}")
+    return regressions
+
+
+def main(args) -> int:
+    with tempfile.TemporaryDirectory() as workdir:
+        report = {
+            "role": args.role,
+            "import": bench_import(workdir, args.role, args.iterations, args.top),
+            "first_response": bench_first_response(workdir, args.role, args.iterations, args.timeout_sec),
+        }
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        regressions = compare(report, Path(args.compare), args.tolerance)
+        for line in regressions:
+            print("REGRESSION:", line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--role", default="all", choices=["all", "api", "supervisor"], help="SCRAPER_ROLE of the measured process")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--timeout-sec", type=float, default=30.0)
+    parser.add_argument("--json", help="save the report to this file")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before failing")
+    sys.exit(main(parser.parse_args()))
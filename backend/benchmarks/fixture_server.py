@@ -0,0 +1,218 @@
+"""Local HTTP server for the saved Instagram page fixtures in ``fixtures/``.
+
+Serves profile reel grids (``/<user>/reels/``), hashtag grids
+(``/explore/tags/<tag>/``), reel modals (``/reel/<shortcode>/``) with a
+working Next button, and the matching ``/api/v1/media/<shortcode>/info/``
+and ``/graphql/query/`` JSON. Every reel is generated deterministically from its position, so runs
+are comparable. Requests are counted per kind for round-trip reporting.
+
+    with FixtureServer(reels=30) as server:
+        await page.goto(server.url("/benchuser/reels/"))
+"""
+
+import html
+import json
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# 固定リールの投稿日時の基準（1リールごとに1時間ずつ古くなる）
+BASE_TIMESTAMP = 1714560000
+
+ROUTES = (
+    ("reel", re.compile(r"^/reels?/([A-Za-z0-9_-]+)/?$")),
+    ("media_info", re.compile(r"^/api/v1/media/([A-Za-z0-9_-]+)/info/?$")),
+    ("graphql", re.compile(r"^/graphql/query/?$")),
+    ("hashtag", re.compile(r"^/explore/tags/([^/]+)(?:/reels)?/?$")),
+    ("profile", re.compile(r"^/([A-Za-z0-9_.]+)/reels/?$")),
+)
+
+
+def load_fixture(name: str) -> str:
+    return (FIXTURES_DIR / name).read_text(encoding="utf-8")
+
+
+def render(template: str, values: Dict, escape=html.escape, raw: Optional[Dict] = None) -> str:
+    """Fill ``{{name}}`` placeholders; ``raw`` values are inserted without escaping."""
+    raw = raw or {}
+
+    def replace(match):
+        name = match.group(1)
+        return raw[name] if name in raw else escape(str(values.get(name, "")))
+
+    return re.sub(r"\{\{(\w+)\}\}", replace, template)
+
+
+def json_escape(value: str) -> str:
+    return json.dumps(value, ensure_ascii=False)[1:-1]
+
+
+def shortcode_for(index: int) -> str:
+    return f"BENCH{index:05d}"
+
+
+def index_for(shortcode: str) -> Optional[int]:
+    match = re.fullmatch(r"BENCH(\d{5})", shortcode)
+    return int(match.group(1)) if match else None
+
+
+def reel_values(index: int, reels: int, owner: str = "benchuser") -> Dict:
+    """Field values of the reel at ``index``; the same for the HTML and the JSON."""
+    taken_at = BASE_TIMESTAMP - index * 3600
+    posted = datetime.fromtimestamp(taken_at, tz=timezone.utc)
+    likes = 1200 + index * 37
+    return {
+        "shortcode": shortcode_for(index),
+        "owner": owner,
+        "caption": f"Reel number {index} from the benchmark fixtures, an evening walk along the harbour #bench",
+        "posted_at": posted.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "posted_title": posted.strftime("%b %d, %Y"),
+        "taken_at": taken_at,
+        "like_count": likes,
+        "likes": f"{likes:,}",
+        "comment_count": 10 + index,
+        "comments": str(10 + index),
+        "play_count": 34567 + index * 1000,
+        "views": f"{34567 + index * 1000:,}",
+        "next": shortcode_for(index + 1) if index + 1 < reels else shortcode_for(index),
+        "next_hidden": "" if index + 1 < reels else "hidden",
+    }
+
+
+class FixtureServer:
+    """Serves the fixtures on ``127.0.0.1`` from a background thread.
+
+    ``latency_ms`` delays every response, to approximate a real network.
+    ``noise`` is the number of decoy caption elements in each reel modal.
+    """
+
+    def __init__(self, reels: int = 30, latency_ms: float = 0.0, noise: int = 50, port: int = 0):
+        self.reels = reels
+        self.latency_ms = latency_ms
+        self.noise = noise
+        self.requests: Counter = Counter()
+        self._templates = {
+            "profile": load_fixture("profile_reels.html"),
+            "hashtag": load_fixture("hashtag_reels.html"),
+            "grid_item": load_fixture("grid_item.html"),
+            "reel": load_fixture("reel.html"),
+            "media_info": load_fixture("media_info.json"),
+        }
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def reel_url(self, index: int) -> str:
+        return self.url(f"/reel/{shortcode_for(index)}/")
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def reset_counts(self) -> None:
+        self.requests.clear()
+
+    def delay_sec(self) -> float:
+        return self.latency_ms / 1000
+
+    def respond(self, path: str):
+        """``(status, content type, body)`` for ``path``."""
+        for kind, pattern in ROUTES:
+            match = pattern.match(path)
+            if match:
+                return getattr(self, f"_{kind}")(*match.groups())
+        return 404, "text/plain", "not found"
+
+    def handle(self, request, path: str):
+        """``(status, content type, body, extra headers)`` for a request."""
+        return (*self.respond(path), {})
+
+    def _grid(self, kind: str, name: str):
+        items = "".join(
+            render(self._templates["grid_item"], reel_values(i, self.reels)) for i in range(self.reels)
+        )
+        return 200, "text/html; charset=utf-8", render(self._templates[kind], {"name": name}, raw={"grid": items})
+
+    def _profile(self, name: str):
+        return self._grid("profile", name)
+
+    def _hashtag(self, name: str):
+        return self._grid("hashtag", name)
+
+    def _reel(self, shortcode: str):
+        index = index_for(shortcode)
+        if index is None or index >= self.reels:
+            return 404, "text/plain", "not found"
+        values = reel_values(index, self.reels)
+        decoys = "".join(f'      <div dir="auto"><span>tag{i}</span></div>\n' for i in range(self.noise))
+        return 200, "text/html; charset=utf-8", render(self._templates["reel"], values, raw={"noise": decoys})
+
+    def media_node(self, index: int) -> Dict:
+        """The reel at ``index`` as the media object of the saved API fixture."""
+        info = render(self._templates["media_info"], reel_values(index, self.reels), json_escape)
+        return json.loads(info)["items"][0]
+
+    def _graphql(self):
+        # リールグリッドの最初のページ（clips connection）に相当するレスポンス
+        edges = [{"node": {"media": self.media_node(i)}} for i in range(self.reels)]
+        payload = {"data": {"xdt_api__v1__clips__user__connection_v2": {"edges": edges, "page_info": {"has_next_page": False}}}, "status": "ok"}
+        return 200, "application/json", json.dumps(payload)
+
+    def _media_info(self, shortcode: str):
+        index = index_for(shortcode)
+        if index is None or index >= self.reels:
+            return 404, "application/json", '{"status": "fail"}'
+        return 200, "application/json", render(self._templates["media_info"], reel_values(index, self.reels), json_escape)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                kind = next((kind for kind, pattern in ROUTES if pattern.match(path)), "other")
+                server.requests[kind] += 1
+                delay = server.delay_sec()
+                if delay > 0:
+                    time.sleep(delay)
+                status, content_type, body, headers = server.handle(self, path)
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
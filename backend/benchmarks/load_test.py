@@ -0,0 +1,161 @@
+"""End-to-end load test of the FastAPI backend against the mock Instagram.
+
+Submits ``--jobs`` scrape jobs through ``POST /scrape``, follows them through
+``GET /progress/{job_id}`` until they finish and reports throughput, job
+latency and the outcome of every job, plus what the mock injected.
+
+By default everything runs in this process, isolated in a temporary working
+directory: a ``MockInstagram`` with the requested latency/errors/rate
+limits/challenges, and the app (with its lifespan, workers and browser
+pools) pointed at it through ``INSTAGRAM_BASE_URL``. With ``--api`` the jobs
+go to an already running backend instead.
+
+    python benchmarks/load_test.py --jobs 20 --users 3 --max-items 10 --latency-ms 50 --error-rate 0.02
+    python benchmarks/load_test.py --api http://127.0.0.1:8000 --jobs 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BACKEND_DIR))
+
+from mock_instagram import MockInstagram
+
+TERMINAL = ("done", "error")
+
+
+@asynccontextmanager
+async def in_process_backend(args):
+    """Start the mock and the app in this process; yields ``(client, mock)``."""
+    mock = MockInstagram(
+        reels=args.reels,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_per_min=args.rate_limit_per_min,
+        challenge_after=args.challenge_after,
+        seed=args.seed,
+    ).start()
+    workdir = tempfile.TemporaryDirectory(prefix="insta-load-")
+    # 設定は scraper の import 時に読まれるため、appを読み込む前に環境変数を設定する
+    os.environ.update({
+        "INSTAGRAM_BASE_URL": mock.base_url,
+        "INSTA_USER": "bench",
+        "INSTA_PASS": "bench",
+        "INSTA_ACCOUNTS": "",
+        "HEADLESS": "1",
+        "REEL_CACHE": "0",
+        # 結果も作業ディレクトリに書き出す（実際の backend/output の結果を保持期間の処理で消さないように）
+        "OUTPUT_DIR": str(Path(workdir.name) / "output"),
+    })
+    os.environ.setdefault("POLITE_DELAY_MIN_SEC", "0")
+    os.environ.setdefault("POLITE_DELAY_MAX_SEC", "0")
+    os.chdir(workdir.name)
+    # 対話的なログインを省くため、モックのセッションCookieを保存済みの状態として置く
+    Path("state").mkdir()
+    Path("state/insta_state.json").write_text(json.dumps(mock.storage_state("bench")), encoding="utf-8")
+
+    from main import app
+
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=30) as client:
+                yield client, mock
+    finally:
+        os.chdir(BACKEND_DIR)
+        mock.stop()
+        workdir.cleanup()
+
+
+@asynccontextmanager
+async def remote_backend(args):
+    async with httpx.AsyncClient(base_url=args.api, timeout=30) as client:
+        yield client, None
+
+
+async def run_job(client, index: int, args) -> dict:
+    payload = {
+        "usernames": [f"benchuser{(index + i) % args.users}" for i in range(args.targets)],
+        "hashtags": [],
+        "max_items": args.max_items,
+        "columns": ["likes", "comments", "video_view_count"],
+        "concurrency": args.concurrency,
+        "mode": args.mode,
+    }
+    submitted = time.perf_counter()
+    res = await client.post("/scrape", json=payload)
+    if res.status_code != 200:
+        return {"status": f"http {res.status_code}", "elapsed": time.perf_counter() - submitted, "rows": 0}
+    job_id = res.json()["job_id"]
+    while True:
+        await asyncio.sleep(args.poll_sec)
+        state = (await client.get(f"/progress/{job_id}")).json()
+        if state.get("status") in TERMINAL:
+            return {
+                "job_id": job_id,
+                "status": state["status"],
+                "message": state.get("message"),
+                "rows": state.get("rows", 0),
+                "elapsed": time.perf_counter() - submitted,
+            }
+        if time.perf_counter() - submitted > args.timeout_sec:
+            return {"job_id": job_id, "status": "timeout", "rows": state.get("rows", 0), "elapsed": time.perf_counter() - submitted}
+
+
+async def main(args) -> int:
+    backend = remote_backend(args) if args.api else in_process_backend(args)
+    async with backend as (client, mock):
+        started = time.perf_counter()
+        results = await asyncio.gather(*(run_job(client, i, args) for i in range(args.jobs)))
+        wall = time.perf_counter() - started
+        health = (await client.get("/health")).json()
+
+    statuses = {}
+    for result in results:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    elapsed = sorted(result["elapsed"] for result in results)
+    rows = sum(result["rows"] or 0 for result in results)
+    print(f"jobs: {args.jobs} in {wall:.1f}s ({args.jobs / wall * 60:.1f} jobs/min, {rows / wall:.2f} reels/s)")
+    print(f"job latency: median {statistics.median(elapsed):.1f}s, max {elapsed[-1]:.1f}s")
+    print("outcomes:", statuses)
+    for result in results:
+        if result["status"] != "done":
+            print(f"  {result.get('job_id', '-')}: {result['status']} {result.get('message') or ''}")
+    if mock is not None:
+        print("mock:", mock.stats())
+    print("health:", json.dumps(health.get("jobs")), json.dumps(health.get("browser_pools")))
+    return 0 if statuses.get("done", 0) >= args.jobs * args.min_success else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--api", help="URL of a running backend (default: run the app and the mock in-process)")
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--users", type=int, default=3, help="distinct mock profiles to scrape")
+    parser.add_argument("--targets", type=int, default=1, help="profiles per job")
+    parser.add_argument("--max-items", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--mode", default="sequential", choices=("sequential", "grid"))
+    parser.add_argument("--poll-sec", type=float, default=0.5)
+    parser.add_argument("--timeout-sec", type=float, default=600)
+    parser.add_argument("--min-success", type=float, default=1.0, help="fraction of jobs that must finish as done")
+    parser.add_argument("--reels", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-per-min", type=int, default=0)
+    parser.add_argument("--challenge-after", type=int, default=0)
+    parser.add_argument("--seed", type=int)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,207 @@
+"""Local Instagram stand-in for end-to-end load and failure-mode testing.
+
+Extends the fixture server with what a whole ``scrape_job`` needs: a login
+page matching the selectors of ``perform_login_flow``, a session cookie, a
+logged-in home page for ``verify_login_status``, and injectable trouble:
+
+- ``latency_ms`` / ``jitter_ms``: delay on every response
+- ``error_rate``: fraction of page and API requests answered with HTTP 500
+- ``rate_limit_per_min``: requests per session per minute before HTTP 429
+- ``challenge_after``: reel views per session before redirecting to ``/challenge/``
+
+Profiles named ``missing_*`` answer with the "page isn't available" 404 and
+profiles named ``private_*`` with the private-account page, for the
+terminal-state handling of scraper/navigation.py.
+
+Point the backend at it with ``INSTAGRAM_BASE_URL``:
+
+    python benchmarks/mock_instagram.py --port 8100 --latency-ms 80 --error-rate 0.02
+    INSTAGRAM_BASE_URL=http://127.0.0.1:8100 INSTA_USER=bench INSTA_PASS=bench python run.py
+"""
+
+import argparse
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from http.cookies import SimpleCookie
+from typing import Dict, Optional
+from urllib.parse import parse_qs, quote, urlparse
+
+from fixture_server import FixtureServer, load_fixture, render
+
+SESSION_COOKIE = "sessionid"
+SESSION_MAX_AGE_SEC = 90 * 24 * 3600
+
+# ログイン不要のパス
+PUBLIC_PATHS = ("/accounts/login/", "/challenge/", "/favicon.ico")
+
+
+class MockInstagram(FixtureServer):
+    """Fixture server with logins, sessions and injectable latency, errors, rate limits and challenges."""
+
+    def __init__(
+        self,
+        reels: int = 30,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_per_min: int = 0,
+        challenge_after: int = 0,
+        require_login: bool = True,
+        noise: int = 50,
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(reels=reels, latency_ms=latency_ms, noise=noise, port=port)
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_per_min = rate_limit_per_min
+        self.challenge_after = challenge_after
+        self.require_login = require_login
+        self.sessions: Dict[str, Dict] = {}
+        self.injected = {"errors": 0, "rate_limited": 0, "challenges": 0, "logins": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._templates.update({
+            "login": load_fixture("login.html"),
+            "home": load_fixture("home.html"),
+            "challenge": load_fixture("challenge.html"),
+            "unavailable": load_fixture("unavailable.html"),
+            "private": load_fixture("private.html"),
+        })
+
+    def delay_sec(self) -> float:
+        jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def stats(self) -> Dict:
+        return {"requests": dict(self.requests), "sessions": len(self.sessions), **self.injected}
+
+    def _session(self, request) -> Optional[Dict]:
+        cookie = SimpleCookie(request.headers.get("Cookie", ""))
+        token = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+        return self.sessions.get(token)
+
+    def _redirect(self, location: str, headers: Optional[Dict] = None):
+        return 302, "text/html; charset=utf-8", "", {"Location": location, **(headers or {})}
+
+    def _is_api(self, path: str) -> bool:
+        return path.startswith(("/api/", "/graphql/"))
+
+    def handle(self, request, path: str):
+        query = parse_qs(urlparse(request.path).query)
+        if path == "/accounts/login/":
+            values = {"next": query.get("next", ["/"])[0], "error": ""}
+            return 200, "text/html; charset=utf-8", render(self._templates["login"], values), {}
+        if path == "/accounts/login/ajax/" and request.command == "POST":
+            return self._login(request)
+        if path.startswith("/challenge/"):
+            return 200, "text/html; charset=utf-8", self._templates["challenge"], {}
+
+        session = self._session(request)
+        if self.require_login and session is None and not path.startswith(PUBLIC_PATHS):
+            if self._is_api(path):
+                return 401, "application/json", '{"message": "login_required", "status": "fail"}', {}
+            return self._redirect(f"/accounts/login/?next={quote(path)}")
+
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.injected["errors"] += 1
+                return 500, "text/html; charset=utf-8", "<html><body><h1>Sorry, something went wrong.</h1></body></html>", {}
+            if session is not None and self.rate_limit_per_min:
+                window = session["requests"]
+                now = time.monotonic()
+                while window and now - window[0] > 60:
+                    window.popleft()
+                if len(window) >= self.rate_limit_per_min:
+                    self.injected["rate_limited"] += 1
+                    return 429, "application/json", '{"message": "Please wait a few minutes before you try again.", "status": "fail"}', {"Retry-After": "60"}
+                window.append(now)
+            if session is not None and path.startswith(("/reel/", "/reels/")):
+                session["reels"] += 1
+                if self.challenge_after and session["reels"] > self.challenge_after:
+                    self.injected["challenges"] += 1
+                    return self._redirect(f"/challenge/?next={quote(path)}")
+
+        if path == "/":
+            values = {"username": session["username"] if session else "", "dialog_hidden": "" if session and session.pop("fresh", False) else "hidden"}
+            return 200, "text/html; charset=utf-8", render(self._templates["home"], values), {}
+        return super().handle(request, path)
+
+    def _profile(self, name: str):
+        if name.startswith("missing_"):
+            return 404, "text/html; charset=utf-8", self._templates["unavailable"]
+        if name.startswith("private_"):
+            return 200, "text/html; charset=utf-8", render(self._templates["private"], {"name": name})
+        return super()._profile(name)
+
+    def new_session(self, username: str, fresh: bool = False) -> str:
+        token = secrets.token_hex(16)
+        with self._lock:
+            self.sessions[token] = {"username": username, "reels": 0, "requests": deque(), "fresh": fresh}
+            self.injected["logins"] += 1
+        return token
+
+    def storage_state(self, username: str = "bench") -> Dict:
+        """A Playwright ``storage_state`` already logged in as ``username``.
+
+        Lets load tests skip the (headed) interactive login of scraper/login.py.
+        """
+        cookie = {
+            "name": SESSION_COOKIE,
+            "value": self.new_session(username),
+            "domain": urlparse(self.base_url).hostname,
+            "path": "/",
+            "expires": time.time() + SESSION_MAX_AGE_SEC,
+            "httpOnly": True,
+            "secure": False,
+            "sameSite": "Lax",
+        }
+        return {"cookies": [cookie], "origins": []}
+
+    def _login(self, request):
+        length = int(request.headers.get("Content-Length", "0") or 0)
+        form = parse_qs(request.rfile.read(length).decode("utf-8"))
+        username = form.get("username", [""])[0]
+        if not username or not form.get("password", [""])[0]:
+            values = {"next": "/", "error": "Sorry, your password was incorrect."}
+            return 200, "text/html; charset=utf-8", render(self._templates["login"], values), {}
+        token = self.new_session(username, fresh=True)
+        cookie = f"{SESSION_COOKIE}={token}; Path=/; Max-Age={SESSION_MAX_AGE_SEC}; HttpOnly"
+        # Instagramと同様、ログイン後はホームに戻して「ログイン情報を保存」ダイアログを出す
+        return self._redirect("/", {"Set-Cookie": cookie})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--reels", type=int, default=30, help="reels on every profile and hashtag grid")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-per-min", type=int, default=0, help="requests per session per minute before HTTP 429 (0: off)")
+    parser.add_argument("--challenge-after", type=int, default=0, help="reel views per session before a challenge (0: off)")
+    parser.add_argument("--no-login", action="store_true", help="serve every page without a session")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = MockInstagram(
+        reels=args.reels,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_per_min=args.rate_limit_per_min,
+        challenge_after=args.challenge_after,
+        require_login=not args.no_login,
+        port=args.port,
+        seed=args.seed,
+    ).start()
+    print(f"Mock Instagram at {server.base_url} (INSTAGRAM_BASE_URL={server.base_url})")
+    try:
+        while True:
+            time.sleep(10)
+            print(server.stats())
+    except KeyboardInterrupt:
+        server.stop()
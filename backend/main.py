@@ -1,16 +1,94 @@
+import os
 import uuid
+import json
 import asyncio
+import importlib
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from loguru import logger
 
-from scraper.fetch import scrape_job
+from scraper.accounts import ACCOUNT_POOL
+from scraper.csv_utils import iter_partial_csv, parts_dir_for
+from scraper.events import PROGRESS_EVENTS, is_terminal
+from scraper.export import DEFAULT_EXPORT_FORMAT, EXPORT_FORMATS, ExportUnavailableError, ensure_export, export_format_for
+from scraper.jobqueue import HEARTBEAT_SEC, JobQueue, QueueFullError
+from scraper.metrics import render_metrics
+from scraper.navigation import NAVIGATION
+from scraper.options import DEFAULT_EXTRACTION, DEFAULT_MODE, EXTRACTION_MODES, SCRAPE_MODES, parse_since
+from scraper.retention import retention_loop
+from scraper.selector_stats import SELECTOR_REGISTRY
+from scraper.session import SESSION
+from scraper.supervisor import Supervisor
 
-app = FastAPI()
+if TYPE_CHECKING:
+    from scraper.worker import WorkerNode
+
+# このプロセスの役割: "all" (APIとワーカー), "api" (ジョブの受付と進捗の配信のみ),
+# "supervisor" (APIに加えて WORKER_PROCESSES 個のワーカープロセスを起動・監視する。アカウントはプロセスごとに分けるため、
+# 設定されたアカウント数を超える分は起動しない)。ワーカーだけなら worker.py で起動する
+SCRAPER_ROLE = os.getenv("SCRAPER_ROLE", "all")
+
+JOB_QUEUE = JobQueue()
+
+# イベントがない間にSSE接続を維持するために送るコメントの間隔（秒）
+SSE_KEEPALIVE_SEC = 15.0
+
+# このプロセスで実行中のジョブの進捗（scrape_jobが直接更新する）。他のワーカーのジョブと終了したジョブはDBから参照する
+PROGRESS: Dict[str, Dict] = {}
+
+# ジョブを実行するワーカー（"all" のとき、起動後に設定される）
+WORKER_NODE: Optional["WorkerNode"] = None
+# ワーカーを起動できなかった理由。設定されている間は /health で報告し、新しいジョブを受け付けない
+WORKER_START_ERROR: Optional[str] = None
+SUPERVISOR: Optional[Supervisor] = Supervisor(JOB_QUEUE) if SCRAPER_ROLE == "supervisor" else None
+
+
+async def start_worker_node() -> None:
+    """スクレイパー（Playwright・ブラウザプール）を読み込んでワーカーを起動する
+
+    APIの起動を待たせないよう、lifespanからバックグラウンドで実行する。
+    """
+    global WORKER_NODE, WORKER_START_ERROR
+    started = time.perf_counter()
+    try:
+        worker = await asyncio.to_thread(importlib.import_module, "scraper.worker")
+        WORKER_NODE = worker.WorkerNode(JOB_QUEUE, PROGRESS)
+        await WORKER_NODE.start()
+    except Exception as e:
+        logger.exception("Failed to start job workers: {}", str(e))
+        WORKER_START_ERROR = f"{type(e).__name__}: {e}"
+        return
+    logger.info("Job workers ready in {:.2f}s", time.perf_counter() - started)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ジョブワーカー（またはワーカープロセス）をアプリと同じライフサイクルで起動・停止する
+    startup = asyncio.create_task(start_worker_node()) if SCRAPER_ROLE == "all" else None
+    if SUPERVISOR is not None:
+        await SUPERVISOR.start()
+    # 終了したジョブの記録と結果ファイル、デバッグ用スクリーンショットを定期的に削除する
+    retention = asyncio.create_task(retention_loop(JOB_QUEUE))
+    yield
+    retention.cancel()
+    await asyncio.gather(retention, return_exceptions=True)
+    if startup is not None and not startup.done():
+        startup.cancel()
+        await asyncio.gather(startup, return_exceptions=True)
+    if SUPERVISOR is not None:
+        await SUPERVISOR.stop()
+    if WORKER_NODE is not None:
+        await WORKER_NODE.stop()
+    JOB_QUEUE.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS設定を追加
 app.add_middleware(
@@ -21,42 +99,209 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-PROGRESS: Dict[str, Dict] = {}
+
+def int_param(data: Dict, key: str, default: int) -> int:
+    """リクエストの整数パラメータ。整数として読めなければ ValueError"""
+    value = data.get(key, default)
+    if isinstance(value, bool):
+        raise ValueError(f"{key} must be an integer")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer")
 
 
 @app.post("/scrape")
 async def start_scrape(data: Dict):
+    if WORKER_START_ERROR is not None:
+        # 実行するワーカーがいないジョブを溜め込まない
+        raise HTTPException(status_code=503, detail=f"Job workers failed to start: {WORKER_START_ERROR}")
     usernames: List[str] = data.get("usernames", [])
     hashtags: List[str] = data.get("hashtags", [])
     max_items: int = data.get("max_items", 10)
     columns: List[str] = data.get("columns", [])
+    extraction: str = data.get("extraction", DEFAULT_EXTRACTION)
+    if extraction not in EXTRACTION_MODES:
+        raise HTTPException(status_code=400, detail=f"extraction must be one of {list(EXTRACTION_MODES)}")
+    mode: str = data.get("mode", DEFAULT_MODE)
+    if mode not in SCRAPE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {list(SCRAPE_MODES)}")
+
+    # 差分取得: 前回の実行以降の新しいリールだけを取得し、sinceより前の投稿は除外する
+    incremental: bool = bool(data.get("incremental", False))
+    since: Optional[str] = data.get("since") or None
+    try:
+        parse_since(since)
+        # 同時に使うページ数（サーバー側でMAX_CONCURRENCYに制限される）
+        concurrency = int_param(data, "concurrency", 1)
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        priority = int_param(data, "priority", 0)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 出力形式（csv / csv.gz / jsonl / parquet）。ダウンロード時に別形式を指定することもできる
+    export_format: str = data.get("format", DEFAULT_EXPORT_FORMAT)
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(EXPORT_FORMATS)}")
 
     job_id = uuid.uuid4().hex
-    # async関数をバックグラウンドタスクとして実行
-    asyncio.create_task(scrape_job(job_id, usernames, hashtags, max_items, columns, PROGRESS))
-    PROGRESS[job_id] = {"progress": 0, "status": "queued"}
-    logger.info("Created job {} with data: {}", job_id, data)
-    return {"job_id": job_id}
+    params = {
+        "usernames": usernames,
+        "hashtags": hashtags,
+        "max_items": max_items,
+        "columns": columns,
+        "concurrency": concurrency,
+        "extraction": extraction,
+        "mode": mode,
+        "incremental": incremental,
+        "since": since,
+        "export_format": export_format,
+    }
+    # ジョブはキューに入れ、ワーカーが空き次第実行する
+    try:
+        position = JOB_QUEUE.enqueue(job_id, params, priority)
+    except QueueFullError as e:
+        logger.warning("Rejected job: {}", str(e))
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    logger.info("Created job {} at queue position {} with data: {}", job_id, position, data)
+    return {"job_id": job_id, "position": position}
+
+
+def job_state(job_id: str) -> Optional[Dict]:
+    """実行中ならメモリ上の進捗、それ以外はDBに保存された進捗を返す"""
+    if job_id in PROGRESS:
+        return PROGRESS[job_id]
+    return JOB_QUEUE.get_state(job_id)
 
 
 @app.get("/progress/{job_id}")
 async def get_progress(job_id: str):
-    if job_id not in PROGRESS:
-        logger.warning("Job {} not found in PROGRESS. Available jobs: {}", job_id, list(PROGRESS.keys()))
+    progress_data = job_state(job_id)
+    if progress_data is None:
+        logger.warning("Job {} not found", job_id)
         raise HTTPException(status_code=404, detail="Job not found")
-    progress_data = PROGRESS[job_id]
-    logger.info("Progress for job {}: {}", job_id, progress_data)
+    logger.debug("Progress for job {}: {}", job_id, progress_data)
     return progress_data
 
 
+def sse_message(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.get("/progress/{job_id}/events")
+async def progress_events(job_id: str):
+    """進捗をServer-Sent Eventsで配信する（reel・target_done・scrape_error・status）
+
+    接続直後に現在の状態を ``status`` イベントとして送り、ジョブが終了したら接続を閉じる。
+    """
+    if job_state(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        # 状態を読む前に購読しておき、その間に発生したイベントを取りこぼさない
+        with PROGRESS_EVENTS.subscribe(job_id) as queue:
+            state = job_state(job_id) or {}
+            yield sse_message("status", state)
+            if is_terminal("status", state):
+                return
+            idle = 0.0
+            while True:
+                # 他のプロセス・ノードのワーカーが実行するジョブのイベントは届かないため、DBの進捗を定期的に確認する
+                timeout = SSE_KEEPALIVE_SEC if job_id in PROGRESS else HEARTBEAT_SEC
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    if job_id not in PROGRESS:
+                        latest = JOB_QUEUE.get_state(job_id) or {}
+                        if latest != state:
+                            state, idle = latest, 0.0
+                            yield sse_message("status", state)
+                            if is_terminal("status", state):
+                                return
+                            continue
+                    idle += timeout
+                    if idle >= SSE_KEEPALIVE_SEC:
+                        idle = 0.0
+                        yield ": keepalive\n\n"
+                    continue
+                idle = 0.0
+                yield sse_message(event, data)
+                if is_terminal(event, data):
+                    return
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.get("/download/{job_id}")
-async def download(job_id: str):
-    info = PROGRESS.get(job_id)
+async def download(job_id: str, partial: bool = False, format: Optional[str] = None):
+    """完成した結果ファイルを返す。``partial=true`` なら実行中のジョブのここまでの行をCSVでストリーミングする
+
+    ``format`` を指定すると、その形式に変換したファイル（初回に作成して保存）を返す。
+    """
+    if format is not None and format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(EXPORT_FORMATS)}")
+    info = job_state(job_id)
+    if partial and info and info.get("status") == "running":
+        parts_dir = parts_dir_for(job_id, attempt=info.get("attempt"))
+        if parts_dir.exists():
+            return StreamingResponse(
+                iter_partial_csv(parts_dir),
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="instagram_reels_{job_id}_partial.csv"'},
+            )
+    if info and info.get("expired"):
+        # 保持期間・容量の上限を超えて削除された結果
+        raise HTTPException(status_code=410, detail=f"Result expired ({info.get('expired_reason', 'retention')})")
     if not info or info.get("status") != "done":
         raise HTTPException(status_code=404, detail="Not ready")
     path = Path(info["path"])
     if not path.exists():
         logger.error("File not found: {}", path)
         raise HTTPException(status_code=404, detail="File missing")
-    filename = f"instagram_reels_{path.stat().st_mtime_ns}.csv"
-    return FileResponse(path, media_type="text/csv", filename=filename)
+    if format is not None:
+        try:
+            path = await asyncio.to_thread(ensure_export, path, format)
+        except ExportUnavailableError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+    JOB_QUEUE.touch(job_id)
+    suffix, media_type = EXPORT_FORMATS[export_format_for(path) or "csv"]
+    filename = f"instagram_reels_{path.stat().st_mtime_ns}{suffix}"
+    return FileResponse(path, media_type=media_type, filename=filename)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus形式のメトリクス（ステージ別の所要時間・リトライ・セレクターのミスなど）"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok" if WORKER_START_ERROR is None else "error",
+        "role": SCRAPER_ROLE,
+        "worker_error": WORKER_START_ERROR,
+        "browser_pools": WORKER_NODE.stats()["browser_pools"] if WORKER_NODE is not None else None,
+        "jobs": JOB_QUEUE.counts(),
+        "workers": JOB_QUEUE.leases(),
+        "worker_processes": SUPERVISOR.stats() if SUPERVISOR is not None else None,
+        "accounts": ACCOUNT_POOL.status() if ACCOUNT_POOL.accounts else None,
+        "session": SESSION.status(),
+        "navigation": NAVIGATION.status(),
+    }
+
+
+@app.get("/workers")
+async def workers():
+    """ワーカープロセスごとの実行中ジョブ数・CPU使用率・RSS（ブラウザを含む）"""
+    if SUPERVISOR is not None:
+        return SUPERVISOR.stats()
+    return JOB_QUEUE.worker_loads()
+
+
+@app.get("/selectors/stats")
+async def selector_stats():
+    """セレクターごとのヒット率と待ち時間（試行順に並ぶ）"""
+    return SELECTOR_REGISTRY.snapshot()
@@ -1,4 +1,7 @@
+import os
+
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # 自動リロードは開発時のみ（RELOAD=1）。ワーカープロセスを使う場合は SCRAPER_ROLE=supervisor
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=os.getenv("RELOAD") == "1")
@@ -0,0 +1,230 @@
+"""Pool of Instagram accounts with per-account reel budgets and quarantine."""
+
+import asyncio
+import contextvars
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from .login import PASS, STATE_PATH, USER
+from .session import SESSION, SessionManager
+
+# 追加アカウント（"user1:pass1,user2:pass2"）。未設定ならINSTA_USER/INSTA_PASSの1アカウントのみ
+INSTA_ACCOUNTS = os.getenv("INSTA_ACCOUNTS", "")
+ACCOUNT_STATE_DIR = Path(os.getenv("ACCOUNT_STATE_DIR", "state/accounts"))
+
+# アカウントごとのリール取得予算（トークンバケット）: 1時間あたりの補充量と最大保持量
+ACCOUNT_REELS_PER_HOUR = float(os.getenv("ACCOUNT_REELS_PER_HOUR", "600"))
+ACCOUNT_REEL_BURST = float(os.getenv("ACCOUNT_REEL_BURST", "60"))
+
+# チャレンジ・ログイン画面に遭遇したアカウントを使わない時間（秒）
+ACCOUNT_QUARANTINE_SEC = float(os.getenv("ACCOUNT_QUARANTINE_SEC", "1800"))
+
+CHALLENGE_MARKERS = ("/challenge/", "/accounts/suspended/")
+
+
+class AccountQuarantinedError(Exception):
+    """Raised when the account a job runs on is quarantined mid-job."""
+
+
+class TokenBucket:
+    """Refills ``rate_per_sec`` tokens per second up to ``capacity``."""
+
+    def __init__(self, capacity: float, rate_per_sec: float):
+        self.capacity = capacity
+        self.rate_per_sec = rate_per_sec
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_sec)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def wait_time(self, cost: float = 1.0) -> float:
+        """Seconds until ``cost`` tokens are available."""
+        self._refill()
+        if self.tokens >= cost:
+            return 0.0
+        if self.rate_per_sec <= 0:
+            return float("inf")
+        return (cost - self.tokens) / self.rate_per_sec
+
+    def take(self, cost: float = 1.0) -> bool:
+        self._refill()
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+
+class Account:
+    """One Instagram login with its own state file, session cache and budget."""
+
+    def __init__(self, username: str, password: str, state_path: Path, bucket: Optional[TokenBucket] = None, session: Optional[SessionManager] = None):
+        self.username = username
+        self.password = password
+        self.state_path = Path(state_path)
+        self.bucket = bucket or TokenBucket(ACCOUNT_REEL_BURST, ACCOUNT_REELS_PER_HOUR / 3600)
+        self.session = session or SessionManager(self.state_path)
+        self.active_jobs = 0
+        self.reels = 0
+        self.quarantined_until = 0.0
+        self.quarantine_reason: Optional[str] = None
+
+    def is_quarantined(self) -> bool:
+        return time.time() < self.quarantined_until
+
+    def status(self) -> Dict:
+        return {
+            "username": self.username,
+            "tokens": round(self.bucket.available(), 1),
+            "active_jobs": self.active_jobs,
+            "reels": self.reels,
+            "quarantined": self.is_quarantined(),
+            "quarantined_until": self.quarantined_until if self.is_quarantined() else None,
+            "quarantine_reason": self.quarantine_reason,
+            "session": self.session.status(),
+        }
+
+
+def _state_path_for(username: str) -> Path:
+    return ACCOUNT_STATE_DIR / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', username)}.json"
+
+
+def load_accounts(spec: str = INSTA_ACCOUNTS) -> List[Account]:
+    """Accounts from ``INSTA_ACCOUNTS``; INSTA_USER keeps the original state file and session."""
+    accounts: List[Account] = []
+    if USER and PASS:
+        accounts.append(Account(USER, PASS, STATE_PATH, session=SESSION))
+    for item in spec.split(","):
+        if ":" not in item:
+            continue
+        username, password = (part.strip() for part in item.split(":", 1))
+        if username and all(account.username != username for account in accounts):
+            accounts.append(Account(username, password, _state_path_for(username)))
+    return accounts
+
+
+# 現在のジョブが使っているアカウント。scrape_jobのタスク内で設定され、子タスクにも引き継がれる
+_current_account: contextvars.ContextVar[Optional[Account]] = contextvars.ContextVar("current_account", default=None)
+
+
+def current_account() -> Optional[Account]:
+    return _current_account.get()
+
+
+def use_account(account: Optional[Account]) -> None:
+    """Bind ``account`` to the current task (and the tasks it starts)."""
+    _current_account.set(account)
+
+
+def current_session() -> SessionManager:
+    account = current_account()
+    return account.session if account else SESSION
+
+
+def credentials() -> Tuple[Optional[str], Optional[str]]:
+    account = current_account()
+    return (account.username, account.password) if account else (USER, PASS)
+
+
+class AccountPool:
+    """Hands jobs the account with the most budget left, skipping quarantined ones."""
+
+    def __init__(self, accounts: Optional[List[Account]] = None):
+        self.accounts = accounts if accounts is not None else load_accounts()
+        self._changed = asyncio.Event()
+
+    def get(self, username: str) -> Optional[Account]:
+        return next((account for account in self.accounts if account.username == username), None)
+
+    def _candidates(self) -> List[Account]:
+        return [account for account in self.accounts if not account.is_quarantined()]
+
+    def available(self) -> bool:
+        """Whether ``acquire`` would return without waiting for a quarantine to end."""
+        return bool(self._candidates())
+
+    async def acquire(self) -> Account:
+        """Pick an account for a job, waiting while every account is quarantined."""
+        if not self.accounts:
+            raise RuntimeError("No Instagram accounts configured (INSTA_USER/INSTA_PASS or INSTA_ACCOUNTS)")
+        while True:
+            candidates = self._candidates()
+            if candidates:
+                account = max(candidates, key=lambda a: (a.bucket.available(), -a.active_jobs))
+                account.active_jobs += 1
+                return account
+            wait_sec = min(account.quarantined_until for account in self.accounts) - time.time()
+            logger.warning("All accounts are quarantined, waiting {:.0f}s", wait_sec)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=max(0.0, wait_sec))
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, account: Account) -> None:
+        account.active_jobs = max(0, account.active_jobs - 1)
+        self._changed.set()
+
+    def quarantine(self, account: Account, reason: str, duration_sec: float = ACCOUNT_QUARANTINE_SEC) -> None:
+        account.quarantined_until = time.time() + duration_sec
+        account.quarantine_reason = reason
+        account.session.invalidate(reason)
+        logger.error("Quarantined account {} for {:.0f}s: {}", account.username, duration_sec, reason)
+
+    def status(self) -> List[Dict]:
+        return [account.status() for account in self.accounts]
+
+
+ACCOUNT_POOL = AccountPool()
+
+
+async def spend_budget(cost: float = 1.0) -> None:
+    """Take ``cost`` reel tokens from the current account, waiting if its bucket is empty."""
+    account = current_account()
+    if account is None:
+        return
+    if account.is_quarantined():
+        raise AccountQuarantinedError(f"Account {account.username} is quarantined: {account.quarantine_reason}")
+    while not account.bucket.take(cost):
+        wait_sec = account.bucket.wait_time(cost)
+        logger.info("Account {} is out of reel budget, waiting {:.1f}s", account.username, wait_sec)
+        await asyncio.sleep(wait_sec)
+    account.reels += 1
+
+
+async def handle_login_wall(page) -> None:
+    """React to landing on a login or challenge page while scraping.
+
+    A challenge cannot be solved automatically, so the account is quarantined
+    and the job stops; a plain login page is retried once by logging in again,
+    and the account is quarantined if that fails.
+    """
+    account = current_account()
+    url = page.url
+    if account is not None and any(marker in url for marker in CHALLENGE_MARKERS):
+        ACCOUNT_POOL.quarantine(account, f"challenge at {url}")
+        raise AccountQuarantinedError(f"Account {account.username} hit a challenge")
+    try:
+        await current_session().recover(page)
+    except Exception as e:
+        if account is None:
+            raise
+        ACCOUNT_POOL.quarantine(account, f"re-login failed: {e}")
+        raise AccountQuarantinedError(f"Account {account.username} could not log in again") from e
+
+
+async def refresh_account_session(account: Account, pool) -> None:
+    """Run the background session refresher of ``account`` with its credentials."""
+    use_account(account)
+    await account.session.refresh_loop(pool)
@@ -1,14 +1,147 @@
-from typing import List, Dict
-import pandas as pd
+"""CSV output: column layout and the streaming job writer."""
+
+import csv
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO
+
+from .export import typed_row
 
 DEFAULT_COLUMNS = ["url", "title", "caption", "posted_at"]
 
+# 出力先（既定は backend/output）。APIとワーカーのプロセスは同じマシン上でこのディレクトリを共有する
+OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR") or Path(__file__).resolve().parent.parent / "output")
+
+HEADER_FILE = "_header.csv"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def output_columns(columns: List[str]) -> List[str]:
+    """Default columns followed by the requested optional columns."""
+    return DEFAULT_COLUMNS + [col for col in columns if col not in DEFAULT_COLUMNS]
+
+
+def output_stem(job_id: str, attempt: Optional[str] = None) -> str:
+    """File name stem of a job's output; ``attempt`` keeps each claim of the job apart."""
+    return f"{job_id}.{attempt}" if attempt else job_id
+
+
+def parts_dir_for(job_id: str, out_dir: Path = OUTPUT_DIR, attempt: Optional[str] = None) -> Path:
+    """Directory holding the per-target part files of a running job."""
+    return Path(out_dir) / f"{output_stem(job_id, attempt)}.parts"
+
+
+def remove_attempt_output(job_id: str, attempt: str, out_dir: Path = OUTPUT_DIR) -> None:
+    """Delete the part files and results written by one attempt of a job."""
+    for entry in Path(out_dir).glob(f"{output_stem(job_id, attempt)}.*"):
+        if entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)
+        else:
+            entry.unlink(missing_ok=True)
+
+
+class StreamingCsvWriter:
+    """Writes each job's rows to disk as soon as they are scraped.
+
+    Every target gets its own part file under ``<job_id>.parts/`` so rows can
+    be appended (and flushed) in any completion order while the final CSV
+    keeps target order. Within a target, rows that arrive ahead of their
+    position are held only until the gap before them is filled. With
+    ``attempt`` the parts and the CSV are named ``<job_id>.<attempt>.*``, so
+    a worker that lost its lease never touches the files of the next one.
+    """
+
+    def __init__(self, job_id: str, columns: List[str], out_dir: Path = OUTPUT_DIR, attempt: Optional[str] = None):
+        self.columns = output_columns(columns)
+        self.out_dir = Path(out_dir)
+        self.path = self.out_dir / f"{output_stem(job_id, attempt)}.csv"
+        self.parts_dir = parts_dir_for(job_id, self.out_dir, attempt)
+        self.rows = 0
+        self._files: Dict[int, TextIO] = {}
+        self._writers: Dict[int, csv.DictWriter] = {}
+        self._next_position: Dict[int, int] = {}
+        self._pending: Dict[int, Dict[int, Dict]] = {}
+
+        # 再実行時は前回の途中結果を破棄する
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.parts_dir / HEADER_FILE, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(self.columns)
+
+    def write_row(self, target: int, position: int, row: Dict) -> None:
+        self._pending.setdefault(target, {})[position] = row
+        self._drain(target)
+
+    def skip_row(self, target: int, position: int) -> None:
+        """Mark ``position`` as producing no row so later rows are not held back."""
+        self._pending.setdefault(target, {})[position] = None
+        self._drain(target)
+
+    def _drain(self, target: int) -> None:
+        pending = self._pending[target]
+        next_position = self._next_position.get(target, 0)
+        while next_position in pending:
+            row = pending.pop(next_position)
+            if row is not None:
+                # 件数は整数、posted_atはUTCのISO 8601に揃えて書き込む
+                self._writer(target).writerow(typed_row(row))
+                self.rows += 1
+            next_position += 1
+        self._next_position[target] = next_position
+        if target in self._files:
+            self._files[target].flush()
+
+    def _writer(self, target: int) -> csv.DictWriter:
+        if target not in self._writers:
+            f = open(self.parts_dir / f"{target:05d}.csv", "a", newline="", encoding="utf-8")
+            self._files[target] = f
+            self._writers[target] = csv.DictWriter(f, fieldnames=self.columns, restval="", extrasaction="ignore")
+        return self._writers[target]
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        self._writers.clear()
+
+    def discard(self) -> None:
+        """Drop everything written so far (the job will be run again)."""
+        self.close()
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+
+    def finalize(self) -> Optional[Path]:
+        """Concatenate the parts into ``<job_id>[.<attempt>].csv``; returns None if no rows."""
+        self.close()
+        if not self.rows:
+            shutil.rmtree(self.parts_dir, ignore_errors=True)
+            return None
+        tmp_path = self.path.with_suffix(".csv.tmp")
+        with open(tmp_path, "wb") as out:
+            for part in iter_part_files(self.parts_dir):
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out, STREAM_CHUNK_SIZE)
+        tmp_path.replace(self.path)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return self.path
+
+
+def iter_part_files(parts_dir: Path) -> List[Path]:
+    """Header first, then target part files in target order."""
+    parts = sorted(p for p in Path(parts_dir).glob("*.csv") if p.name != HEADER_FILE)
+    return [Path(parts_dir) / HEADER_FILE] + parts
+
 
-def build_dataframe(data: List[Dict], columns: List[str]) -> pd.DataFrame:
-    """Build pandas DataFrame with default and optional columns."""
-    cols = DEFAULT_COLUMNS + [col for col in columns if col not in DEFAULT_COLUMNS]
-    df = pd.DataFrame(data)
-    for col in cols:
-        if col not in df:
-            df[col] = None
-    return df[cols]
+def iter_partial_csv(parts_dir: Path) -> Iterator[bytes]:
+    """Stream the rows written so far for a running job as one CSV."""
+    for part in iter_part_files(parts_dir):
+        try:
+            with open(part, "rb") as f:
+                while True:
+                    chunk = f.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+        except FileNotFoundError:
+            # ジョブ完了時にパートが削除された場合
+            return
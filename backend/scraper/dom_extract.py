@@ -0,0 +1,218 @@
+"""DOM extraction of reel fields, per element or in a single ``page.evaluate``."""
+
+import re
+from typing import Dict, List
+
+from loguru import logger
+
+from .selector_stats import SELECTOR_REGISTRY
+
+# 各カラムのセレクターは優先度順（上から順に試す）
+CAPTION_SELECTORS = [
+    'div[data-testid="post-caption"] span',
+    'article div[role="button"] span',
+    'div[dir="auto"] span',
+    'h1 + div span',
+    'span[style*="word-wrap"]'
+]
+
+LIKES_SELECTORS = [
+    'button[aria-label*="いいね"] span',
+    'button[aria-label*="like"] span',
+    'section[role="tablist"] + div button span',
+    'svg[aria-label*="いいね"] + span',
+    'svg[aria-label*="like"] + span'
+]
+
+VIEW_SELECTORS = [
+    'span:has-text("回再生")',
+    'span:has-text("views")',
+    'div:has-text("回再生")',
+    'div:has-text("views")',
+    'div[role="button"] span:has-text("回")',
+    'div[role="button"] span:has-text("view")'
+]
+
+COMMENT_SELECTORS = [
+    'button[aria-label*="コメント"] span',
+    'button[aria-label*="comment"] span',
+    'svg[aria-label*="コメント"] + span',
+    'svg[aria-label*="comment"] + span',
+    'section[role="tablist"] + div button:nth-child(2) span'
+]
+
+# 数字を抽出（K、M表記も考慮）
+COUNT_PATTERN = r'([\d,]+(?:\.\d+)?[KkMm]?)'
+
+# キャプションとみなす最小文字数
+MIN_CAPTION_LENGTH = 20
+
+VIEW_KEYWORDS = ["再生", "view"]
+
+# 1回のpage.evaluateで全カラムを取得するスクリプト。
+# Playwright独自の :has-text() はブラウザのCSSでは使えないため、
+# 末尾の :has-text("...") をテキストの部分一致（大文字小文字を無視）に置き換える。
+BATCH_EXTRACT_JS = """
+(plan) => {
+  const hasText = /^(.*):has-text\\("([^"]*)"\\)$/;
+  const query = (selector) => {
+    const match = selector.match(hasText);
+    if (!match) return Array.from(document.querySelectorAll(selector));
+    const needle = match[2].toLowerCase();
+    return Array.from(document.querySelectorAll(match[1] || '*'))
+      .filter((el) => (el.textContent || '').toLowerCase().includes(needle));
+  };
+  const result = {};
+  const hits = {};
+  for (const [field, rule] of Object.entries(plan.fields)) {
+    const pattern = rule.pattern ? new RegExp(rule.pattern) : null;
+    let value = '';
+    hits[field] = null;
+    for (const selector of rule.selectors) {
+      let elements;
+      try {
+        elements = query(selector);
+      } catch (e) {
+        continue;
+      }
+      for (const el of elements) {
+        const text = el.textContent;
+        if (!text) continue;
+        if (rule.keywords && !rule.keywords.some((k) => text.includes(k))) continue;
+        if (pattern) {
+          const m = text.match(pattern);
+          if (m) { value = m[1]; break; }
+        } else if (text.trim().length > rule.min_length) {
+          value = text.trim();
+          break;
+        }
+      }
+      if (value) { hits[field] = selector; break; }
+    }
+    result[field] = value;
+  }
+  if (plan.posted_at) {
+    let postedAt = '';
+    for (const el of document.querySelectorAll('time')) {
+      const datetime = el.getAttribute('datetime');
+      const title = el.getAttribute('title');
+      if (datetime) { postedAt = datetime; break; }
+      if (title) { postedAt = title; break; }
+    }
+    result.posted_at = postedAt;
+  }
+  return { values: result, hits };
+}
+"""
+
+
+FIELD_SELECTORS = {
+    "caption": CAPTION_SELECTORS,
+    "likes": LIKES_SELECTORS,
+    "video_view_count": VIEW_SELECTORS,
+    "comments": COMMENT_SELECTORS,
+}
+
+
+def build_selector_plan(fields: List[str]) -> Dict:
+    """Build the selector plan shipped to ``BATCH_EXTRACT_JS`` for ``fields``.
+
+    Selectors are ordered by the selector registry, so recent winners go first.
+    """
+    ordered = {field: SELECTOR_REGISTRY.ordered(field, selectors) for field, selectors in FIELD_SELECTORS.items()}
+    rules = {
+        "caption": {"selectors": ordered["caption"], "min_length": MIN_CAPTION_LENGTH},
+        "likes": {"selectors": ordered["likes"], "pattern": COUNT_PATTERN},
+        "video_view_count": {"selectors": ordered["video_view_count"], "pattern": COUNT_PATTERN, "keywords": VIEW_KEYWORDS},
+        "comments": {"selectors": ordered["comments"], "pattern": COUNT_PATTERN},
+    }
+    return {
+        "fields": {field: rules[field] for field in fields if field in rules},
+        "posted_at": "posted_at" in fields,
+    }
+
+
+async def extract_fields_batched(page, fields: List[str]) -> Dict[str, str]:
+    """Extract ``fields`` from the current reel in one browser round trip."""
+    plan = build_selector_plan(fields)
+    extracted = await page.evaluate(BATCH_EXTRACT_JS, plan)
+    # 採用されたセレクターより前に試したものはミスとして記録（ページ内で評価するため遅延は記録しない）
+    for field, winner in extracted["hits"].items():
+        for selector in plan["fields"][field]["selectors"]:
+            SELECTOR_REGISTRY.record(field, selector, selector == winner)
+            if selector == winner:
+                break
+    return extracted["values"]
+
+
+async def _first_count(page, field: str, keywords: List[str] = None) -> str:
+    for selector in SELECTOR_REGISTRY.ordered(field, FIELD_SELECTORS[field]):
+        with SELECTOR_REGISTRY.attempt(field, selector) as attempt:
+            try:
+                elements = await page.query_selector_all(selector)
+                for element in elements:
+                    text = await element.text_content()
+                    if text and (not keywords or any(k in text for k in keywords)):
+                        match = re.search(COUNT_PATTERN, text)
+                        if match:
+                            attempt.hit()
+                            return match.group(1)
+            except:
+                continue
+    return ""
+
+
+async def extract_fields_per_element(page, fields: List[str]) -> Dict[str, str]:
+    """Extract ``fields`` by querying each selector and element separately.
+
+    This costs one round trip per selector and per element; it is kept as the
+    fallback for ``extract_fields_batched`` and as the benchmark baseline.
+    """
+    result = {}
+
+    # キャプションを取得
+    if "caption" in fields:
+        caption = ""
+        for selector in SELECTOR_REGISTRY.ordered("caption", CAPTION_SELECTORS):
+            with SELECTOR_REGISTRY.attempt("caption", selector) as attempt:
+                try:
+                    caption_elements = await page.query_selector_all(selector)
+                    for element in caption_elements:
+                        text = await element.text_content()
+                        if text and len(text.strip()) > MIN_CAPTION_LENGTH:  # 十分な長さのテキスト
+                            caption = text.strip()
+                            break
+                    if caption:
+                        attempt.hit()
+                        break
+                except:
+                    continue
+        result["caption"] = caption
+
+    # いいね数・動画再生回数・コメント数を取得
+    if "likes" in fields:
+        result["likes"] = await _first_count(page, "likes")
+    if "video_view_count" in fields:
+        result["video_view_count"] = await _first_count(page, "video_view_count", VIEW_KEYWORDS)
+    if "comments" in fields:
+        result["comments"] = await _first_count(page, "comments")
+
+    # 投稿時間を取得
+    if "posted_at" in fields:
+        posted_at = ""
+        try:
+            time_elements = await page.query_selector_all('time')
+            for element in time_elements:
+                datetime_attr = await element.get_attribute('datetime')
+                title_attr = await element.get_attribute('title')
+                if datetime_attr:
+                    posted_at = datetime_attr
+                    break
+                elif title_attr:
+                    posted_at = title_attr
+                    break
+        except Exception as e:
+            logger.debug("Could not find posted time: {}", str(e))
+        result["posted_at"] = posted_at
+
+    return result
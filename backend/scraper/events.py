@@ -0,0 +1,60 @@
+"""In-process fan-out of per-job progress events to any number of subscribers."""
+
+import asyncio
+import os
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from loguru import logger
+
+# 購読者ごとに保持する未送信イベント数の上限。遅い購読者は古いイベントから捨てる
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+
+# これらのステータスのイベントを受け取ったら購読を終了する
+TERMINAL_STATUSES = ("done", "error")
+
+
+class ProgressBroker:
+    """Publishes job events to subscriber queues.
+
+    Publishing costs one ``put_nowait`` per subscriber, so the scraper never
+    waits on a slow client and many dashboards can watch one job without
+    adding any load on the scraper.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    def publish(self, job_id: str, event: str, data: Dict) -> None:
+        for queue in self._subscribers.get(job_id, []):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait((event, data))
+
+    @contextmanager
+    def subscribe(self, job_id: str) -> Iterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(job_id, []).append(queue)
+        logger.debug("Subscriber added for job {} ({} total)", job_id, len(self._subscribers[job_id]))
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(job_id, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    def subscriber_count(self, job_id: str) -> int:
+        return len(self._subscribers.get(job_id, []))
+
+
+def is_terminal(event: str, data: Dict) -> bool:
+    return event == "status" and data.get("status") in TERMINAL_STATUSES
+
+
+PROGRESS_EVENTS = ProgressBroker()
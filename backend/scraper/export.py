@@ -0,0 +1,233 @@
+"""Typed export of job output as CSV, gzip CSV, JSON Lines or Parquet.
+
+Every format is written row by row (Parquet in row-group batches) from the
+rows of an existing output file, so large jobs never sit fully in memory.
+Parquet needs the optional ``pyarrow`` package.
+"""
+
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from .watermarks import parse_posted_at
+
+# 形式名 -> (拡張子, Content-Type)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "jsonl": (".jsonl", "application/x-ndjson"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+DEFAULT_EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "csv")
+
+COUNT_COLUMNS = ("likes", "comments", "video_view_count")
+
+# Parquetの1行グループあたりの行数（メモリ使用量の上限になる）
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+_COUNT_RE = re.compile(r"^([\d,]+(?:\.\d+)?)\s*([KkMmBb万億]?)$")
+_MULTIPLIERS = {"": 1, "k": 1_000, "m": 1_000_000, "b": 1_000_000_000, "万": 10_000, "億": 100_000_000}
+
+
+class ExportUnavailableError(Exception):
+    """Raised when a format needs an optional dependency that is not installed."""
+
+
+def parse_count(value) -> Optional[int]:
+    """Convert a scraped count ("1,234", "1.2K", "3M", 42) to an integer."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _COUNT_RE.match(str(value).strip())
+    if not match:
+        return None
+    number = float(match.group(1).replace(",", ""))
+    return int(round(number * _MULTIPLIERS[match.group(2).lower()]))
+
+
+def normalize_posted_at(value) -> Optional[str]:
+    """``posted_at`` as ``YYYY-MM-DDTHH:MM:SS.000Z`` (UTC), or None if unparseable."""
+    parsed = parse_posted_at(value)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%S.000Z") if parsed else None
+
+
+def typed_row(row: Dict, keep_unparsed: bool = True) -> Dict:
+    """Row with integer counts and normalized ``posted_at``; other columns stay text.
+
+    A non-empty value that cannot be parsed keeps its scraped text, unless
+    ``keep_unparsed`` is False (Parquet, whose typed columns only take None).
+    """
+    typed = dict(row)
+    for column in COUNT_COLUMNS:
+        if column in typed:
+            typed[column] = _parsed_or_raw(typed[column], parse_count(typed[column]), keep_unparsed)
+    if "posted_at" in typed:
+        typed["posted_at"] = _parsed_or_raw(typed["posted_at"], normalize_posted_at(typed["posted_at"]), keep_unparsed)
+    return typed
+
+
+def _parsed_or_raw(raw, parsed, keep_unparsed: bool):
+    if parsed is not None:
+        return parsed
+    # 解釈できない値（"1.2万回" など）は空にせず元の文字列を残す
+    if keep_unparsed and isinstance(raw, str) and raw.strip():
+        return raw
+    return None
+
+
+def export_format_for(path: Path) -> Optional[str]:
+    name = Path(path).name
+    # 拡張子の長いもの（.csv.gz）から判定する
+    for fmt, (suffix, _) in sorted(EXPORT_FORMATS.items(), key=lambda item: -len(item[1][0])):
+        if name.endswith(suffix):
+            return fmt
+    return None
+
+
+def iter_rows(path: Path) -> Iterator[Dict]:
+    """Read back the rows of any export file, one at a time."""
+    fmt = export_format_for(path)
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif fmt == "csv.gz":
+        with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif fmt == "jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == "parquet":
+        pq = _parquet()
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=EXPORT_BATCH_ROWS):
+            for row in batch.to_pylist():
+                if row.get("posted_at") is not None and not isinstance(row["posted_at"], str):
+                    row["posted_at"] = row["posted_at"].strftime("%Y-%m-%dT%H:%M:%S.000Z")
+                yield row
+    else:
+        raise ValueError(f"Unknown export file type: {path}")
+
+
+def read_columns(path: Path) -> List[str]:
+    """Column names of an export file without reading all of its rows."""
+    fmt = export_format_for(path)
+    if fmt in ("csv", "csv.gz"):
+        opener = gzip.open if fmt == "csv.gz" else open
+        with opener(path, "rt", newline="", encoding="utf-8") as f:
+            return next(csv.reader(f), [])
+    if fmt == "parquet":
+        return list(_parquet().ParquetFile(path).schema_arrow.names)
+    first = next(iter_rows(path), None)
+    return list(first) if first else []
+
+
+def _parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ExportUnavailableError("Parquet export requires pyarrow (pip install pyarrow)") from e
+    return pq
+
+
+def _parquet_schema(columns: List[str]):
+    import pyarrow as pa
+
+    fields = []
+    for column in columns:
+        if column in COUNT_COLUMNS:
+            fields.append(pa.field(column, pa.int64()))
+        elif column == "posted_at":
+            fields.append(pa.field(column, pa.timestamp("ms", tz="UTC")))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+def _write_parquet(rows: Iterator[Dict], columns: List[str], dest: Path) -> int:
+    pq = _parquet()
+    import pyarrow as pa
+
+    schema = _parquet_schema(columns)
+    written = 0
+    batch: List[Dict] = []
+    with pq.ParquetWriter(dest, schema, compression="zstd") as writer:
+        for row in rows:
+            row = typed_row(row, keep_unparsed=False)
+            row["posted_at"] = parse_posted_at(row.get("posted_at"))
+            batch.append({column: row.get(column) for column in columns})
+            if len(batch) >= EXPORT_BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                written += len(batch)
+                batch = []
+        if batch or not written:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            written += len(batch)
+    return written
+
+
+def export_file(source: Path, fmt: str, dest: Optional[Path] = None) -> Path:
+    """Write the rows of ``source`` to ``dest`` in ``fmt`` and return ``dest``."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {list(EXPORT_FORMATS)}")
+    source = Path(source)
+    if dest is None:
+        dest = export_path(source, fmt)
+    columns = read_columns(source)
+    # 同じ形式のダウンロードが同時に変換しても衝突しないよう、一時ファイルは変換ごとに別名にする
+    fd, tmp_name = tempfile.mkstemp(prefix=dest.name + ".", suffix=".tmp", dir=dest.parent)
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        written = _write_export(iter_rows(source), columns, fmt, tmp_path)
+        tmp_path.replace(dest)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    logger.info("Exported {} rows from {} to {} ({} bytes)", written, source.name, dest.name, dest.stat().st_size)
+    return dest
+
+
+def _write_export(rows: Iterator[Dict], columns: List[str], fmt: str, path: Path) -> int:
+    if fmt == "parquet":
+        return _write_parquet(rows, columns, path)
+    written = 0
+    if fmt == "jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(typed_row(row), ensure_ascii=False) + "\n")
+                written += 1
+    else:
+        opener = gzip.open if fmt == "csv.gz" else open
+        with opener(path, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, restval="", extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(typed_row(row))
+                written += 1
+    return written
+
+
+def export_path(source: Path, fmt: str) -> Path:
+    """``output/<job_id>.<ext>`` for the job whose output file is ``source``."""
+    source = Path(source)
+    current = export_format_for(source)
+    stem = source.name[: -len(EXPORT_FORMATS[current][0])] if current else source.stem
+    return source.with_name(stem + EXPORT_FORMATS[fmt][0])
+
+
+def ensure_export(source: Path, fmt: str) -> Path:
+    """Path of the job output in ``fmt``, converting (and keeping) it on first request."""
+    dest = export_path(source, fmt)
+    if dest.exists() and dest.stat().st_mtime >= Path(source).stat().st_mtime:
+        return dest
+    return export_file(source, fmt, dest)
@@ -1,23 +1,67 @@
-import random
+import os
 import asyncio
-import re
-from pathlib import Path
-from typing import Dict, List
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
-import pandas as pd
 from loguru import logger
 from playwright.async_api import async_playwright
 
-from .login import load_context, WAIT_SEC
-from .csv_utils import build_dataframe
+from .login import debug_screenshot_path, instagram_url, is_instagram_url, load_context, WAIT_SEC
+from .accounts import AccountQuarantinedError, credentials, current_session, handle_login_wall, spend_budget, use_account
+from .csv_utils import StreamingCsvWriter
+from .dom_extract import extract_fields_batched, extract_fields_per_element
+from .events import PROGRESS_EVENTS
+from .export import DEFAULT_EXPORT_FORMAT, export_file
+from .lean import TrafficMeter
+from .metrics import REELS, count_retry, observe_stage, record_job, span, start_job_timings, summarize_job_timings
+from .navigation import NAVIGATION, TerminalPageError
+from .network import ReelResponseCollector, shortcode_from_url
+from .options import DEFAULT_EXTRACTION, DEFAULT_MODE, parse_since
+from .recycle import PageRecycler, PageSlot
+from .reel_cache import DEFAULT_TTL_SEC, REEL_CACHE, start_job_cache_stats, summarize_cache_stats
+from .selector_stats import SELECTOR_REGISTRY
+from .session import is_login_wall
+from .waits import politeness_delay, record_wait, start_job_wait_stats, summarize_wait_stats, wait_for_any_selector, wait_for_url_change
+from .watermarks import WATERMARKS, IncrementalWindow
+
+# 1ジョブ内で同時に開くページ数のサーバー全体での上限
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "4"))
+
+# グリッドのスクロールで新しいリンクを待つ最大時間と、新規リンクなしで諦めるスクロール回数
+GRID_SCROLL_TIMEOUT_SEC = float(os.getenv("GRID_SCROLL_TIMEOUT_SEC", "5"))
+GRID_MAX_IDLE_SCROLLS = int(os.getenv("GRID_MAX_IDLE_SCROLLS", "3"))
+
+# グリッド上のリールリンクを表示順で取得するスクリプト
+GRID_LINKS_JS = """
+() => Array.from(document.querySelectorAll('a[href*="/reel/"]'), (a) => a.href)
+"""
+
+# DOM抽出をセレクター・要素ごとの往復ではなく1回のpage.evaluateで行う
+DOM_BATCH_EXTRACTION = os.getenv("DOM_BATCH_EXTRACTION", "1") != "0"
+
+# リール詳細の「次へ」ボタン（上から順に試す）
+NEXT_REEL_SELECTORS = [
+    'button[aria-label="Next"], button[aria-label="次へ"]',
+    'svg[aria-label="Next"], svg[aria-label="次へ"]',
+    'button:has(svg[aria-label="Next"]), button:has(svg[aria-label="次へ"])',
+    'div[role="button"]:has(svg[aria-label="Next"])',
+    'div[role="button"]:has(svg[aria-label="次へ"])',
+    # 右矢印のアイコンを探す
+    'button svg[viewBox*="24"][d*="m15.5"]',
+    'div[role="button"] svg[viewBox*="24"][d*="m15.5"]'
+]
 
 
 async def verify_login_status(page):
-    """Instagramのログイン状態を確認し、必要に応じて再ログインする"""
+    """Instagramのログイン状態を確認し、必要に応じて再ログインする
+
+    ログインできなかった場合は例外を送出する（perform_login_flow参照）。
+    """
+    is_logged_in = False
     try:
         # まず現在のログイン状態を確認
         logger.info("Checking current login status...")
-        await page.goto("https://www.instagram.com/", wait_until="networkidle")
+        await page.goto(instagram_url("/"), wait_until="networkidle")
         await asyncio.sleep(WAIT_SEC * 2)
         
         # ログイン状態を確認 - プロフィールアイコンやナビゲーションバーがあるかチェック
@@ -30,39 +74,40 @@ async def verify_login_status(page):
             'svg[aria-label*="Home"]'
         ]
         
-        is_logged_in = False
-        for indicator in login_indicators:
-            try:
-                element = await page.wait_for_selector(indicator, timeout=3000)
-                if element:
-                    is_logged_in = True
-                    logger.info("Login verification successful - user is logged in")
-                    break
-            except:
-                continue
-        
-        if not is_logged_in:
-            logger.info("User not logged in, redirecting to login page...")
-            await perform_login_flow(page)
+        for indicator in SELECTOR_REGISTRY.ordered("login_indicator", login_indicators):
+            with SELECTOR_REGISTRY.attempt("login_indicator", indicator) as attempt:
+                try:
+                    element = await page.wait_for_selector(indicator, timeout=3000)
+                    if element:
+                        attempt.hit()
+                        is_logged_in = True
+                        logger.info("Login verification successful - user is logged in")
+                        break
+                except:
+                    continue
         
     except Exception as e:
+        # 確認中のエラーの場合は念のためログインフローを実行
         logger.error("Error verifying login status: {}", str(e))
-        # エラーの場合は念のためログインフローを実行
+
+    if not is_logged_in:
+        logger.info("User not logged in, redirecting to login page...")
         await perform_login_flow(page)
 
 
 async def perform_login_flow(page):
-    """明確なログインフローを実行"""
+    """明確なログインフローを実行（ログイン後もログインページにいる場合は例外を送出）"""
     try:
-        logger.info("Navigating to Instagram login page: https://www.instagram.com/accounts/login/")
-        await page.goto("https://www.instagram.com/accounts/login/", wait_until="networkidle")
+        login_url = instagram_url("/accounts/login/")
+        logger.info("Navigating to Instagram login page: {}", login_url)
+        await page.goto(login_url, wait_until="networkidle")
         await asyncio.sleep(WAIT_SEC * 3)
         
         # ログインフォームが表示されるまで待機
         await page.wait_for_selector('form#loginForm, input[name="username"]', timeout=10000)
         
-        # login.pyのlogin関数の処理を呼び出し
-        from .login import USER, PASS
+        # ジョブに割り当てられたアカウント（未設定ならINSTA_USER/INSTA_PASS）の認証情報
+        USER, PASS = credentials()
         
         if not USER or not PASS:
             raise ValueError("Instagram credentials not configured in .env file")
@@ -81,37 +126,39 @@ async def perform_login_flow(page):
         ]
         
         username_filled = False
-        for selector in username_selectors:
-            try:
-                logger.info("Trying username selector: {}", selector)
-                username_field = await page.wait_for_selector(selector, timeout=3000)
-                if username_field:
-                    # フィールドが表示されているか確認
-                    is_visible = await username_field.is_visible()
-                    if is_visible:
-                        await username_field.click()
-                        await asyncio.sleep(WAIT_SEC * 0.5)
+        for selector in SELECTOR_REGISTRY.ordered("login_username", username_selectors):
+            with SELECTOR_REGISTRY.attempt("login_username", selector) as attempt:
+                try:
+                    logger.info("Trying username selector: {}", selector)
+                    username_field = await page.wait_for_selector(selector, timeout=3000)
+                    if username_field:
+                        # フィールドが表示されているか確認
+                        is_visible = await username_field.is_visible()
+                        if is_visible:
+                            await username_field.click()
+                            await asyncio.sleep(WAIT_SEC * 0.5)
                         
-                        # フィールドをクリアして入力
-                        await username_field.fill("")  # より確実なクリア方法
-                        await asyncio.sleep(WAIT_SEC * 0.5)
-                        await username_field.type(USER, delay=50)
+                            # フィールドをクリアして入力
+                            await username_field.fill("")  # より確実なクリア方法
+                            await asyncio.sleep(WAIT_SEC * 0.5)
+                            await username_field.type(USER, delay=50)
                         
-                        # 入力内容を確認
-                        input_value = await username_field.input_value()
-                        if input_value == USER:
-                            username_filled = True
-                            logger.info("Username filled successfully with selector: {}", selector)
-                            break
-                        else:
-                            logger.warning("Username input verification failed. Expected: {}, Got: {}", USER, input_value)
-            except Exception as e:
-                logger.debug("Failed with username selector {}: {}", selector, str(e))
-                continue
+                            # 入力内容を確認
+                            input_value = await username_field.input_value()
+                            if input_value == USER:
+                                attempt.hit()
+                                username_filled = True
+                                logger.info("Username filled successfully with selector: {}", selector)
+                                break
+                            else:
+                                logger.warning("Username input verification failed. Expected: {}, Got: {}", USER, input_value)
+                except Exception as e:
+                    logger.debug("Failed with username selector {}: {}", selector, str(e))
+                    continue
         
         if not username_filled:
             # スクリーンショットを撮ってデバッグ
-            await page.screenshot(path="debug_username_field_error.png")
+            await page.screenshot(path=debug_screenshot_path("debug_username_field_error.png"))
             
             # ページの全てのinput要素を調査
             all_inputs = await page.query_selector_all('input')
@@ -140,32 +187,34 @@ async def perform_login_flow(page):
         ]
         
         password_filled = False
-        for selector in password_selectors:
-            try:
-                logger.info("Trying password selector: {}", selector)
-                password_field = await page.wait_for_selector(selector, timeout=3000)
-                if password_field:
-                    # フィールドが表示されているか確認
-                    is_visible = await password_field.is_visible()
-                    if is_visible:
-                        await password_field.click()
-                        await asyncio.sleep(WAIT_SEC * 0.5)
+        for selector in SELECTOR_REGISTRY.ordered("login_password", password_selectors):
+            with SELECTOR_REGISTRY.attempt("login_password", selector) as attempt:
+                try:
+                    logger.info("Trying password selector: {}", selector)
+                    password_field = await page.wait_for_selector(selector, timeout=3000)
+                    if password_field:
+                        # フィールドが表示されているか確認
+                        is_visible = await password_field.is_visible()
+                        if is_visible:
+                            await password_field.click()
+                            await asyncio.sleep(WAIT_SEC * 0.5)
                         
-                        # フィールドをクリアして入力
-                        await password_field.fill("")  # より確実なクリア方法
-                        await asyncio.sleep(WAIT_SEC * 0.5)
-                        await password_field.type(PASS, delay=50)
+                            # フィールドをクリアして入力
+                            await password_field.fill("")  # より確実なクリア方法
+                            await asyncio.sleep(WAIT_SEC * 0.5)
+                            await password_field.type(PASS, delay=50)
                         
-                        # 入力内容を確認（パスワードなので値は確認しない）
-                        password_filled = True
-                        logger.info("Password filled successfully with selector: {}", selector)
-                        break
-            except Exception as e:
-                logger.debug("Failed with password selector {}: {}", selector, str(e))
-                continue
+                            # 入力内容を確認（パスワードなので値は確認しない）
+                            attempt.hit()
+                            password_filled = True
+                            logger.info("Password filled successfully with selector: {}", selector)
+                            break
+                except Exception as e:
+                    logger.debug("Failed with password selector {}: {}", selector, str(e))
+                    continue
         
         if not password_filled:
-            await page.screenshot(path="debug_password_field_error.png")
+            await page.screenshot(path=debug_screenshot_path("debug_password_field_error.png"))
             raise Exception("Could not fill password field")
         
         # ログインボタンをクリック
@@ -181,24 +230,26 @@ async def perform_login_flow(page):
         ]
         
         login_clicked = False
-        for selector in login_button_selectors:
-            try:
-                logger.info("Trying login button selector: {}", selector)
-                login_button = await page.wait_for_selector(selector, timeout=3000)
-                if login_button:
-                    is_visible = await login_button.is_visible()
-                    is_enabled = await login_button.is_enabled()
+        for selector in SELECTOR_REGISTRY.ordered("login_button", login_button_selectors):
+            with SELECTOR_REGISTRY.attempt("login_button", selector) as attempt:
+                try:
+                    logger.info("Trying login button selector: {}", selector)
+                    login_button = await page.wait_for_selector(selector, timeout=3000)
+                    if login_button:
+                        is_visible = await login_button.is_visible()
+                        is_enabled = await login_button.is_enabled()
                     
-                    if is_visible and is_enabled:
-                        await login_button.click()
-                        login_clicked = True
-                        logger.info("Login button clicked successfully with selector: {}", selector)
-                        break
-                    else:
-                        logger.warning("Login button found but not clickable. Visible: {}, Enabled: {}", is_visible, is_enabled)
-            except Exception as e:
-                logger.debug("Failed with login button selector {}: {}", selector, str(e))
-                continue
+                        if is_visible and is_enabled:
+                            await login_button.click()
+                            attempt.hit()
+                            login_clicked = True
+                            logger.info("Login button clicked successfully with selector: {}", selector)
+                            break
+                        else:
+                            logger.warning("Login button found but not clickable. Visible: {}, Enabled: {}", is_visible, is_enabled)
+                except Exception as e:
+                    logger.debug("Failed with login button selector {}: {}", selector, str(e))
+                    continue
         
         if not login_clicked:
             # ボタンが無効化されている場合があるので、Enterキーを試す
@@ -208,7 +259,7 @@ async def perform_login_flow(page):
                 login_clicked = True
                 logger.info("Login submitted using Enter key")
             except:
-                await page.screenshot(path="debug_login_button_error.png")
+                await page.screenshot(path=debug_screenshot_path("debug_login_button_error.png"))
                 raise Exception("Could not click login button")
         
         # ログイン完了を待つ
@@ -220,15 +271,16 @@ async def perform_login_flow(page):
         
         # ログイン成功を確認
         current_url = page.url
-        if "instagram.com" in current_url and "login" not in current_url:
+        if is_instagram_url(current_url) and "login" not in current_url:
             logger.info("Login flow completed successfully! Current URL: {}", current_url)
         else:
             logger.warning("Login may have failed. Current URL: {}", current_url)
-            await page.screenshot(path="debug_login_result.png")
+            await page.screenshot(path=debug_screenshot_path("debug_login_result.png"))
+            raise Exception(f"Login did not complete, still at {current_url}")
         
     except Exception as e:
         logger.error("Error in login flow: {}", str(e))
-        await page.screenshot(path="debug_login_flow_error.png")
+        await page.screenshot(path=debug_screenshot_path("debug_login_flow_error.png"))
         raise
 
 
@@ -245,15 +297,17 @@ async def handle_post_login_popups(page):
             'div[role="button"]:has-text("Not Now")'
         ]
         
-        for selector in skip_selectors:
-            try:
-                skip_button = await page.wait_for_selector(selector, timeout=3000)
-                if skip_button:
-                    await skip_button.click()
-                    await asyncio.sleep(WAIT_SEC * 2)
-                    logger.info("Handled post-login popup")
-            except:
-                continue
+        for selector in SELECTOR_REGISTRY.ordered("post_login_popup", skip_selectors):
+            with SELECTOR_REGISTRY.attempt("post_login_popup", selector) as attempt:
+                try:
+                    skip_button = await page.wait_for_selector(selector, timeout=3000)
+                    if skip_button:
+                        await skip_button.click()
+                        attempt.hit()
+                        await asyncio.sleep(WAIT_SEC * 2)
+                        logger.info("Handled post-login popup")
+                except:
+                    continue
                 
     except Exception as e:
         logger.debug("Error handling post-login popups: {}", str(e))
@@ -261,7 +315,7 @@ async def handle_post_login_popups(page):
 
 async def navigate_to_user_reels(page, username: str):
     """指定したユーザーのリールページに遷移"""
-    reels_url = f"https://www.instagram.com/{username}/reels/"
+    reels_url = instagram_url(f"/{username}/reels/")
     logger.info("Navigating to user reels page: {}", reels_url)
     
     max_retries = 3
@@ -270,24 +324,17 @@ async def navigate_to_user_reels(page, username: str):
         try:
             logger.info("Navigation attempt {}/{} to {}", attempt + 1, max_retries, reels_url)
             
-            # より緩い条件でページ読み込みを試行
-            try:
-                await page.goto(reels_url, wait_until="domcontentloaded", timeout=15000)
-                logger.info("Page loaded with domcontentloaded")
-            except Exception as domload_error:
-                logger.warning("domcontentloaded failed: {}, trying with load", str(domload_error))
-                try:
-                    await page.goto(reels_url, wait_until="load", timeout=20000)
-                    logger.info("Page loaded with load")
-                except Exception as load_error:
-                    logger.warning("load failed: {}, trying without wait condition", str(load_error))
-                    await page.goto(reels_url, timeout=25000)
-                    logger.info("Page loaded without wait condition")
+            # 直近の遷移時間から決めたタイムアウトで読み込む（取得できないページは再試行しない）
+            await NAVIGATION.goto(page, reels_url)
             
-            # ページ読み込み後の追加待機
-            await asyncio.sleep(WAIT_SEC * 2)
+            # ログイン画面に飛ばされた場合はセッションを確認し直してから再試行
+            if is_login_wall(page.url):
+                count_retry("navigation", "login_wall")
+                await handle_login_wall(page)
+                raise Exception(f"Redirected to login page: {page.url}")
             
-            # リールが実際に存在するかチェック
+            # リールが実際に存在するかチェック（固定待機ではなく要素の出現を待つ）
+            indicator_started = time.monotonic()
             reel_indicators = [
                 'a[href*="/reel/"]',
                 'article',
@@ -296,15 +343,18 @@ async def navigate_to_user_reels(page, username: str):
             ]
             
             reel_found = False
-            for indicator in reel_indicators:
-                try:
-                    await page.wait_for_selector(indicator, timeout=5000)
-                    reel_found = True
-                    logger.info("Found reel indicator: {}", indicator)
-                    break
-                except:
-                    continue
+            for indicator in SELECTOR_REGISTRY.ordered("profile_ready", reel_indicators):
+                with SELECTOR_REGISTRY.attempt("profile_ready", indicator) as probe:
+                    try:
+                        await page.wait_for_selector(indicator, timeout=5000)
+                        probe.hit()
+                        reel_found = True
+                        logger.info("Found reel indicator: {}", indicator)
+                        break
+                    except:
+                        continue
             
+            record_wait("profile_grid", time.monotonic() - indicator_started, WAIT_SEC * 4, reel_found)
             if not reel_found:
                 logger.warning("No reel indicators found, but page loaded")
             
@@ -312,20 +362,21 @@ async def navigate_to_user_reels(page, username: str):
             current_url = page.url
             if username in current_url:
                 logger.info("Successfully navigated to {}'s reels page (attempt {})", username, attempt + 1)
-                
-                # 追加の安定化待機
-                await asyncio.sleep(WAIT_SEC * 2)
                 return
             else:
                 logger.warning("Navigation may have failed. Current URL: {} (attempt {})", current_url, attempt + 1)
                 if attempt < max_retries - 1:
+                    count_retry("navigation", "wrong_url")
                     await asyncio.sleep(WAIT_SEC * 2)
                     continue
                     
+        except (AccountQuarantinedError, TerminalPageError):
+            raise
         except Exception as e:
             logger.error("Navigation attempt {} failed: {}", attempt + 1, str(e))
             if attempt < max_retries - 1:
                 logger.info("Retrying navigation after {} seconds...", WAIT_SEC * 3)
+                count_retry("navigation", "error")
                 await asyncio.sleep(WAIT_SEC * 3)
                 continue
             else:
@@ -335,7 +386,7 @@ async def navigate_to_user_reels(page, username: str):
 
 async def navigate_to_hashtag_reels(page, hashtag: str):
     """指定したハッシュタグのリールページに遷移"""
-    hashtag_url = f"https://www.instagram.com/explore/tags/{hashtag}/"
+    hashtag_url = instagram_url(f"/explore/tags/{hashtag}/")
     logger.info("Navigating to hashtag page: {}", hashtag_url)
     
     max_retries = 3
@@ -344,24 +395,17 @@ async def navigate_to_hashtag_reels(page, hashtag: str):
         try:
             logger.info("Hashtag navigation attempt {}/{} to {}", attempt + 1, max_retries, hashtag_url)
             
-            # より緩い条件でページ読み込みを試行
-            try:
-                await page.goto(hashtag_url, wait_until="domcontentloaded", timeout=15000)
-                logger.info("Hashtag page loaded with domcontentloaded")
-            except Exception as domload_error:
-                logger.warning("domcontentloaded failed for hashtag: {}, trying with load", str(domload_error))
-                try:
-                    await page.goto(hashtag_url, wait_until="load", timeout=20000)
-                    logger.info("Hashtag page loaded with load")
-                except Exception as load_error:
-                    logger.warning("load failed for hashtag: {}, trying without wait condition", str(load_error))
-                    await page.goto(hashtag_url, timeout=25000)
-                    logger.info("Hashtag page loaded without wait condition")
+            # 直近の遷移時間から決めたタイムアウトで読み込む（取得できないページは再試行しない）
+            await NAVIGATION.goto(page, hashtag_url)
             
-            # ページ読み込み後の追加待機
-            await asyncio.sleep(WAIT_SEC * 2)
+            # ログイン画面に飛ばされた場合はセッションを確認し直してから再試行
+            if is_login_wall(page.url):
+                count_retry("navigation", "login_wall")
+                await handle_login_wall(page)
+                raise Exception(f"Redirected to login page: {page.url}")
             
-            # ハッシュタグページの要素確認
+            # ハッシュタグページの要素確認（固定待機ではなく要素の出現を待つ）
+            indicator_started = time.monotonic()
             hashtag_indicators = [
                 'article',
                 'div[role="main"]',
@@ -371,15 +415,18 @@ async def navigate_to_hashtag_reels(page, hashtag: str):
             ]
             
             element_found = False
-            for indicator in hashtag_indicators:
-                try:
-                    await page.wait_for_selector(indicator, timeout=5000)
-                    element_found = True
-                    logger.info("Found hashtag page indicator: {}", indicator)
-                    break
-                except:
-                    continue
+            for indicator in SELECTOR_REGISTRY.ordered("hashtag_ready", hashtag_indicators):
+                with SELECTOR_REGISTRY.attempt("hashtag_ready", indicator) as probe:
+                    try:
+                        await page.wait_for_selector(indicator, timeout=5000)
+                        probe.hit()
+                        element_found = True
+                        logger.info("Found hashtag page indicator: {}", indicator)
+                        break
+                    except:
+                        continue
             
+            record_wait("hashtag_page", time.monotonic() - indicator_started, WAIT_SEC * 2, element_found)
             if not element_found:
                 logger.warning("No hashtag page indicators found, but page loaded")
             
@@ -393,18 +440,21 @@ async def navigate_to_hashtag_reels(page, hashtag: str):
             ]
             
             tab_clicked = False
-            for selector in reels_tab_selectors:
-                try:
-                    reels_tab = await page.wait_for_selector(selector, timeout=5000)
-                    if reels_tab:
-                        await reels_tab.click()
-                        await asyncio.sleep(WAIT_SEC * 2)
-                        logger.info("Clicked reels tab for hashtag #{}", hashtag)
-                        tab_clicked = True
-                        break
-                except Exception as tab_error:
-                    logger.debug("Failed to click tab with selector {}: {}", selector, str(tab_error))
-                    continue
+            for selector in SELECTOR_REGISTRY.ordered("hashtag_reels_tab", reels_tab_selectors):
+                with SELECTOR_REGISTRY.attempt("hashtag_reels_tab", selector) as probe:
+                    try:
+                        reels_tab = await page.wait_for_selector(selector, timeout=5000)
+                        if reels_tab:
+                            await reels_tab.click()
+                            # リールのグリッドが表示されるまで待機
+                            await wait_for_any_selector(page, ['a[href*="/reel/"]'], "hashtag_reels_tab", WAIT_SEC * 4)
+                            logger.info("Clicked reels tab for hashtag #{}", hashtag)
+                            probe.hit()
+                            tab_clicked = True
+                            break
+                    except Exception as tab_error:
+                        logger.debug("Failed to click tab with selector {}: {}", selector, str(tab_error))
+                        continue
             
             if not tab_clicked:
                 logger.warning("Could not find or click reels tab for hashtag #{}", hashtag)
@@ -413,18 +463,21 @@ async def navigate_to_hashtag_reels(page, hashtag: str):
             current_url = page.url
             if hashtag in current_url:
                 logger.info("Successfully navigated to hashtag #{} page (attempt {})", hashtag, attempt + 1)
-                await asyncio.sleep(WAIT_SEC * 2)
                 return
             else:
                 logger.warning("Hashtag navigation may have failed. Current URL: {} (attempt {})", current_url, attempt + 1)
                 if attempt < max_retries - 1:
+                    count_retry("navigation", "wrong_url")
                     await asyncio.sleep(WAIT_SEC * 2)
                     continue
         
+        except (AccountQuarantinedError, TerminalPageError):
+            raise
         except Exception as e:
             logger.error("Hashtag navigation attempt {} failed: {}", attempt + 1, str(e))
             if attempt < max_retries - 1:
                 logger.info("Retrying hashtag navigation after {} seconds...", WAIT_SEC * 3)
+                count_retry("navigation", "error")
                 await asyncio.sleep(WAIT_SEC * 3)
                 continue
             else:
@@ -432,12 +485,23 @@ async def navigate_to_hashtag_reels(page, hashtag: str):
                 raise
 
 
-async def scrape_user_reels_from_page(page, username: str, max_items: int, columns: List[str]) -> List[Dict]:
-    """現在のページからユーザーのリールをスクレイピング"""
+async def scrape_user_reels_from_page(page, username: str, max_items: int, columns: List[str], collector: Optional[ReelResponseCollector] = None, on_row: Optional[Callable[[Dict], None]] = None, window: Optional[IncrementalWindow] = None, checkpoint: Optional[Callable[[object], Awaitable[object]]] = None) -> List[Dict]:
+    """現在のページからユーザーのリールをスクレイピング
+
+    ``on_row`` が渡された場合、各リールの結果はリストに溜めずに取得するたびに渡す
+    （戻り値は空のリストになる）。
+    ``window`` が渡された場合は前回までに取得済み、または期限より古いリールに
+    到達した時点で巡回を止め、新しいリールだけを結果にする。
+    ``checkpoint(page)`` が渡された場合は次のリールに移る前に毎回呼び、返されたページ
+    （開き直した場合は現在のリールを開いた新しいページ）で巡回を続ける。
+    """
     logger.info("Starting scraping process for user: {}", username)
     results = []
+    collected = 0
     
     try:
+        # 最初のリールの特定からクリックによる遷移までをfirst_reel_clickとして計測する
+        first_reel_started = time.monotonic()
         # 最初のリールをクリック（画像で指示された左上のリール）
         first_reel_selectors = [
             # 提供されたHTMLに基づく最も具体的なセレクター
@@ -469,35 +533,39 @@ async def scrape_user_reels_from_page(page, username: str, max_items: int, colum
         
         if reel_count == 0:
             logger.error("No reel links found on the page for user: {}", username)
+            observe_stage("first_reel_click", time.monotonic() - first_reel_started, "error")
             return results
         
         # 最初のリールを特定してクリック
-        for i, selector in enumerate(first_reel_selectors):
-            try:
-                logger.info("Trying selector {}: {}", i + 1, selector)
-                first_reel = await page.wait_for_selector(selector, timeout=5000)
-                if first_reel:
-                    # 要素が表示されているか確認
-                    is_visible = await first_reel.is_visible()
-                    is_enabled = await first_reel.is_enabled()
+        for i, selector in enumerate(SELECTOR_REGISTRY.ordered("first_reel", first_reel_selectors)):
+            with SELECTOR_REGISTRY.attempt("first_reel", selector) as attempt:
+                try:
+                    logger.info("Trying selector {}: {}", i + 1, selector)
+                    first_reel = await page.wait_for_selector(selector, timeout=5000)
+                    if first_reel:
+                        # 要素が表示されているか確認
+                        is_visible = await first_reel.is_visible()
+                        is_enabled = await first_reel.is_enabled()
                     
-                    if is_visible and is_enabled:
-                        # リールのhrefを取得してログ出力
-                        href = await first_reel.get_attribute('href')
-                        logger.info("Found first reel with selector: {} (href: {})", selector, href)
-                        break
-                    else:
-                        logger.warning("Reel element found but not clickable (visible: {}, enabled: {})", is_visible, is_enabled)
-                        first_reel = None
-            except Exception as e:
-                logger.debug("Selector {} failed: {}", selector, str(e))
-                continue
+                        if is_visible and is_enabled:
+                            # リールのhrefを取得してログ出力
+                            href = await first_reel.get_attribute('href')
+                            attempt.hit()
+                            logger.info("Found first reel with selector: {} (href: {})", selector, href)
+                            break
+                        else:
+                            logger.warning("Reel element found but not clickable (visible: {}, enabled: {})", is_visible, is_enabled)
+                            first_reel = None
+                except Exception as e:
+                    logger.debug("Selector {} failed: {}", selector, str(e))
+                    continue
         
         if not first_reel:
             logger.error("Could not find clickable first reel for user: {}", username)
+            observe_stage("first_reel_click", time.monotonic() - first_reel_started, "error")
             # デバッグ用：スクリーンショットを保存
             try:
-                screenshot_path = f"debug_reel_list_{username}.png"
+                screenshot_path = debug_screenshot_path(f"debug_reel_list_{username}.png")
                 await page.screenshot(path=screenshot_path)
                 logger.info("Saved debug screenshot: {}", screenshot_path)
             except:
@@ -509,9 +577,10 @@ async def scrape_user_reels_from_page(page, username: str, max_items: int, colum
             logger.info("Clicking first reel...")
             
             # 通常のクリックを試行
+            grid_url = page.url
             try:
                 await first_reel.click()
-                await asyncio.sleep(WAIT_SEC * 2)
+                await wait_for_url_change(page, grid_url, "first_reel_click", WAIT_SEC * 2)
                 
                 # クリック後のURL確認
                 current_url = page.url
@@ -522,6 +591,7 @@ async def scrape_user_reels_from_page(page, username: str, max_items: int, colum
                     
             except Exception as normal_click_error:
                 logger.warning("Normal click failed: {}, trying JavaScript click", str(normal_click_error))
+                count_retry("first_reel_click", "js_click")
                 
                 # JavaScriptによる強制クリック
                 try:
@@ -529,17 +599,17 @@ async def scrape_user_reels_from_page(page, username: str, max_items: int, colum
                     if href:
                         # JavaScriptで直接要素をクリック
                         await page.evaluate('(element) => element.click()', first_reel)
-                        await asyncio.sleep(WAIT_SEC * 2)
+                        await wait_for_url_change(page, grid_url, "first_reel_js_click", WAIT_SEC * 2)
                         
                         current_url = page.url
                         if "/reel/" in current_url:
                             logger.info("Successfully navigated to reel detail page via JavaScript click: {}", current_url)
                         else:
                             # 最後の手段：直接URLに遷移
-                            full_url = f"https://www.instagram.com{href}" if href.startswith('/') else href
+                            full_url = instagram_url(href) if href.startswith('/') else href
                             logger.info("Trying direct navigation to: {}", full_url)
+                            count_retry("first_reel_click", "direct_goto")
                             await page.goto(full_url, wait_until="networkidle")
-                            await asyncio.sleep(WAIT_SEC * 3)
                             
                             current_url = page.url
                             if "/reel/" in current_url:
@@ -552,53 +622,75 @@ async def scrape_user_reels_from_page(page, username: str, max_items: int, colum
                 except Exception as js_click_error:
                     logger.error("JavaScript click also failed: {}", str(js_click_error))
                     raise js_click_error
-            
-            await asyncio.sleep(WAIT_SEC * 2)  # 追加の待機時間
                 
         except Exception as e:
             logger.error("All click methods failed for first reel: {}", str(e))
+            observe_stage("first_reel_click", time.monotonic() - first_reel_started, "error")
             # デバッグ用スクリーンショット
             try:
-                screenshot_path = f"debug_click_failed_{username}.png"
+                screenshot_path = debug_screenshot_path(f"debug_click_failed_{username}.png")
                 await page.screenshot(path=screenshot_path)
                 logger.info("Saved debug screenshot after click failure: {}", screenshot_path)
             except:
                 pass
             return results
         
+        observe_stage("first_reel_click", time.monotonic() - first_reel_started)
+
         # 各リールから情報を取得
         for i in range(max_items):
             logger.info("Scraping reel {}/{} for user {}", i + 1, max_items, username)
+            # アカウントのリール取得予算を消費（空なら補充まで待つ）
+            await spend_budget()
             
-            reel_data = await scrape_reel_details(page, username, columns)
-            if reel_data:
-                results.append(reel_data)
+            with span("reel_extraction") as extraction:
+                reel_data = await scrape_reel_details(page, username, columns, collector)
+                if not reel_data:
+                    extraction.fail()
+            verdict = window.classify(i, reel_data) if reel_data and window else "new"
+            if verdict == "stop":
+                logger.info("Reached already scraped or cut-off reel {} for {}, stopping", reel_data["url"], username)
+                break
+            if reel_data and verdict == "new":
+                if on_row is not None:
+                    on_row(reel_data)
+                else:
+                    results.append(reel_data)
+                collected += 1
                 logger.info("Successfully scraped reel {} data", i + 1)
             
             # 最後のリールでない場合は次に移動
             if i < max_items - 1:
-                if not await navigate_to_next_reel(page):
+                if checkpoint is not None:
+                    page = await checkpoint(page)
+                with span("next_navigation") as navigation:
+                    moved = await navigate_to_next_reel(page)
+                    if not moved:
+                        navigation.fail()
+                if not moved:
                     logger.warning("Could not navigate to next reel, stopping at reel {}", i + 1)
                     break
             
-            await asyncio.sleep(random.uniform(WAIT_SEC, WAIT_SEC * 2))
+            await politeness_delay()
         
-        logger.info("Completed scraping user {}: {} reels collected", username, len(results))
+        logger.info("Completed scraping user {}: {} reels collected", username, collected)
         
+    except AccountQuarantinedError:
+        raise
     except Exception as e:
         logger.error("Error scraping user reels: {}", str(e))
     
     return results
 
 
-async def scrape_hashtag_reels_from_page(page, hashtag: str, max_items: int, columns: List[str]) -> List[Dict]:
+async def scrape_hashtag_reels_from_page(page, hashtag: str, max_items: int, columns: List[str], collector: Optional[ReelResponseCollector] = None, on_row: Optional[Callable[[Dict], None]] = None, window: Optional[IncrementalWindow] = None, checkpoint: Optional[Callable[[object], Awaitable[object]]] = None) -> List[Dict]:
     """現在のページからハッシュタグのリールをスクレイピング"""
     logger.info("Starting scraping process for hashtag: #{}", hashtag)
     results = []
     
     try:
         # ハッシュタグページでの処理は基本的にユーザーページと同じ
-        return await scrape_user_reels_from_page(page, f"#{hashtag}", max_items, columns)
+        return await scrape_user_reels_from_page(page, f"#{hashtag}", max_items, columns, collector, on_row, window, checkpoint)
         
     except Exception as e:
         logger.error("Error scraping hashtag reels: {}", str(e))
@@ -606,35 +698,36 @@ async def scrape_hashtag_reels_from_page(page, hashtag: str, max_items: int, col
 
 
 async def navigate_to_next_reel(page) -> bool:
-    """次のリールに移動する"""
+    """次のリールに移動する
+
+    クリック後は固定時間待つのではなく、URLが次のリールに変わるのを待つ。
+    URLが変わらなかった場合は次の方法を試す。
+    """
     try:
+        previous_url = page.url
+
         # 複数の次へボタンセレクターを試す
-        next_selectors = [
-            'button[aria-label="Next"], button[aria-label="次へ"]',
-            'svg[aria-label="Next"], svg[aria-label="次へ"]',
-            'button:has(svg[aria-label="Next"]), button:has(svg[aria-label="次へ"])',
-            'div[role="button"]:has(svg[aria-label="Next"])',
-            'div[role="button"]:has(svg[aria-label="次へ"])',
-            # 右矢印のアイコンを探す
-            'button svg[viewBox*="24"][d*="m15.5"]',
-            'div[role="button"] svg[viewBox*="24"][d*="m15.5"]'
-        ]
-        
-        for selector in next_selectors:
-            try:
-                next_button = await page.wait_for_selector(selector, timeout=3000)
-                if next_button:
-                    await next_button.click()
-                    await asyncio.sleep(WAIT_SEC * 2)
-                    return True
-            except:
-                continue
+        # URLの変化を待つのは以前の固定待機（WAIT_SEC * 2）までにする。リストの最後などで変わらない場合に長く待たない
+        for selector in SELECTOR_REGISTRY.ordered("next_button", NEXT_REEL_SELECTORS):
+            with SELECTOR_REGISTRY.attempt("next_button", selector) as attempt:
+                try:
+                    next_button = await page.wait_for_selector(selector, timeout=3000)
+                    if next_button:
+                        await next_button.click()
+                        if await wait_for_url_change(page, previous_url, "next_reel", WAIT_SEC * 2, timeout=WAIT_SEC * 2):
+                            attempt.hit()
+                            return True
+                        # クリックできても移動しないなら、他のボタンやキー操作でも移動しない
+                        logger.warning("Next button clicked but URL did not change: {}", selector)
+                        return False
+                except:
+                    continue
         
         # キーボードショートカットも試す
         try:
+            count_retry("next_navigation", "arrow_key")
             await page.keyboard.press('ArrowRight')
-            await asyncio.sleep(WAIT_SEC * 2)
-            return True
+            return await wait_for_url_change(page, previous_url, "next_reel_arrow_key", WAIT_SEC * 2, timeout=WAIT_SEC * 2)
         except:
             pass
             
@@ -645,167 +738,98 @@ async def navigate_to_next_reel(page) -> bool:
         return False
 
 
-async def scrape_reel_details(page, source: str, columns: List[str]) -> Dict:
-    """現在表示されているリールの詳細情報を取得"""
+async def extract_dom_fields(page, fields: List[str]) -> Dict[str, str]:
+    """DOMからリールの項目を取得（DOM_BATCH_EXTRACTIONが有効なら1回のevaluateで取得）"""
+    if DOM_BATCH_EXTRACTION:
+        try:
+            return await extract_fields_batched(page, fields)
+        except Exception as e:
+            logger.debug("Batched DOM extraction failed, falling back to per-element: {}", str(e))
+    return await extract_fields_per_element(page, fields)
+
+
+def reel_fields_for(columns: List[str]) -> List[str]:
+    """リール1件について取得する項目（既定の項目と選択されたカウント系カラム）"""
+    return ["caption", "posted_at"] + [col for col in ("likes", "video_view_count", "comments") if col in columns]
+
+
+def build_reel_row(url: str, source: str, fields: Dict, columns: List[str]) -> Dict:
+    """取得した項目からCSVの1行を組み立てる"""
+    reel_data = {
+        "url": url,
+        "title": source,
+        "caption": fields.get("caption", ""),
+        "posted_at": fields.get("posted_at", "")
+    }
+    
+    # 選択されたカラムのみ追加
+    if "likes" in columns:
+        reel_data["likes"] = fields.get("likes", "")
+    if "comments" in columns:
+        reel_data["comments"] = fields.get("comments", "")
+    if "video_view_count" in columns:
+        reel_data["video_view_count"] = fields.get("video_view_count", "")
+    return reel_data
+
+
+def cached_reel_row(url: str, source: str, columns: List[str]) -> Optional[Dict]:
+    """全項目がキャッシュ上で有効期限内なら、リールを開かずに行を返す"""
+    shortcode = shortcode_from_url(url)
+    needed = reel_fields_for(columns)
+    # 一部だけ有効な場合はscrape_reel_detailsで改めて数えるため、ここでは統計に記録しない
+    cached = REEL_CACHE.lookup(shortcode, needed, record=False)
+    if len(cached) < len(needed):
+        return None
+    REEL_CACHE.record_reel_from_cache(len(needed))
+    logger.info("Reel {} served from cache", url)
+    return build_reel_row(url, source, cached, columns)
+
+
+async def scrape_reel_details(page, source: str, columns: List[str], collector: Optional[ReelResponseCollector] = None) -> Dict:
+    """現在表示されているリールの詳細情報を取得
+
+    キャッシュに有効期限内の値がある項目はそれを使い、残りの項目だけを取得する。
+    ``collector`` が渡された場合はInstagramのAPIレスポンスから値を取り、
+    レスポンスに含まれなかった項目だけをDOMセレクターで補完する。
+    """
     try:
-        # ページが完全に読み込まれるまで待機
-        await asyncio.sleep(WAIT_SEC * 2)
-        
         # 現在のURLを取得
         current_url = page.url
+        shortcode = shortcode_from_url(current_url)
+        needed = reel_fields_for(columns)
+        cached = REEL_CACHE.lookup(shortcode, needed)
+        to_fetch = [field for field in needed if field not in cached]
         
-        # キャプションを取得
-        caption = ""
-        try:
-            # より具体的なキャプションセレクター
-            caption_selectors = [
-                'div[data-testid="post-caption"] span',
-                'article div[role="button"] span',
-                'div[dir="auto"] span',
-                'h1 + div span',
-                'span[style*="word-wrap"]'
-            ]
+        network_data = {}
+        dom_data = {}
+        if to_fetch:
+            settle_sec = WAIT_SEC * 2
+            if collector is not None:
+                started = time.monotonic()
+                if shortcode:
+                    network_data = await collector.wait_for(shortcode, timeout=settle_sec) or {}
+                settle_sec = max(0.0, settle_sec - (time.monotonic() - started))
             
-            for selector in caption_selectors:
-                try:
-                    caption_elements = await page.query_selector_all(selector)
-                    for element in caption_elements:
-                        text = await element.text_content()
-                        if text and len(text.strip()) > 20:  # 十分な長さのテキスト
-                            caption = text.strip()
-                            break
-                    if caption:
-                        break
-                except:
-                    continue
-        except Exception as e:
-            logger.debug("Could not find caption: {}", str(e))
-        
-        # いいね数を取得
-        likes = ""
-        if "likes" in columns:
-            try:
-                # いいねボタンやテキストを探す
-                likes_selectors = [
-                    'button[aria-label*="いいね"] span',
-                    'button[aria-label*="like"] span', 
-                    'section[role="tablist"] + div button span',
-                    'svg[aria-label*="いいね"] + span',
-                    'svg[aria-label*="like"] + span'
-                ]
-                
-                for selector in likes_selectors:
-                    try:
-                        likes_elements = await page.query_selector_all(selector)
-                        for element in likes_elements:
-                            text = await element.text_content()
-                            if text:
-                                # 数字を抽出（K、M表記も考慮）
-                                likes_match = re.search(r'([\d,]+(?:\.\d+)?[KkMm]?)', text)
-                                if likes_match:
-                                    likes = likes_match.group(1)
-                                    break
-                        if likes:
-                            break
-                    except:
-                        continue
-            except Exception as e:
-                logger.debug("Could not find likes: {}", str(e))
-        
-        # 動画再生回数を取得
-        video_view_count = ""
-        if "video_view_count" in columns:
-            try:
-                view_selectors = [
-                    'span:has-text("回再生")',
-                    'span:has-text("views")',
-                    'div:has-text("回再生")',
-                    'div:has-text("views")',
-                    'div[role="button"] span:has-text("回")',
-                    'div[role="button"] span:has-text("view")'
-                ]
-                
-                for selector in view_selectors:
-                    try:
-                        view_elements = await page.query_selector_all(selector)
-                        for element in view_elements:
-                            text = await element.text_content()
-                            if text and ("再生" in text or "view" in text):
-                                # 数字を抽出（K、M表記も考慮）
-                                view_match = re.search(r'([\d,]+(?:\.\d+)?[KkMm]?)', text)
-                                if view_match:
-                                    video_view_count = view_match.group(1)
-                                    break
-                        if video_view_count:
-                            break
-                    except:
-                        continue
-            except Exception as e:
-                logger.debug("Could not find video view count: {}", str(e))
+            missing = [field for field in to_fetch if field not in network_data]
+            if missing:
+                # DOMから取得する項目があるため、表示中のリールの投稿時間リンクが描画されるまで待機
+                # （前のリールの要素を読まないよう、現在のショートコードを含むリンクを待つ）
+                if shortcode and settle_sec > 0:
+                    await wait_for_any_selector(page, [f'a[href*="/{shortcode}/"] time'], "reel_content", WAIT_SEC * 2, timeout=settle_sec)
+                dom_data = await extract_dom_fields(page, missing)
+            
+            # APIレスポンスの値は空でもそのまま、DOMの値は取得できたものだけキャッシュする
+            fetched = {field: value for field, value in dom_data.items() if value}
+            fetched.update({field: value for field, value in network_data.items() if field in DEFAULT_TTL_SEC and value is not None})
+            REEL_CACHE.store(shortcode, fetched)
         
-        # コメント数を取得
-        comments = ""
-        if "comments" in columns:
-            try:
-                comment_selectors = [
-                    'button[aria-label*="コメント"] span',
-                    'button[aria-label*="comment"] span',
-                    'svg[aria-label*="コメント"] + span',
-                    'svg[aria-label*="comment"] + span',
-                    'section[role="tablist"] + div button:nth-child(2) span'
-                ]
-                
-                for selector in comment_selectors:
-                    try:
-                        comment_elements = await page.query_selector_all(selector)
-                        for element in comment_elements:
-                            text = await element.text_content()
-                            if text:
-                                # 数字を抽出（K、M表記も考慮）
-                                comment_match = re.search(r'([\d,]+(?:\.\d+)?[KkMm]?)', text)
-                                if comment_match:
-                                    comments = comment_match.group(1)
-                                    break
-                        if comments:
-                            break
-                    except:
-                        continue
-            except Exception as e:
-                logger.debug("Could not find comments: {}", str(e))
+        fields = {**cached, **dom_data, **network_data}
+        reel_data = build_reel_row(current_url, source, fields, columns)
+        caption = reel_data["caption"]
         
-        # 投稿時間を取得
-        posted_at = ""
-        try:
-            time_elements = await page.query_selector_all('time')
-            for element in time_elements:
-                datetime_attr = await element.get_attribute('datetime')
-                title_attr = await element.get_attribute('title')
-                if datetime_attr:
-                    posted_at = datetime_attr
-                    break
-                elif title_attr:
-                    posted_at = title_attr
-                    break
-        except Exception as e:
-            logger.debug("Could not find posted time: {}", str(e))
-        
-        reel_data = {
-            "url": current_url,
-            "title": source,
-            "caption": caption,
-            "posted_at": posted_at
-        }
-        
-        # 選択されたカラムのみ追加
-        if "likes" in columns:
-            reel_data["likes"] = likes
-        if "comments" in columns:
-            reel_data["comments"] = comments
-        if "video_view_count" in columns:
-            reel_data["video_view_count"] = video_view_count
-        
-        logger.info("Scraped reel data: URL={}, Likes={}, Views={}, Comments={}, Caption preview={}", 
-                   current_url, likes, video_view_count, comments, caption[:50] + "..." if len(caption) > 50 else caption)
+        logger.info("Scraped reel data: URL={}, Likes={}, Views={}, Comments={}, Caption preview={} ({} fields from cache)", 
+                   current_url, fields.get("likes", ""), fields.get("video_view_count", ""), fields.get("comments", ""),
+                   caption[:50] + "..." if len(caption) > 50 else caption, len(cached))
         
         return reel_data
         
@@ -814,71 +838,416 @@ async def scrape_reel_details(page, source: str, columns: List[str]) -> Dict:
         return None
 
 
-async def scrape_job(job_id: str, usernames: List[str], hashtags: List[str], max_items: int, columns: List[str], progress: Dict[str, Dict]):
-    """Instagram リールスクレイピングジョブ - 明確なプロセスで実行"""
+async def scrape_job(job_id: str, usernames: List[str], hashtags: List[str], max_items: int, columns: List[str], progress: Dict[str, Dict], pool=None, concurrency: int = 1, extraction: str = DEFAULT_EXTRACTION, mode: str = DEFAULT_MODE, incremental: bool = False, since: Optional[str] = None, account=None, export_format: str = DEFAULT_EXPORT_FORMAT, attempt: Optional[str] = None):
+    """Instagram リールスクレイピングジョブ - 明確なプロセスで実行
+
+    ``pool`` (BrowserPool) が渡された場合はウォーム済みのコンテキストを借りて使い、
+    渡されない場合はジョブごとにブラウザを起動する。
+    ``concurrency`` は同時に使うページ数、``extraction`` はメタデータの取得方法、
+    ``mode`` はリールの辿り方（run_scrape参照）。
+    ``incremental`` が真なら前回の実行以降の新しいリールだけを取得し、
+    ``since`` (ISO 8601) より前に投稿されたリールは出力しない。
+    ``account`` (scraper/accounts.py) が渡された場合はそのアカウントの認証情報・
+    セッション・取得予算を使う。ジョブ中にアカウントが隔離された場合は
+    AccountQuarantinedErrorを送出し、途中までの出力は破棄する。
+    ``export_format`` (scraper/export.py の EXPORT_FORMATS) が csv 以外なら、
+    完成したCSVをその形式に変換して置き換える。
+    ``attempt`` (ワーカーがジョブを取り出すたびに変わる識別子) を渡すと、
+    途中結果と結果ファイルをその実行専用の名前 ``<job_id>.<attempt>.*`` で書き出す。
+    """
     logger.info("Starting scrape job {}", job_id)
-    progress[job_id] = {"progress": 0, "status": "running"}
+    progress[job_id] = {"progress": 0, "status": "running", "rows": 0}
+    if attempt:
+        # 実行中の途中結果のダウンロード（main.py）がこの実行のパートファイルを見つけられるように
+        progress[job_id]["attempt"] = attempt
+    if account is not None:
+        progress[job_id]["account"] = account.username
+    use_account(account)
+    PROGRESS_EVENTS.publish(job_id, "status", dict(progress[job_id]))
+    wait_stats = start_job_wait_stats()
+    cache_stats = start_job_cache_stats()
+    timings = start_job_timings()
+    job_started = time.monotonic()
+    # 取得した行はメモリに溜めず、ターゲットごとのパートファイルに逐次書き込む
+    output = StreamingCsvWriter(job_id, columns, attempt=attempt)
+    # 差分取得の新しいウォーターマークは、結果のファイルが完成してから保存する
+    # （途中で中断して出力を破棄したジョブの再実行が、取得済みとして新しいリールを飛ばさないように）
+    watermarks: List[Tuple] = []
 
-    results = []
-    total_tasks = len(usernames) + len(hashtags)
-    completed_tasks = 0
+    try:
+        if pool is not None:
+            async with pool.lease() as context:
+                await run_scrape(context, job_id, usernames, hashtags, max_items, columns, progress, output, concurrency, extraction, mode, incremental, since, watermarks)
+        else:
+            async with async_playwright() as p:
+                browser, context = await load_context(p, account)
+                try:
+                    await run_scrape(context, job_id, usernames, hashtags, max_items, columns, progress, output, concurrency, extraction, mode, incremental, since, watermarks)
+                finally:
+                    await browser.close()
+    except AccountQuarantinedError:
+        output.discard()
+        raise
+    except Exception as e:
+        logger.error("Could not obtain a browser for job {}: {}", job_id, str(e))
+        output.finalize()
+        progress[job_id].update({"status": "error", "message": str(e)})
+        record_job("error", output.rows, time.monotonic() - job_started)
+        PROGRESS_EVENTS.publish(job_id, "status", dict(progress[job_id]))
+        return
 
-    async with async_playwright() as p:
-        browser, context = await load_context(p)
-        page = await context.new_page()
-        
-        try:
-            # Step 1: Instagramログインの確認・実行
-            logger.info("Step 1: Verifying Instagram login status...")
-            await verify_login_status(page)
-            
-            # Step 2: ユーザーのリールを取得
-            for username in usernames:
-                logger.info("Step 2: Starting to scrape user: {}", username)
-                
-                # 明確にユーザーのリールページに遷移
-                await navigate_to_user_reels(page, username)
-                
-                # スクレイピング開始
-                user_results = await scrape_user_reels_from_page(page, username, max_items, columns)
-                results.extend(user_results)
-                
-                completed_tasks += 1
-                progress[job_id]["progress"] = int(100 * completed_tasks / total_tasks)
-                logger.info("Completed user {}, progress: {}%", username, progress[job_id]["progress"])
+    # 固定待機をシグナル待ちに置き換えたことで削減できた待ち時間
+    progress[job_id]["wait_stats"] = summarize_wait_stats(wait_stats)
+    logger.info("Job {} readiness waits: {}", job_id, progress[job_id]["wait_stats"])
+    # ジョブ間キャッシュのヒット率
+    progress[job_id]["cache_stats"] = summarize_cache_stats(cache_stats)
+    logger.info("Job {} reel cache: {}", job_id, progress[job_id]["cache_stats"])
 
-            # Step 3: ハッシュタグのリールを取得
-            for hashtag in hashtags:
-                logger.info("Step 3: Starting to scrape hashtag: #{}", hashtag)
-                
-                # ハッシュタグページに遷移
-                await navigate_to_hashtag_reels(page, hashtag)
-                
-                # スクレイピング開始
-                hashtag_results = await scrape_hashtag_reels_from_page(page, hashtag, max_items, columns)
-                results.extend(hashtag_results)
-                
-                completed_tasks += 1
-                progress[job_id]["progress"] = int(100 * completed_tasks / total_tasks)
-                logger.info("Completed hashtag #{}, progress: {}%", hashtag, progress[job_id]["progress"])
-                
+    # パートファイルをターゲット順に結合してCSVを完成させる
+    with span("csv_finalize"):
+        csv_path = output.finalize()
+    if csv_path:
+        for watermark in watermarks:
+            WATERMARKS.set(*watermark)
+    if csv_path and export_format != "csv":
+        try:
+            # 変換は行単位・バッチ単位で行うが、時間がかかるのでイベントループを塞がないようにする
+            with span("export"):
+                result_path = await asyncio.to_thread(export_file, csv_path, export_format)
+            csv_path.unlink()
+            csv_path = result_path
         except Exception as e:
-            logger.error("Error during scraping: {}", str(e))
-        finally:
-            await browser.close()
-
-    # 結果をCSVに保存
-    if results:
-        df = build_dataframe(results, columns)
-        # 現在のファイルの親ディレクトリを基準にしたパスを使用
-        current_file = Path(__file__).resolve()
-        backend_root = current_file.parent.parent  # scraper/ から backend/ へ
-        out_dir = backend_root / "output"
-        out_dir.mkdir(parents=True, exist_ok=True)
-        csv_path = out_dir / f"{job_id}.csv"
-        df.to_csv(csv_path, index=False)
-        progress[job_id].update({"status": "done", "path": str(csv_path)})
-        logger.info("Job {} complete. CSV saved to: {} with {} results", job_id, csv_path, len(results))
+            logger.error("Could not export job {} as {}, keeping CSV: {}", job_id, export_format, str(e))
+    if csv_path:
+        progress[job_id].update({"status": "done", "path": str(csv_path), "rows": output.rows})
+        logger.info("Job {} complete. Output saved to: {} with {} results", job_id, csv_path, output.rows)
     else:
         progress[job_id].update({"status": "error", "message": "No results found"})
-        logger.warning("Job {} completed but no results found", job_id) 
\ No newline at end of file
+        logger.warning("Job {} completed but no results found", job_id)
+    # ステージ別の所要時間（どこで時間を使ったか）
+    progress[job_id]["timings"] = summarize_job_timings(timings)
+    record_job(progress[job_id]["status"], output.rows, time.monotonic() - job_started)
+    logger.info("Job {} timings: {}", job_id, progress[job_id]["timings"])
+    PROGRESS_EVENTS.publish(job_id, "status", dict(progress[job_id]))
+
+
+async def scrape_target(page, kind: str, name: str, max_items: int, columns: List[str], collector: Optional[ReelResponseCollector] = None, on_row: Optional[Callable[[Dict], None]] = None, window: Optional[IncrementalWindow] = None, checkpoint: Optional[Callable[[object], Awaitable[object]]] = None) -> List[Dict]:
+    """1つのターゲット（ユーザーまたはハッシュタグ）のリールを取得"""
+    if kind == "user":
+        # 明確にユーザーのリールページに遷移
+        with span("navigation"):
+            await navigate_to_user_reels(page, name)
+        return await scrape_user_reels_from_page(page, name, max_items, columns, collector, on_row, window, checkpoint)
+
+    # ハッシュタグページに遷移
+    with span("navigation"):
+        await navigate_to_hashtag_reels(page, name)
+    return await scrape_hashtag_reels_from_page(page, name, max_items, columns, collector, on_row, window, checkpoint)
+
+
+async def harvest_reel_urls(page, max_items: int) -> List[str]:
+    """リール一覧（プロフィール・ハッシュタグ）をスクロールしてリールURLを収集
+
+    重複を除き、グリッドの表示順で最大 ``max_items`` 件を返す。
+    """
+    urls: List[str] = []
+    seen = set()
+    idle_scrolls = 0
+
+    while len(urls) < max_items and idle_scrolls < GRID_MAX_IDLE_SCROLLS:
+        hrefs = await page.evaluate(GRID_LINKS_JS)
+        added = 0
+        for href in hrefs:
+            shortcode = shortcode_from_url(href)
+            if not shortcode or shortcode in seen:
+                continue
+            seen.add(shortcode)
+            urls.append(href)
+            added += 1
+            if len(urls) >= max_items:
+                break
+        if len(urls) >= max_items:
+            break
+
+        idle_scrolls = 0 if added else idle_scrolls + 1
+        # 最下部までスクロールし、新しいリンクが読み込まれるのを待つ
+        link_count = len(hrefs)
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        started = time.monotonic()
+        try:
+            await page.wait_for_function(
+                "(count) => document.querySelectorAll('a[href*=\"/reel/\"]').length > count",
+                arg=link_count, timeout=GRID_SCROLL_TIMEOUT_SEC * 1000,
+            )
+            loaded = True
+        except Exception:
+            loaded = False
+        record_wait("grid_scroll", time.monotonic() - started, WAIT_SEC * 2, loaded)
+
+    logger.info("Harvested {} reel URLs from {}", len(urls), page.url)
+    return urls
+
+
+async def discover_target(page, kind: str, name: str, max_items: int) -> List[str]:
+    """ターゲットのリール一覧ページに遷移してリールURLを収集"""
+    with span("navigation"):
+        if kind == "user":
+            await navigate_to_user_reels(page, name)
+        else:
+            await navigate_to_hashtag_reels(page, name)
+    with span("grid_harvest"):
+        return await harvest_reel_urls(page, max_items)
+
+
+async def scrape_reel_url(page, url: str, source: str, columns: List[str], collector: Optional[ReelResponseCollector] = None) -> Optional[Dict]:
+    """リールURLに直接遷移して詳細情報を取得（全項目がキャッシュにあれば遷移しない）"""
+    row = cached_reel_row(url, source, columns)
+    if row:
+        return row
+    await spend_budget()
+    # グリッドモードではURLへの直接遷移が「次のリールへの移動」に当たる
+    with span("next_navigation"):
+        await NAVIGATION.goto(page, url)
+        if is_login_wall(page.url):
+            count_retry("next_navigation", "login_wall")
+            await handle_login_wall(page)
+            await NAVIGATION.goto(page, url)
+    with span("reel_extraction") as extraction:
+        row = await scrape_reel_details(page, source, columns, collector)
+        if not row:
+            extraction.fail()
+    return row
+
+
+async def run_on_pages(pages, items: List, handler) -> None:
+    """``items`` をキューに入れ、各ページが空くたびに ``handler(page, item)`` を実行"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+
+    async def worker(page):
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await handler(page, item)
+
+    tasks = [asyncio.create_task(worker(page)) for page in pages]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # 1つのページで中断が必要なエラーが起きたら、他のページの処理も止める
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def run_scrape(context, job_id: str, usernames: List[str], hashtags: List[str], max_items: int, columns: List[str], progress: Dict[str, Dict], output: StreamingCsvWriter, concurrency: int = 1, extraction: str = DEFAULT_EXTRACTION, mode: str = DEFAULT_MODE, incremental: bool = False, since: Optional[str] = None, watermarks: Optional[List[Tuple]] = None) -> int:
+    """与えられたブラウザコンテキストでユーザー・ハッシュタグをスクレイピング
+
+    ``concurrency`` 個のページで並行処理する（MAX_CONCURRENCYが上限）。
+    ``mode`` が "sequential" の場合はターゲット単位で並行し、各ページで最初のリールから順に辿る。
+    "grid" の場合はまず各ターゲットのグリッドからリールURLを収集し、
+    その後すべてのリールURLを全ページで分担して直接開く。
+    各行は取得した時点で ``output`` に書き込まれ、最終的なCSVは完了順ではなく
+    ユーザー→ハッシュタグの入力順（ターゲット内はグリッド順）になる。書き込んだ行数を返す。
+    進捗はリール単位で更新し、PROGRESS_EVENTSの購読者にイベントとして送る。
+    ``incremental`` / ``since`` が指定された場合は、ターゲットごとのIncrementalWindowで
+    既知のリールに達した時点で止め、差分だけを出力する。新しいウォーターマークは
+    ``watermarks`` が渡されればそこに ``(kind, name, shortcode, posted_at)`` として追加し
+    （保存は呼び出し元が出力の完成後に行う）、渡されなければターゲットの完了時に保存する。
+    各ページはPageRecycler (scraper/recycle.py) が一定のリール数・JSヒープ量で開き直し
+    （"sequential" では巡回中のリールを新しいページで開いて続きから辿る）、
+    そのメモリの推移を進捗の ``memory`` に残す。
+    """
+    targets = [("user", username) for username in usernames] + [("hashtag", hashtag) for hashtag in hashtags]
+    total_tasks = len(targets)
+    started = time.monotonic()
+    # ターゲットごとの完了割合（0.0〜1.0）
+    target_fraction: List[float] = [0.0 for _ in targets]
+    # 差分取得用のターゲットごとのウィンドウ（前回の最新リールと投稿日時の下限）
+    windows: List[Optional[IncrementalWindow]] = [None for _ in targets]
+    if incremental or since:
+        since_at = parse_since(since)
+        for index, (kind, name) in enumerate(targets):
+            windows[index] = IncrementalWindow(WATERMARKS.get(kind, name) if incremental else None, since_at)
+    page_limit = min(concurrency, MAX_CONCURRENCY)
+    if mode != "grid":
+        page_limit = min(page_limit, total_tasks)
+    workers = max(1, page_limit)
+
+    traffic = TrafficMeter()
+    collectors: Dict[int, ReelResponseCollector] = {}
+
+    def attach(slot: PageSlot) -> None:
+        # 開き直したページにも転送量の計測とレスポンスの収集を付ける
+        traffic.attach(slot.page)
+        if extraction == "network":
+            # 巡回中に開き直したページでも、同じスロットの収集器を使い続ける
+            collectors.setdefault(slot.index, ReelResponseCollector()).attach(slot.page)
+
+    # 長いジョブでChromiumのメモリが増え続けないよう、一定のリール数・JSヒープ量でページを開き直す
+    recycler = PageRecycler(context, attach)
+    slots = await recycler.open(workers)
+
+    def label_of(index: int) -> str:
+        kind, name = targets[index]
+        return name if kind == "user" else f"#{name}"
+
+    def update_progress() -> Dict:
+        fraction = sum(target_fraction) / total_tasks if total_tasks else 1.0
+        elapsed = time.monotonic() - started
+        # 残り時間はここまでの平均速度から推定する
+        eta_sec = round(elapsed * (1 - fraction) / fraction, 1) if fraction > 0 else None
+        progress[job_id].update({"progress": int(100 * fraction), "rows": output.rows, "eta_sec": eta_sec})
+        return {"progress": progress[job_id]["progress"], "rows": output.rows, "eta_sec": eta_sec}
+
+    def reel_done(index: int, url: str, expected: int, scraped: bool) -> None:
+        target_fraction[index] = min(1.0, target_fraction[index] + 1 / max(1, expected))
+        event = "reel" if scraped else "reel_skipped"
+        PROGRESS_EVENTS.publish(job_id, event, {"target": label_of(index), "url": url, **update_progress()})
+
+    def report_error(index: int, message: str, url: Optional[str] = None) -> None:
+        PROGRESS_EVENTS.publish(job_id, "scrape_error", {"target": label_of(index), "url": url, "message": message})
+
+    def complete_target(index: int) -> None:
+        target_fraction[index] = 1.0
+        window = windows[index]
+        if window is not None:
+            progress[job_id].setdefault("incremental", {})[label_of(index)] = window.summary()
+            watermark = window.next_watermark() if incremental else None
+            if watermark:
+                entry = (*targets[index], watermark["shortcode"], watermark["posted_at"])
+                if watermarks is not None:
+                    watermarks.append(entry)
+                else:
+                    WATERMARKS.set(*entry)
+        state = update_progress()
+        PROGRESS_EVENTS.publish(job_id, "target_done", {"target": label_of(index), **state})
+        logger.info("Completed {} {}, progress: {}%", targets[index][0], label_of(index), state["progress"])
+
+    async def scrape_sequential(slot: PageSlot, index: int):
+        kind, name = targets[index]
+        logger.info("Starting to scrape {}: {}", kind, label_of(index))
+        position = 0
+
+        def on_row(row: Dict) -> None:
+            nonlocal position
+            with span("csv_write"):
+                output.write_row(index, position, row)
+            REELS.inc()
+            recycler.count_reel(slot)
+            position += 1
+            reel_done(index, row.get("url", ""), max_items, True)
+
+        async def resume_walk(page):
+            # 開き直すときは新しいページで現在のリールを開き、そこから「次へ」で巡回を続ける
+            url = page.url
+
+            async def reopen(new_page) -> None:
+                await NAVIGATION.goto(new_page, url)
+                await new_page.wait_for_selector(", ".join(NEXT_REEL_SELECTORS), timeout=5000)
+
+            await recycler.checkpoint(slot, resume=reopen)
+            return slot.page
+
+        try:
+            await scrape_target(slot.page, kind, name, max_items, columns, collectors.get(slot.index), on_row, windows[index], checkpoint=resume_walk)
+        except AccountQuarantinedError:
+            raise
+        except Exception as e:
+            logger.error("Error scraping {} {}: {}", kind, label_of(index), str(e))
+            report_error(index, str(e))
+        complete_target(index)
+        await recycler.checkpoint(slot, boundary=True)
+
+    remaining: List[int] = [0 for _ in targets]
+    reel_urls: List[List[str]] = [[] for _ in targets]
+    reel_items: List = []
+
+    async def discover(slot: PageSlot, index: int):
+        kind, name = targets[index]
+        logger.info("Harvesting reel URLs for {}: {}", kind, label_of(index))
+        try:
+            urls = await discover_target(slot.page, kind, name, max_items)
+        except AccountQuarantinedError:
+            raise
+        except Exception as e:
+            logger.error("Error harvesting {} {}: {}", kind, label_of(index), str(e))
+            report_error(index, str(e))
+            urls = []
+        if windows[index] is not None:
+            urls = windows[index].truncate_urls(urls)
+        remaining[index] = len(urls)
+        reel_urls[index] = urls
+        reel_items.extend((index, position, url) for position, url in enumerate(urls))
+        if not urls:
+            complete_target(index)
+        await recycler.checkpoint(slot, boundary=True)
+
+    async def extract(slot: PageSlot, item):
+        index, position, url = item
+        source = targets[index][1] if targets[index][0] == "user" else f"#{targets[index][1]}"
+        row = None
+        try:
+            row = await scrape_reel_url(slot.page, url, source, columns, collectors.get(slot.index))
+        except AccountQuarantinedError:
+            raise
+        except Exception as e:
+            logger.error("Error scraping reel {}: {}", url, str(e))
+            report_error(index, str(e), url)
+        if row and windows[index] is not None and windows[index].classify(position, row) != "new":
+            row = None
+        # 前の位置のリールが未完了の間は、書き込みはその完了まで保留される
+        if row:
+            with span("csv_write"):
+                output.write_row(index, position, row)
+            REELS.inc()
+        else:
+            output.skip_row(index, position)
+        remaining[index] -= 1
+        if remaining[index] == 0:
+            complete_target(index)
+        else:
+            reel_done(index, url, len(reel_urls[index]), bool(row))
+        # リールはURLで直接開くので、どのリールの後でもページを開き直せる
+        recycler.count_reel(slot)
+        await recycler.checkpoint(slot)
+        await politeness_delay()
+
+    try:
+        # Step 1: Instagramログインの確認・実行（コンテキスト内のページはCookieを共有）
+        # 直近に確認済みでCookieも有効なら省略する（scraper/session.py）
+        logger.info("Step 1: Verifying Instagram login status...")
+        with span("login_check"):
+            await current_session().ensure(slots[0].page)
+
+        if mode == "grid":
+            # Step 2: 各ターゲットのグリッドからリールURLを収集
+            logger.info("Step 2: Harvesting reel URLs for {} targets with {} pages", total_tasks, workers)
+            await run_on_pages(slots, list(range(total_tasks)), discover)
+            # Step 3: 収集したリールURLを全ページで分担して直接取得
+            logger.info("Step 3: Fetching {} reels with {} pages", len(reel_items), workers)
+            await run_on_pages(slots, reel_items, extract)
+        else:
+            # Step 2: ユーザー・ハッシュタグのリールを並行して取得
+            logger.info("Step 2: Scraping {} targets with {} pages", total_tasks, workers)
+            await run_on_pages(slots, list(range(total_tasks)), scrape_sequential)
+
+    except AccountQuarantinedError:
+        # 別のアカウントでジョブをやり直すため、呼び出し元に伝える
+        raise
+    except Exception as e:
+        logger.error("Error during scraping: {}", str(e))
+    finally:
+        await recycler.close()
+
+    # 転送量（軽量プロファイルの効果確認用）
+    progress[job_id]["traffic"] = traffic.summary(output.rows)
+    logger.info("Job {} traffic: {}", job_id, progress[job_id]["traffic"])
+    # ページのJSヒープの推移と開き直した回数（切り替え前後のヒープ量）
+    progress[job_id]["memory"] = recycler.summary()
+    logger.info("Job {} page memory: peak {} MB, {} recycles", job_id, progress[job_id]["memory"]["peak_heap_mb"], progress[job_id]["memory"]["recycles"])
+    return output.rows
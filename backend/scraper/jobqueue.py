@@ -0,0 +1,356 @@
+"""SQLite-backed durable job queue with priority + FIFO ordering and worker leases."""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# キューのDBファイル。WALモードは共有メモリを使うため、NFSなどのネットワークファイルシステムには置けない
+# （APIとワーカーは同じマシン上のプロセスに限る）
+JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", "state/jobs.sqlite3"))
+# 同時に実行するジョブ数
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# 待機中ジョブの上限。超えた場合は429を返す
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "50"))
+# 実行中ジョブのリース期間（秒）。ワーカーはハートビートで延長し、期限切れのジョブは別のワーカーに再割り当てされる
+JOB_LEASE_SEC = float(os.getenv("JOB_LEASE_SEC", "30"))
+# 実行中ジョブの進捗をDBへ書き出し、リースを延長する間隔（秒）
+HEARTBEAT_SEC = float(os.getenv("JOB_HEARTBEAT_SEC", "2"))
+# ワーカーを識別する名前（リースの所有者）。同じキューを共有するノード間で一意にする
+NODE_ID = os.getenv("NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# 他のプロセス・ノードが追加したジョブに気付くためのポーリング間隔（秒）
+QUEUE_POLL_SEC = float(os.getenv("QUEUE_POLL_SEC", "1"))
+# この時間より前に負荷を報告したワーカープロセスは停止したとみなす（秒）
+WORKER_STALE_SEC = float(os.getenv("WORKER_STALE_SEC", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker TEXT,
+    lease_expires REAL,
+    accessed_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority DESC, seq);
+CREATE TABLE IF NOT EXISTS workers (
+    node TEXT PRIMARY KEY,
+    pid INTEGER,
+    running INTEGER NOT NULL,
+    capacity INTEGER NOT NULL,
+    cpu_percent REAL,
+    rss_bytes INTEGER,
+    updated_at REAL NOT NULL
+);
+"""
+
+# 既存のDBに後から追加した列
+MIGRATIONS = {
+    "worker": "ALTER TABLE jobs ADD COLUMN worker TEXT",
+    "lease_expires": "ALTER TABLE jobs ADD COLUMN lease_expires REAL",
+    "accessed_at": "ALTER TABLE jobs ADD COLUMN accessed_at REAL",
+}
+
+FINISHED_STATUSES = ("done", "error")
+# 保持期間を過ぎて期限切れにしたジョブの記録に残す項目
+TOMBSTONE_KEYS = ("progress", "status", "rows", "message")
+
+QUEUED_STATE = json.dumps({"progress": 0, "status": "queued"})
+
+
+def _like_prefix(node: str) -> str:
+    """LIKE pattern matching the worker names ``<node>/<n>`` of a node."""
+    return node.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%"
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds ``MAX_QUEUED_JOBS`` waiting jobs."""
+
+
+class JobQueue:
+    """Persistent queue of scrape jobs and their progress records.
+
+    Jobs are claimed highest ``priority`` first and FIFO within a priority.
+    The progress record of every job is stored as JSON in ``state`` so it
+    survives restarts.
+
+    Any number of worker processes on the same host as the database file
+    can claim jobs. The queue is single-host only: SQLite's WAL mode relies
+    on shared memory and does not work over a network filesystem, so the
+    file must not be shared between machines. A claimed job is leased to its worker
+    until ``lease_expires``; the worker extends the lease with
+    ``heartbeat`` and jobs whose lease ran out are put back by
+    ``reap_expired``.
+    """
+
+    def __init__(self, path: Path = JOB_DB_PATH, max_queued: int = MAX_QUEUED_JOBS):
+        self.path = Path(path)
+        self.max_queued = max_queued
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, ddl in MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(ddl)
+        self._available = asyncio.Event()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def recover(self, node: Optional[str] = None) -> int:
+        """Put jobs that were running when the process stopped back in the queue.
+
+        Only jobs without a lease, or leased to the workers of ``node`` (which
+        is known to be gone), are touched; other leased jobs may still be
+        running elsewhere and come back through ``reap_expired`` if not.
+        """
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, worker = NULL, lease_expires = NULL, state = ? "
+            "WHERE status = 'running' AND (worker IS NULL OR worker LIKE ? ESCAPE '\\')",
+            (QUEUED_STATE, _like_prefix(node) if node else ""),
+        )
+        if cursor.rowcount:
+            logger.info("Re-queued {} jobs interrupted by a restart", cursor.rowcount)
+            self._available.set()
+        return cursor.rowcount + self.reap_expired()
+
+    def reap_expired(self, now: Optional[float] = None) -> int:
+        """Put running jobs whose worker stopped renewing its lease back in the queue."""
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, worker = NULL, lease_expires = NULL, state = ? "
+            "WHERE status = 'running' AND lease_expires < ?",
+            (json.dumps({"progress": 0, "status": "queued", "message": "worker lease expired"}), now or time.time()),
+        )
+        if cursor.rowcount:
+            logger.warning("Re-queued {} jobs whose worker lease expired", cursor.rowcount)
+            self._available.set()
+        return cursor.rowcount
+
+    def requeue(self, job_id: str, state: Dict) -> None:
+        """Put a running job back in the queue (e.g. its account was quarantined)."""
+        self._conn.execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, worker = NULL, lease_expires = NULL, state = ? WHERE id = ?",
+            (json.dumps(state, default=str), job_id),
+        )
+        self._available.set()
+
+    def enqueue(self, job_id: str, params: Dict, priority: int = 0) -> int:
+        """Add a job and return its 1-based position in the queue."""
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            queued = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({queued} jobs waiting)")
+            self._conn.execute(
+                "INSERT INTO jobs (id, params, priority, status, state, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, json.dumps(params), priority, QUEUED_STATE, time.time()),
+            )
+        self._available.set()
+        return self.position(job_id)
+
+    def claim(self, worker: Optional[str] = None, lease_sec: float = JOB_LEASE_SEC) -> Optional[Tuple[str, Dict]]:
+        """Atomically mark the next queued job as running and return it.
+
+        With ``worker`` the job is leased to it for ``lease_sec`` seconds.
+        """
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT id, params FROM jobs WHERE status = 'queued' ORDER BY priority DESC, seq LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, state = ?, worker = ?, lease_expires = ? WHERE id = ?",
+                (now, json.dumps({"progress": 0, "status": "running"}), worker, now + lease_sec if worker else None, row["id"]),
+            )
+        return row["id"], json.loads(row["params"])
+
+    async def next_job(self, worker: Optional[str] = None, lease_sec: float = JOB_LEASE_SEC, ready: Optional[Callable[[], bool]] = None) -> Tuple[str, Dict]:
+        """Wait until a job can be claimed.
+
+        Jobs enqueued in this process wake the waiter at once; jobs enqueued
+        by other processes are picked up within ``QUEUE_POLL_SEC``. ``ready``
+        is asked before every claim and lets the caller defer to other workers.
+        """
+        while True:
+            job = self.claim(worker, lease_sec) if ready is None or ready() else None
+            if job:
+                return job
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), timeout=QUEUE_POLL_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+    def heartbeat(self, job_id: str, worker: str, state: Dict, lease_sec: float = JOB_LEASE_SEC) -> bool:
+        """Save the progress of a leased job and extend its lease.
+
+        Returns False if ``worker`` no longer holds the lease (the job was
+        reassigned), in which case nothing is written.
+        """
+        cursor = self._conn.execute(
+            "UPDATE jobs SET state = ?, lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (json.dumps(state, default=str), time.time() + lease_sec, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def save_state(self, job_id: str, state: Dict, worker: Optional[str] = None) -> bool:
+        """Store the progress record; with ``worker``, only while it holds the lease."""
+        status = state.get("status", "running")
+        finished_at = time.time() if status in FINISHED_STATUSES else None
+        sql = "UPDATE jobs SET status = ?, state = ?, finished_at = COALESCE(?, finished_at) WHERE id = ?"
+        args = [status, json.dumps(state, default=str), finished_at, job_id]
+        if worker is not None:
+            sql += " AND worker = ?"
+            args.append(worker)
+        return self._conn.execute(sql, args).rowcount == 1
+
+    def get_state(self, job_id: str) -> Optional[Dict]:
+        row = self._conn.execute("SELECT status, state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        state = json.loads(row["state"])
+        if row["status"] == "queued":
+            state["position"] = self.position(job_id)
+        return state
+
+    def position(self, job_id: str) -> Optional[int]:
+        row = self._conn.execute("SELECT priority, seq FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)).fetchone()
+        if row is None:
+            return None
+        ahead = self._conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (priority > ? OR (priority = ? AND seq < ?))",
+            (row["priority"], row["priority"], row["seq"]),
+        ).fetchone()[0]
+        return ahead + 1
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def touch(self, job_id: str) -> None:
+        """Record a download of the job's result (for LRU eviction of output files)."""
+        self._conn.execute("UPDATE jobs SET accessed_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def job_files_index(self) -> Dict[str, Dict]:
+        """``id -> {status, last_used}`` of every job, for the output garbage collector."""
+        rows = self._conn.execute(
+            "SELECT id, status, MAX(created_at, COALESCE(finished_at, 0), COALESCE(accessed_at, 0)) AS last_used FROM jobs"
+        ).fetchall()
+        return {row["id"]: {"status": row["status"], "last_used": row["last_used"]} for row in rows}
+
+    def expire_result(self, job_id: str, reason: str) -> None:
+        """Mark the result of a finished job as deleted; downloads then answer 410 Gone."""
+        row = self._conn.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        state = json.loads(row["state"])
+        state.pop("path", None)
+        state.update({"expired": True, "expired_reason": reason, "expired_at": time.time()})
+        self._conn.execute("UPDATE jobs SET state = ? WHERE id = ?", (json.dumps(state, default=str), job_id))
+
+    def prune_finished(self, max_jobs: int, max_age_sec: float, now: Optional[float] = None) -> List[str]:
+        """Expire finished jobs beyond the newest ``max_jobs`` or older than ``max_age_sec``.
+
+        The rows stay as ``expired`` tombstones holding only the final status,
+        so downloads of their results answer 410 Gone instead of 404.
+        """
+        now = now or time.time()
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT id, state FROM jobs WHERE status IN ('done', 'error') AND (finished_at < ? OR id IN ("
+                "SELECT id FROM jobs WHERE status IN ('done', 'error') ORDER BY finished_at DESC LIMIT -1 OFFSET ?))",
+                (now - max_age_sec, max_jobs),
+            ).fetchall()
+            tombstones = []
+            for row in rows:
+                # 進捗の詳細（所要時間・メモリの推移など）は捨て、結果が削除されたことだけを残す
+                state = {key: value for key, value in json.loads(row["state"]).items() if key in TOMBSTONE_KEYS}
+                state.update({"expired": True, "expired_reason": "retention", "expired_at": now})
+                tombstones.append((json.dumps(state, default=str), row["id"]))
+            self._conn.executemany("UPDATE jobs SET status = 'expired', params = '{}', state = ? WHERE id = ?", tombstones)
+        return [row["id"] for row in rows]
+
+    def prune_tombstones(self, max_rows: int, max_age_sec: float, now: Optional[float] = None) -> int:
+        """Delete ``expired`` tombstones beyond the newest ``max_rows`` or finished over ``max_age_sec`` ago.
+
+        Their downloads then answer 404 like unknown jobs. Returns the number of rows deleted.
+        """
+        cutoff = (now or time.time()) - max_age_sec
+        cursor = self._conn.execute(
+            "DELETE FROM jobs WHERE status = 'expired' AND (finished_at < ? OR id IN ("
+            "SELECT id FROM jobs WHERE status = 'expired' ORDER BY finished_at DESC LIMIT -1 OFFSET ?))",
+            (cutoff, max_rows),
+        )
+        return cursor.rowcount
+
+    def expire_queued(self, max_age_sec: float, now: Optional[float] = None) -> List[str]:
+        """Fail jobs that waited in the queue longer than ``max_age_sec``."""
+        now = now or time.time()
+        rows = self._conn.execute("SELECT id FROM jobs WHERE status = 'queued' AND created_at < ?", (now - max_age_sec,)).fetchall()
+        ids = [row["id"] for row in rows]
+        state = json.dumps({"progress": 0, "status": "error", "message": "expired before a worker picked it up"})
+        self._conn.executemany(
+            "UPDATE jobs SET status = 'error', state = ?, finished_at = ? WHERE id = ? AND status = 'queued'",
+            [(state, now, job_id) for job_id in ids],
+        )
+        return ids
+
+    def oldest_queued_age(self) -> Optional[float]:
+        """Seconds the longest-waiting queued job has been waiting."""
+        created = self._conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return None if created is None else time.time() - created
+
+    def report_worker(self, node: str, running: int, capacity: int, usage: Optional[Dict] = None, pid: Optional[int] = None) -> None:
+        """Record the load of a worker process so others (and the API) can see it."""
+        usage = usage or {}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO workers (node, pid, running, capacity, cpu_percent, rss_bytes, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (node, pid, running, capacity, usage.get("cpu_percent"), usage.get("rss_bytes"), time.time()),
+        )
+
+    def remove_worker(self, node: str) -> None:
+        self._conn.execute("DELETE FROM workers WHERE node = ?", (node,))
+
+    def worker_loads(self, max_age_sec: float = WORKER_STALE_SEC) -> Dict[str, Dict]:
+        """Last reported load of every worker process that reported recently."""
+        rows = self._conn.execute(
+            "SELECT * FROM workers WHERE updated_at >= ? ORDER BY node", (time.time() - max_age_sec,)
+        ).fetchall()
+        return {
+            row["node"]: {
+                "pid": row["pid"],
+                "running": row["running"],
+                "capacity": row["capacity"],
+                "cpu_percent": row["cpu_percent"],
+                "rss_bytes": row["rss_bytes"],
+                "updated_at": row["updated_at"],
+            }
+            for row in rows
+        }
+
+    def leases(self) -> Dict[str, Dict]:
+        """Running jobs per worker and the time left on the soonest-expiring lease."""
+        rows = self._conn.execute(
+            "SELECT worker, COUNT(*) AS n, MIN(lease_expires) AS expires FROM jobs WHERE status = 'running' AND worker IS NOT NULL GROUP BY worker"
+        ).fetchall()
+        now = time.time()
+        return {row["worker"]: {"running": row["n"], "lease_left_sec": round(row["expires"] - now, 1)} for row in rows}
@@ -0,0 +1,89 @@
+"""Lean browsing profile: block unneeded resources and meter transferred bytes."""
+
+import os
+from typing import Dict, List
+
+from loguru import logger
+
+from .login import LEAN_PROFILE
+
+
+def _csv_env(name: str, default: str) -> List[str]:
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+# 抽出に不要なリソース種別（Playwrightのrequest.resource_type）
+BLOCK_RESOURCE_TYPES = set(_csv_env("BLOCK_RESOURCE_TYPES", "image,media,font"))
+
+# 種別に関わらずブロックするURL（解析・トラッキング系）
+BLOCK_URL_PATTERNS = _csv_env(
+    "BLOCK_URL_PATTERNS",
+    "google-analytics.com,googletagmanager.com,doubleclick.net,connect.facebook.net,"
+    "/logging/,/logging_client_events,/ajax/bz,/api/v1/web/log",
+)
+
+# ブロック対象でも常に許可するURL
+ALLOW_URL_PATTERNS = _csv_env("ALLOW_URL_PATTERNS", "")
+
+# route.abortに渡すエラーコード。requestfailedでブロックされたリクエストを判別するのに使う
+BLOCKED_ERROR_CODE = "blockedbyclient"
+BLOCKED_ERROR_TEXT = "net::ERR_BLOCKED_BY_CLIENT"
+
+
+def should_block(resource_type: str, url: str) -> bool:
+    """Return True when a request is not needed for metadata extraction."""
+    if any(pattern in url for pattern in ALLOW_URL_PATTERNS):
+        return False
+    if resource_type in BLOCK_RESOURCE_TYPES:
+        return True
+    return any(pattern in url for pattern in BLOCK_URL_PATTERNS)
+
+
+async def _route_handler(route) -> None:
+    request = route.request
+    if should_block(request.resource_type, request.url):
+        await route.abort(BLOCKED_ERROR_CODE)
+    else:
+        await route.continue_()
+
+
+async def apply_lean_routes(context) -> None:
+    """Abort media/image/font/analytics requests for every page of ``context``."""
+    await context.route("**/*", _route_handler)
+    logger.info("Lean profile enabled: blocking types {} and {} URL patterns", sorted(BLOCK_RESOURCE_TYPES), len(BLOCK_URL_PATTERNS))
+
+
+class TrafficMeter:
+    """Counts bytes transferred and requests blocked on the pages of one job."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.requests = 0
+        self.blocked = 0
+
+    def attach(self, page) -> None:
+        page.on("requestfinished", self._on_finished)
+        page.on("requestfailed", self._on_failed)
+
+    async def _on_finished(self, request) -> None:
+        self.requests += 1
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        self.bytes += sizes.get("requestHeadersSize", 0) + sizes.get("requestBodySize", 0)
+        self.bytes += sizes.get("responseHeadersSize", 0) + sizes.get("responseBodySize", 0)
+
+    def _on_failed(self, request) -> None:
+        if request.failure == BLOCKED_ERROR_TEXT:
+            self.blocked += 1
+
+    def summary(self, reels: int) -> Dict:
+        return {
+            "lean_profile": LEAN_PROFILE,
+            "bytes": self.bytes,
+            "requests": self.requests,
+            "blocked_requests": self.blocked,
+            "reels": reels,
+            "bytes_per_reel": int(self.bytes / reels) if reels else None,
+        }
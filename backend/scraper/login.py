@@ -1,11 +1,12 @@
 import json
 import os
 from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
 import asyncio
 
 from dotenv import load_dotenv
 from loguru import logger
-from playwright.async_api import async_playwright
 
 STATE_PATH = Path("state/insta_state.json")
 
@@ -15,14 +16,49 @@ USER = os.getenv("INSTA_USER")
 PASS = os.getenv("INSTA_PASS")
 WAIT_SEC = float(os.getenv("WAIT_SEC", "1.0"))
 
+# InstagramのベースURL。負荷試験ではローカルのモックサーバー（benchmarks/mock_instagram.py）を指す
+INSTAGRAM_BASE_URL = os.getenv("INSTAGRAM_BASE_URL", "https://www.instagram.com").rstrip("/")
+# セッションCookieのドメイン（www.instagram.com -> instagram.com）
+INSTAGRAM_COOKIE_DOMAIN = (urlparse(INSTAGRAM_BASE_URL).hostname or "").removeprefix("www.")
 
-async def login() -> None:
-    """Log into Instagram and save authenticated state."""
-    if not USER or not PASS:
+# 軽量プロファイル: ヘッドレスで起動し、抽出に不要なリソースをブロックする（scraper/lean.py）
+LEAN_PROFILE = os.getenv("LEAN_PROFILE", "0") == "1"
+HEADLESS = os.getenv("HEADLESS", "1" if LEAN_PROFILE else "0") == "1"
+
+# デバッグ用スクリーンショット（debug_*.png）の保存先。scraper/retention.py が古いものから削除する
+DEBUG_SCREENSHOT_DIR = Path(os.getenv("DEBUG_SCREENSHOT_DIR", "state/screenshots"))
+
+
+def debug_screenshot_path(name: str) -> str:
+    """Where to save the debug screenshot ``name`` (under ``DEBUG_SCREENSHOT_DIR``)."""
+    DEBUG_SCREENSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    return str(DEBUG_SCREENSHOT_DIR / name)
+
+
+def instagram_url(path: str = "/") -> str:
+    """Absolute URL of ``path`` on ``INSTAGRAM_BASE_URL``."""
+    return INSTAGRAM_BASE_URL + path
+
+
+def is_instagram_url(url: str) -> bool:
+    return (urlparse(url or "").hostname or "").endswith(INSTAGRAM_COOKIE_DOMAIN)
+
+
+async def login(user: Optional[str] = None, password: Optional[str] = None, state_path: Path = STATE_PATH) -> None:
+    """Log into Instagram and save authenticated state.
+
+    Defaults to ``INSTA_USER``/``INSTA_PASS``; pass an account's credentials
+    and ``state_path`` to log in one of the accounts in scraper/accounts.py.
+    """
+    user = user or USER
+    password = password or PASS
+    if not user or not password:
         logger.error("Instagram credentials not found in .env file. Please set INSTA_USER and INSTA_PASS")
         raise ValueError("Instagram credentials not configured")
     
-    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    from playwright.async_api import async_playwright
+
     async with async_playwright() as p:
         browser = await p.chromium.launch(
             headless=False,
@@ -41,7 +77,7 @@ async def login() -> None:
         
         try:
             logger.info("Navigating to Instagram login page")
-            await page.goto("https://www.instagram.com/accounts/login/", wait_until="networkidle")
+            await page.goto(instagram_url("/accounts/login/"), wait_until="networkidle")
             await asyncio.sleep(WAIT_SEC * 3)
             
             # Cookieバナーを閉じる（存在する場合）
@@ -72,7 +108,7 @@ async def login() -> None:
                         await username_field.click()
                         await asyncio.sleep(WAIT_SEC * 0.5)
                         await username_field.clear()
-                        await username_field.type(USER, delay=50)
+                        await username_field.type(user, delay=50)
                         username_filled = True
                         logger.info("Username filled successfully with selector: {}", selector)
                         break
@@ -81,7 +117,7 @@ async def login() -> None:
             
             if not username_filled:
                 logger.error("Could not find username field")
-                await page.screenshot(path="debug_username_error.png")
+                await page.screenshot(path=debug_screenshot_path("debug_username_error.png"))
                 raise Exception("Username field not found")
             
             # パスワード入力フィールドを探して入力
@@ -102,7 +138,7 @@ async def login() -> None:
                         await password_field.click()
                         await asyncio.sleep(WAIT_SEC * 0.5)
                         await password_field.clear()
-                        await password_field.type(PASS, delay=50)
+                        await password_field.type(password, delay=50)
                         password_filled = True
                         logger.info("Password filled successfully with selector: {}", selector)
                         break
@@ -111,7 +147,7 @@ async def login() -> None:
             
             if not password_filled:
                 logger.error("Could not find password field")
-                await page.screenshot(path="debug_password_error.png")
+                await page.screenshot(path=debug_screenshot_path("debug_password_error.png"))
                 raise Exception("Password field not found")
             
             await asyncio.sleep(WAIT_SEC)
@@ -141,7 +177,7 @@ async def login() -> None:
             
             if not login_clicked:
                 logger.error("Could not find login button")
-                await page.screenshot(path="debug_login_button_error.png")
+                await page.screenshot(path=debug_screenshot_path("debug_login_button_error.png"))
                 raise Exception("Login button not found")
             
             # ログイン処理の完了を待つ
@@ -172,41 +208,55 @@ async def login() -> None:
             
             # ログイン成功を確認
             current_url = page.url
-            if "instagram.com" in current_url and "login" not in current_url:
+            if is_instagram_url(current_url) and "login" not in current_url:
                 logger.info("Login successful! Current URL: {}", current_url)
-                await context.storage_state(path=STATE_PATH)
-                logger.info("Saved login state to {}", STATE_PATH)
+                await context.storage_state(path=state_path)
+                logger.info("Saved login state to {}", state_path)
             else:
                 logger.error("Login may have failed. Current URL: {}", current_url)
-                await page.screenshot(path="debug_login_failed.png")
+                await page.screenshot(path=debug_screenshot_path("debug_login_failed.png"))
                 
         except Exception as e:
             logger.error("Error during login: {}", str(e))
-            await page.screenshot(path="debug_login_error.png")
+            await page.screenshot(path=debug_screenshot_path("debug_login_error.png"))
             raise
         finally:
             await browser.close()
 
 
-async def load_context(playwright):
-    if not STATE_PATH.exists():
+async def load_context(playwright, account=None):
+    """Launch a browser with the saved login state of ``account`` (default: INSTA_USER)."""
+    state_path = account.state_path if account else STATE_PATH
+    if not state_path.exists():
         logger.info("No saved login state found, performing login...")
-        await login()
+        if account:
+            await login(account.username, account.password, state_path)
+        else:
+            await login()
     else:
-        logger.info("Using saved login state from {}", STATE_PATH)
+        logger.info("Using saved login state from {}", state_path)
     
     browser = await playwright.chromium.launch(
-        headless=False,
+        headless=HEADLESS,
         args=[
             '--no-first-run',
             '--no-default-browser-check',
             '--disable-blink-features=AutomationControlled'
         ]
     )
+    context = await open_context(browser, state_path)
+    return browser, context
+
+
+async def open_context(browser, storage_state):
+    """Open a scraping context in ``browser`` with a login state (a file path or ``context.storage_state()``)."""
     context = await browser.new_context(
         locale="en-US",
         extra_http_headers={"Accept-Language": "en-US"},
-        storage_state=STATE_PATH,
+        storage_state=storage_state,
         user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
     )
-    return browser, context
+    if LEAN_PROFILE:
+        from .lean import apply_lean_routes
+        await apply_lean_routes(context)
+    return context
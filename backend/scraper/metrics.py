@@ -0,0 +1,137 @@
+"""Per-stage timing spans and scraper counters, exported as Prometheus metrics."""
+
+import contextvars
+import multiprocessing
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# SCRAPER_ROLE=supervisor ではスクレイピングは子プロセスで行われるため、各プロセスのメトリクスを
+# このディレクトリに書き出してAPIプロセスの /metrics で集計する（prometheus_client の読み込み前に設定する）
+METRICS_MULTIPROC_DIR = Path(os.getenv("METRICS_MULTIPROC_DIR", "state/metrics"))
+if os.getenv("SCRAPER_ROLE") == "supervisor" and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    if multiprocessing.parent_process() is None:
+        # 前回の起動で残ったプロセスのファイルを集計しないよう、監視するプロセスが起動時に空にする
+        shutil.rmtree(METRICS_MULTIPROC_DIR, ignore_errors=True)
+        METRICS_MULTIPROC_DIR.mkdir(parents=True, exist_ok=True)
+    # spawn で起動する子プロセスはこの環境変数を引き継ぐ
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = str(METRICS_MULTIPROC_DIR.resolve())
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+# 所要時間のバケット（秒）。行の書き込みは数ミリ秒、ページ遷移は数十秒かかることがある
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+STAGE_SECONDS = Histogram("scraper_stage_seconds", "Time spent in each scrape stage", ["stage", "outcome"], buckets=STAGE_BUCKETS)
+WAIT_SECONDS = Histogram("scraper_wait_seconds", "Readiness waits by label", ["label", "result"], buckets=STAGE_BUCKETS)
+RETRIES = Counter("scraper_retries_total", "Retries and fallbacks taken", ["stage", "reason"])
+SELECTOR_ATTEMPTS = Counter("scraper_selector_attempts_total", "Selector attempts by group", ["group", "result"])
+REELS = Counter("scraper_reels_total", "Reels written to job output")
+JOBS = Counter("scraper_jobs_total", "Finished scrape jobs", ["status"])
+NAVIGATION_TIMEOUT_SEC = Gauge("scraper_navigation_timeout_seconds", "Current adaptive page navigation timeout", multiprocess_mode="livemax")
+CIRCUIT_OPEN = Gauge("scraper_navigation_circuit_open", "1 while the navigation circuit breaker pauses workers", multiprocess_mode="livemax")
+RETENTION_EVICTIONS = Counter("scraper_retention_evictions_total", "Job records, results and screenshots removed by retention", ["kind", "reason"])
+RETENTION_FREED_BYTES = Counter("scraper_retention_freed_bytes_total", "Bytes freed by retention")
+OUTPUT_BYTES = Gauge("scraper_output_bytes", "Size of the output directory after the last retention pass", multiprocess_mode="livemax")
+PAGE_JS_HEAP_BYTES = Histogram(
+    "scraper_page_js_heap_bytes", "JS heap of scraping pages when sampled", buckets=tuple(mb * 1024 ** 2 for mb in (16, 32, 64, 128, 256, 512, 1024, 2048))
+)
+PAGE_RECYCLES = Counter("scraper_page_recycles_total", "Scraping pages or contexts replaced to release browser memory", ["scope", "reason"])
+JOB_REELS_PER_SECOND = Histogram("scraper_job_reels_per_second", "Reel throughput of finished jobs", buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16))
+
+# ジョブ単位のステージ別集計。scrape_jobのタスク内で設定され、子タスクにも引き継がれる
+_job_timings: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("job_timings", default=None)
+
+
+def start_job_timings() -> Dict:
+    """Start collecting the stage breakdown for the current job task."""
+    stats: Dict = {"stages": {}, "retries": {}}
+    _job_timings.set(stats)
+    return stats
+
+
+def observe_stage(stage: str, seconds: float, outcome: str = "ok") -> None:
+    STAGE_SECONDS.labels(stage, outcome).observe(seconds)
+    stats = _job_timings.get()
+    if stats is None:
+        return
+    entry = stats["stages"].setdefault(stage, {"count": 0, "errors": 0, "total_sec": 0.0, "max_sec": 0.0})
+    entry["count"] += 1
+    entry["errors"] += 0 if outcome == "ok" else 1
+    entry["total_sec"] += seconds
+    entry["max_sec"] = max(entry["max_sec"], seconds)
+
+
+def count_retry(stage: str, reason: str) -> None:
+    RETRIES.labels(stage, reason).inc()
+    stats = _job_timings.get()
+    if stats is not None:
+        key = f"{stage}:{reason}"
+        stats["retries"][key] = stats["retries"].get(key, 0) + 1
+
+
+class StageSpan:
+    """Times one stage; recorded as an error if it raises or ``fail()`` is called."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.failed = False
+        self.started = 0.0
+
+    def fail(self) -> None:
+        self.failed = True
+
+    def __enter__(self) -> "StageSpan":
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        outcome = "error" if exc_type is not None or self.failed else "ok"
+        observe_stage(self.stage, time.monotonic() - self.started, outcome)
+        return False
+
+
+def span(stage: str) -> StageSpan:
+    return StageSpan(stage)
+
+
+def summarize_job_timings(stats: Dict) -> Dict:
+    stages = {
+        stage: {
+            "count": entry["count"],
+            "errors": entry["errors"],
+            "total_sec": round(entry["total_sec"], 3),
+            "mean_ms": round(1000 * entry["total_sec"] / entry["count"], 1) if entry["count"] else None,
+            "max_ms": round(1000 * entry["max_sec"], 1),
+        }
+        for stage, entry in sorted(stats["stages"].items(), key=lambda item: -item[1]["total_sec"])
+    }
+    return {"stages": stages, "retries": dict(stats["retries"])}
+
+
+def record_job(status: str, rows: int, elapsed_sec: float) -> None:
+    JOBS.labels(status).inc()
+    if status == "done" and elapsed_sec > 0:
+        JOB_REELS_PER_SECOND.observe(rows / elapsed_sec)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """The metrics in the Prometheus text format, with their content type.
+
+    With ``PROMETHEUS_MULTIPROC_DIR`` set (supervisor mode) they are the sum
+    over all processes writing to that directory, including the worker
+    processes; otherwise the default registry of this process.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the live gauges of an exited worker process (no-op outside multiprocess mode)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
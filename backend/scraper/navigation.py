@@ -0,0 +1,258 @@
+"""Navigation policy: adaptive ``goto`` timeouts, terminal pages and a circuit breaker."""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from loguru import logger
+
+from .metrics import CIRCUIT_OPEN, NAVIGATION_TIMEOUT_SEC, count_retry
+from .session import is_login_wall
+
+# 遷移タイムアウト = 直近の遷移時間のパーセンタイル × 倍率（上下限あり）。サンプルが少ない間は既定値
+NAV_TIMEOUT_DEFAULT_SEC = float(os.getenv("NAV_TIMEOUT_DEFAULT_SEC", "15"))
+NAV_TIMEOUT_MIN_SEC = float(os.getenv("NAV_TIMEOUT_MIN_SEC", "5"))
+NAV_TIMEOUT_MAX_SEC = float(os.getenv("NAV_TIMEOUT_MAX_SEC", "25"))
+NAV_TIMEOUT_PERCENTILE = float(os.getenv("NAV_TIMEOUT_PERCENTILE", "0.95"))
+NAV_TIMEOUT_MULTIPLIER = float(os.getenv("NAV_TIMEOUT_MULTIPLIER", "3"))
+NAV_LATENCY_WINDOW = int(os.getenv("NAV_LATENCY_WINDOW", "200"))
+NAV_MIN_SAMPLES = int(os.getenv("NAV_MIN_SAMPLES", "10"))
+
+# サーキットブレーカー: 直近の遷移の失敗率がしきい値を超えたら、全ワーカーの遷移を一時停止する
+NAV_BREAKER_WINDOW = int(os.getenv("NAV_BREAKER_WINDOW", "20"))
+NAV_BREAKER_MIN_SAMPLES = int(os.getenv("NAV_BREAKER_MIN_SAMPLES", "10"))
+NAV_BREAKER_ERROR_RATE = float(os.getenv("NAV_BREAKER_ERROR_RATE", "0.5"))
+NAV_BREAKER_COOLDOWN_SEC = float(os.getenv("NAV_BREAKER_COOLDOWN_SEC", "120"))
+
+# 再試行しても結果が変わらないページ（英語・日本語表示）
+TERMINAL_MARKERS = {
+    "unavailable": ("Sorry, this page isn't available", "このページはご利用いただけません"),
+    "private": ("This account is private", "このアカウントは非公開です", "This Account is Private"),
+}
+
+DETECT_TERMINAL_JS = """
+(markers) => {
+  const text = (document.body && document.body.innerText) || '';
+  for (const [reason, needles] of Object.entries(markers)) {
+    if (needles.some((needle) => text.includes(needle))) return reason;
+  }
+  return null;
+}
+"""
+
+
+class TerminalPageError(Exception):
+    """The target is gone, private or behind a wall; retrying will not help."""
+
+    def __init__(self, reason: str, url: str):
+        super().__init__(f"{reason}: {url}")
+        self.reason = reason
+        self.url = url
+
+
+class LatencyTracker:
+    """Recent successful navigation times and the timeout derived from them."""
+
+    def __init__(self, window: int = NAV_LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def timeout_sec(self) -> float:
+        if len(self.samples) < NAV_MIN_SAMPLES:
+            return NAV_TIMEOUT_DEFAULT_SEC
+        timeout = self.percentile(NAV_TIMEOUT_PERCENTILE) * NAV_TIMEOUT_MULTIPLIER
+        return min(NAV_TIMEOUT_MAX_SEC, max(NAV_TIMEOUT_MIN_SEC, timeout))
+
+
+class BreakerTicket:
+    """Handed to each navigation by ``CircuitBreaker.wait_until_closed``.
+
+    Only the holder of the half-open trial ticket decides whether the breaker
+    closes; outcomes of navigations started before the last state change are
+    ignored.
+    """
+
+    def __init__(self, trial: bool = False):
+        self.trial = trial
+        self.started_at = time.monotonic()
+
+
+class CircuitBreaker:
+    """Opens when the recent navigation error rate spikes; every caller then waits.
+
+    After ``cooldown_sec`` the breaker is half-open: one navigation is let
+    through, and its outcome closes the breaker or opens it again.
+    """
+
+    def __init__(self, window: int = NAV_BREAKER_WINDOW, min_samples: int = NAV_BREAKER_MIN_SAMPLES, error_rate: float = NAV_BREAKER_ERROR_RATE, cooldown_sec: float = NAV_BREAKER_COOLDOWN_SEC):
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.error_rate = error_rate
+        self.cooldown_sec = cooldown_sec
+        self.opened_at: Optional[float] = None
+        # 最後に開いた・閉じた時刻。これより前に始まったナビゲーションの結果は数えない
+        self.changed_at = float("-inf")
+        self.trips = 0
+        self._trial: Optional[BreakerTicket] = None
+        self._closed = asyncio.Event()
+        self._closed.set()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown_sec else "open"
+
+    def recent_error_rate(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        return sum(1 for ok in self.outcomes if not ok) / len(self.outcomes)
+
+    def record(self, ok: bool, ticket: Optional[BreakerTicket] = None) -> None:
+        if ticket is not None and ticket.started_at < self.changed_at:
+            return
+        if self.opened_at is not None:
+            # 半開状態では試行を任されたナビゲーションの結果だけで閉じるか開き直すかを決める
+            if ticket is None or ticket is not self._trial:
+                return
+            self._trial = None
+            if ok:
+                self._close()
+            else:
+                self._open()
+            return
+        self.outcomes.append(ok)
+        rate = self.recent_error_rate()
+        if len(self.outcomes) >= self.min_samples and rate >= self.error_rate:
+            self._open()
+
+    def release(self, ticket: Optional[BreakerTicket]) -> None:
+        """Give up the half-open trial if its navigation ended without an outcome (e.g. cancelled)."""
+        if ticket is not None and ticket is self._trial:
+            self._trial = None
+
+    def _open(self) -> None:
+        self.opened_at = self.changed_at = time.monotonic()
+        self.trips += 1
+        self._closed.clear()
+        CIRCUIT_OPEN.set(1)
+        logger.error("Navigation circuit breaker opened (error rate {}), pausing navigation for {:.0f}s", self.recent_error_rate(), self.cooldown_sec)
+
+    def _close(self) -> None:
+        self.opened_at = None
+        self.changed_at = time.monotonic()
+        self.outcomes.clear()
+        self._closed.set()
+        CIRCUIT_OPEN.set(0)
+        logger.info("Navigation circuit breaker closed")
+
+    async def wait_until_closed(self) -> BreakerTicket:
+        """Block while the breaker is open; hands the single trial ticket out once half-open."""
+        while self.opened_at is not None:
+            if self.state == "half_open" and self._trial is None:
+                self._trial = BreakerTicket(trial=True)
+                return self._trial
+            remaining = self.cooldown_sec - (time.monotonic() - self.opened_at)
+            try:
+                await asyncio.wait_for(self._closed.wait(), timeout=max(0.1, remaining))
+            except asyncio.TimeoutError:
+                pass
+        return BreakerTicket()
+
+    async def wait_for_cooldown(self) -> None:
+        """Block while the breaker is open, without taking the half-open trial."""
+        while self.state == "open":
+            await asyncio.sleep(max(0.1, self.cooldown_sec - (time.monotonic() - self.opened_at)))
+
+    def status(self) -> Dict:
+        return {
+            "state": self.state,
+            "error_rate": self.recent_error_rate(),
+            "samples": len(self.outcomes),
+            "trips": self.trips,
+        }
+
+
+class NavigationPolicy:
+    """``goto`` with a latency-derived timeout, terminal-page detection and the breaker."""
+
+    def __init__(self, latency: Optional[LatencyTracker] = None, breaker: Optional[CircuitBreaker] = None):
+        self.latency = latency or LatencyTracker()
+        self.breaker = breaker or CircuitBreaker()
+
+    async def goto(self, page, url: str):
+        """Navigate to ``url``; a slow ``domcontentloaded`` falls back to ``commit`` once.
+
+        Returns the response. Raises TerminalPageError for pages that will
+        not change on retry; other failures count towards the breaker.
+        """
+        ticket = await self.breaker.wait_until_closed()
+        try:
+            return await self._goto(page, url, ticket)
+        finally:
+            # キャンセルされた試行が半開状態の枠を持ったままにならないようにする
+            self.breaker.release(ticket)
+
+    async def _goto(self, page, url: str, ticket: BreakerTicket):
+        timeout = self.latency.timeout_sec()
+        NAVIGATION_TIMEOUT_SEC.set(timeout)
+        started = time.monotonic()
+        try:
+            try:
+                response = await page.goto(url, wait_until="domcontentloaded", timeout=timeout * 1000)
+            except Exception as e:
+                if "Timeout" not in type(e).__name__ and "Timeout" not in str(e):
+                    raise
+                logger.warning("domcontentloaded timed out after {:.1f}s for {}, falling back to commit", timeout, url)
+                count_retry("navigation", "goto_commit")
+                response = await page.goto(url, wait_until="commit", timeout=timeout * 1000)
+            await self.check_terminal(page, response, url)
+        except TerminalPageError:
+            # サイトは正常に応答しているので、ブレーカーでは成功として扱う
+            self.breaker.record(True, ticket)
+            raise
+        except Exception:
+            self.breaker.record(False, ticket)
+            raise
+        self.latency.observe(time.monotonic() - started)
+        self.breaker.record(True, ticket)
+        return response
+
+    async def check_terminal(self, page, response, url: str) -> None:
+        status = response.status if response is not None else None
+        if status == 404:
+            raise TerminalPageError("unavailable", url)
+        if status == 429 or (status is not None and status >= 500):
+            raise Exception(f"HTTP {status} for {url}")
+        if is_login_wall(page.url):
+            # ログイン画面への誘導はセッションの問題なので、呼び出し元で再ログインする
+            return
+        try:
+            reason = await page.evaluate(DETECT_TERMINAL_JS, {k: list(v) for k, v in TERMINAL_MARKERS.items()})
+        except Exception as e:
+            logger.debug("Terminal page check failed for {}: {}", url, str(e))
+            return
+        if reason:
+            raise TerminalPageError(reason, url)
+
+    def status(self) -> Dict:
+        return {
+            "timeout_sec": round(self.latency.timeout_sec(), 2),
+            "p50_sec": self.latency.percentile(0.5),
+            "p95_sec": self.latency.percentile(0.95),
+            "samples": len(self.latency.samples),
+            "breaker": self.breaker.status(),
+        }
+
+
+NAVIGATION = NavigationPolicy()
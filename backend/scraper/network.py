@@ -0,0 +1,173 @@
+"""Reel metadata extraction from Instagram's own GraphQL/XHR JSON responses."""
+
+import asyncio
+import re
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+from loguru import logger
+
+# リールのメタデータを含むレスポンスのURLパターン
+API_URL_PATTERNS = ("/graphql", "/api/v1/")
+
+SHORTCODE_RE = re.compile(r"/(?:reel|reels|p)/([A-Za-z0-9_-]+)")
+
+# 1ページで保持するメディア数の上限（グリッドのレスポンスは大量のメディアを含む）
+MAX_CACHED_MEDIA = 1000
+
+
+def shortcode_from_url(url: str) -> Optional[str]:
+    """Return the reel shortcode contained in ``url``, if any."""
+    match = SHORTCODE_RE.search(url or "")
+    return match.group(1) if match else None
+
+
+def _count(node: Dict, *keys: str) -> Optional[int]:
+    """Return the first integer count found under ``keys``.
+
+    Handles both the flat v1 style (``like_count``) and the GraphQL edge style
+    (``edge_media_preview_like: {"count": ...}``).
+    """
+    for key in keys:
+        value = node.get(key)
+        if isinstance(value, dict):
+            value = value.get("count")
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _caption(node: Dict) -> Optional[str]:
+    caption = node.get("caption")
+    if isinstance(caption, dict):
+        return caption.get("text") or ""
+    if isinstance(caption, str):
+        return caption
+    edges = (node.get("edge_media_to_caption") or {}).get("edges")
+    if isinstance(edges, list):
+        if not edges:
+            return ""
+        return ((edges[0] or {}).get("node") or {}).get("text") or ""
+    if "caption" in node:
+        # captionキーがnullの場合はキャプションなし
+        return ""
+    return None
+
+
+def _posted_at(node: Dict) -> Optional[str]:
+    timestamp = node.get("taken_at") or node.get("taken_at_timestamp")
+    if not isinstance(timestamp, (int, float)) or isinstance(timestamp, bool):
+        return None
+    # DOMの<time datetime>と同じ形式で返す
+    posted = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return posted.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def parse_media_node(node: Dict) -> Optional[Dict]:
+    """Convert a media object from an API payload into reel fields.
+
+    Only fields actually present in the payload are returned, so callers can
+    fall back to DOM extraction for the rest.
+    """
+    shortcode = node.get("code") or node.get("shortcode")
+    if not isinstance(shortcode, str):
+        return None
+
+    fields = {}
+    caption = _caption(node)
+    if caption is not None:
+        fields["caption"] = caption.strip()
+    likes = _count(node, "like_count", "edge_media_preview_like", "edge_liked_by")
+    if likes is not None:
+        fields["likes"] = likes
+    comments = _count(node, "comment_count", "edge_media_to_comment", "edge_media_preview_comment")
+    if comments is not None:
+        fields["comments"] = comments
+    views = _count(node, "play_count", "video_play_count", "video_view_count", "view_count")
+    if views is not None:
+        fields["video_view_count"] = views
+    posted_at = _posted_at(node)
+    if posted_at is not None:
+        fields["posted_at"] = posted_at
+
+    if not fields:
+        return None
+    fields["shortcode"] = shortcode
+    return fields
+
+
+def iter_media(payload) -> Iterator[Dict]:
+    """Yield every media object found anywhere in a JSON payload."""
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            media = parse_media_node(node)
+            if media:
+                yield media
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+class ReelResponseCollector:
+    """Listens to ``page.on("response")`` and indexes reel media by shortcode."""
+
+    def __init__(self, max_media: int = MAX_CACHED_MEDIA):
+        self.media: "OrderedDict[str, Dict]" = OrderedDict()
+        self.max_media = max_media
+        self._events: Dict[str, asyncio.Event] = {}
+
+    def attach(self, page) -> None:
+        page.on("response", self._on_response)
+
+    def detach(self, page) -> None:
+        page.remove_listener("response", self._on_response)
+
+    def add_payload(self, payload) -> int:
+        """Index every media object in ``payload``; returns how many were found."""
+        found = 0
+        for media in iter_media(payload):
+            shortcode = media["shortcode"]
+            merged = self.media.pop(shortcode, {})
+            merged.update(media)
+            self.media[shortcode] = merged
+            found += 1
+            event = self._events.get(shortcode)
+            if event:
+                event.set()
+        while len(self.media) > self.max_media:
+            self.media.popitem(last=False)
+        return found
+
+    def get(self, shortcode: str) -> Optional[Dict]:
+        return self.media.get(shortcode)
+
+    async def wait_for(self, shortcode: str, timeout: float) -> Optional[Dict]:
+        """Wait up to ``timeout`` seconds for a payload describing ``shortcode``."""
+        if shortcode in self.media:
+            return self.media[shortcode]
+        event = self._events.setdefault(shortcode, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._events.pop(shortcode, None)
+        return self.media.get(shortcode)
+
+    async def _on_response(self, response) -> None:
+        url = response.url
+        if not any(pattern in url for pattern in API_URL_PATTERNS):
+            return
+        try:
+            payload = await response.json()
+        except Exception:
+            # JSON以外のレスポンスやボディ取得前に閉じられたページは無視
+            return
+        found = self.add_payload(payload)
+        if found:
+            logger.debug("Collected {} media objects from {}", found, url)
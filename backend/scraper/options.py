@@ -0,0 +1,26 @@
+"""Scrape job options shared by the API and the scraper, without importing the scraper itself."""
+
+import os
+from datetime import datetime
+from typing import Optional
+
+from .watermarks import parse_posted_at
+
+# リールのメタデータ取得方法: "network" (APIレスポンス優先、DOMで補完) または "dom"
+EXTRACTION_MODES = ("network", "dom")
+DEFAULT_EXTRACTION = os.getenv("EXTRACTION_MODE", "network")
+
+# リールの辿り方: "sequential" (最初のリールから次へボタンで順に移動) または
+# "grid" (グリッドからURLを収集してから各リールを直接開く)
+SCRAPE_MODES = ("sequential", "grid")
+DEFAULT_MODE = os.getenv("SCRAPE_MODE", "sequential")
+
+
+def parse_since(since: Optional[str]) -> Optional[datetime]:
+    """``since`` (例: "2024-05-01" や "2024-05-01T09:00:00Z") をUTCの日時に変換"""
+    if not since:
+        return None
+    parsed = parse_posted_at(since)
+    if parsed is None:
+        raise ValueError(f"Invalid since date: {since}")
+    return parsed
@@ -0,0 +1,214 @@
+"""Warm browser pool shared across scrape jobs."""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from loguru import logger
+from playwright.async_api import async_playwright
+
+from .login import load_context
+
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+MAX_USES_PER_BROWSER = int(os.getenv("BROWSER_MAX_USES", "20"))
+HEALTH_CHECK_SEC = float(os.getenv("BROWSER_HEALTH_CHECK_SEC", "60"))
+HEALTH_CHECK_TIMEOUT_SEC = float(os.getenv("BROWSER_HEALTH_CHECK_TIMEOUT_SEC", "10"))
+
+
+class PooledBrowser:
+    """A launched browser and its logged-in context, plus usage bookkeeping."""
+
+    def __init__(self, browser, context):
+        self.browser = browser
+        self.context = context
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+    async def close(self) -> None:
+        try:
+            await self.browser.close()
+        except Exception as e:
+            logger.debug("Error closing pooled browser: {}", str(e))
+
+
+class BrowserPool:
+    """Keeps ``size`` warm browsers/contexts that jobs lease and return.
+
+    Browsers are recycled after ``max_uses`` leases or when a health check
+    fails, and idle browsers are probed every ``health_check_sec`` seconds.
+    With ``account`` (scraper/accounts.py) every context is logged in as that
+    account; otherwise the INSTA_USER state is used.
+    """
+
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        max_uses: int = MAX_USES_PER_BROWSER,
+        health_check_sec: float = HEALTH_CHECK_SEC,
+        account=None,
+    ):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.health_check_sec = health_check_sec
+        self.account = account
+        self._playwright = None
+        self._idle: List[PooledBrowser] = []
+        self._total = 0
+        self._cond = asyncio.Condition()
+        self._health_task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.recycled = 0
+
+    async def start(self) -> None:
+        """Start Playwright and warm up the pool."""
+        self._playwright = await async_playwright().start()
+        for _ in range(self.size):
+            try:
+                await self._reserve()
+                await self._put(await self._create())
+            except Exception as e:
+                # 起動に失敗してもAPIは立ち上げ、lease時に再作成を試みる
+                logger.error("Could not warm up pooled browser: {}", str(e))
+                break
+        if self.health_check_sec > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+        logger.info("Browser pool started with {}/{} warm browsers", len(self._idle), self.size)
+
+    async def stop(self) -> None:
+        """Close every idle browser and stop Playwright."""
+        self._closed = True
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+        async with self._cond:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            await self._discard(entry)
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        logger.info("Browser pool stopped")
+
+    @asynccontextmanager
+    async def lease(self):
+        """Lease a warm context for the duration of the ``async with`` block."""
+        entry = await self._acquire()
+        entry.uses += 1
+        healthy = True
+        try:
+            yield entry.context
+        except Exception:
+            healthy = entry.browser.is_connected()
+            raise
+        finally:
+            await self._release(entry, healthy)
+
+    def stats(self) -> Dict:
+        return {
+            "size": self.size,
+            "total": self._total,
+            "idle": len(self._idle),
+            "in_use": self._total - len(self._idle),
+            "max_uses": self.max_uses,
+            "recycled": self.recycled,
+        }
+
+    async def _reserve(self) -> None:
+        async with self._cond:
+            self._total += 1
+
+    async def _create(self) -> PooledBrowser:
+        """Launch a browser for a slot already counted by ``_reserve``."""
+        try:
+            browser, context = await load_context(self._playwright, self.account)
+        except Exception:
+            async with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        return PooledBrowser(browser, context)
+
+    async def _put(self, entry: PooledBrowser) -> None:
+        async with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    async def _discard(self, entry: PooledBrowser) -> None:
+        async with self._cond:
+            self._total -= 1
+            self._cond.notify()
+        await entry.close()
+
+    async def _replace(self, entry: PooledBrowser) -> None:
+        self.recycled += 1
+        await self._discard(entry)
+        if self._closed:
+            return
+        try:
+            await self._reserve()
+            await self._put(await self._create())
+        except Exception as e:
+            logger.error("Could not replace pooled browser: {}", str(e))
+
+    async def _acquire(self) -> PooledBrowser:
+        while True:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            async with self._cond:
+                while not self._idle and self._total >= self.size:
+                    await self._cond.wait()
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._total += 1
+                    entry = None
+            if entry is None:
+                return await self._create()
+            if await self._is_healthy(entry):
+                return entry
+            logger.warning("Leased browser failed health check, replacing it")
+            self.recycled += 1
+            await self._discard(entry)
+
+    async def _release(self, entry: PooledBrowser, healthy: bool) -> None:
+        # ジョブが開いたページは閉じて次のジョブに持ち越さない
+        for page in list(entry.context.pages):
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+        if self._closed or not healthy or entry.uses >= self.max_uses:
+            logger.info("Recycling pooled browser after {} uses", entry.uses)
+            await self._replace(entry)
+            return
+
+        await self._put(entry)
+
+    async def _is_healthy(self, entry: PooledBrowser) -> bool:
+        if not entry.browser.is_connected():
+            return False
+        try:
+            page = await asyncio.wait_for(entry.context.new_page(), timeout=HEALTH_CHECK_TIMEOUT_SEC)
+            await page.close()
+            return True
+        except Exception as e:
+            logger.debug("Health check failed: {}", str(e))
+            return False
+
+    async def _health_loop(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.health_check_sec)
+            async with self._cond:
+                idle, self._idle = self._idle, []
+            for entry in idle:
+                if await self._is_healthy(entry):
+                    await self._put(entry)
+                    continue
+                logger.warning("Idle browser failed health check, replacing it")
+                await self._replace(entry)
@@ -0,0 +1,89 @@
+"""CPU and memory usage of a process together with its children (its Chromium browsers)."""
+
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:  # psutil は任意。なければLinuxの /proc を読む
+    psutil = None
+
+PROC = Path("/proc")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _proc_stats() -> Dict[int, Tuple[int, float, int]]:
+    """``pid -> (ppid, cpu seconds, rss bytes)`` for every process in /proc."""
+    stats = {}
+    for entry in PROC.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            raw = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # comm は括弧で囲まれ空白を含みうるので、最後の ")" の後ろを分割する
+        fields = raw[raw.rindex(")") + 2:].split()
+        stats[int(entry.name)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, int(fields[21]) * PAGE_SIZE)
+    return stats
+
+
+def _tree(root: int, parents: Iterable[Tuple[int, int]]) -> set:
+    children: Dict[int, list] = {}
+    for pid, ppid in parents:
+        children.setdefault(ppid, []).append(pid)
+    tree, stack = set(), [root]
+    while stack:
+        pid = stack.pop()
+        tree.add(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def tree_usage(pid: int) -> Optional[Tuple[float, int, int]]:
+    """``(cpu seconds, rss bytes, processes)`` of ``pid`` and all its descendants."""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        cpu, rss = 0.0, 0
+        for proc in procs:
+            try:
+                times = proc.cpu_times()
+                cpu += times.user + times.system
+                rss += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        return cpu, rss, len(procs)
+    if not PROC.exists():
+        return None
+    stats = _proc_stats()
+    if pid not in stats:
+        return None
+    tree = _tree(pid, ((child, stat[0]) for child, stat in stats.items()))
+    return sum(stats[p][1] for p in tree), sum(stats[p][2] for p in tree), len(tree)
+
+
+class ProcessUsage:
+    """CPU percent since the previous sample and current RSS of a process tree."""
+
+    def __init__(self, pid: Optional[int] = None):
+        self.pid = pid or os.getpid()
+        self._last: Optional[Tuple[float, float]] = None
+
+    def sample(self) -> Dict:
+        usage = tree_usage(self.pid)
+        if usage is None:
+            return {"cpu_percent": None, "rss_bytes": None, "processes": None}
+        cpu, rss, processes = usage
+        now = time.monotonic()
+        percent = None
+        if self._last is not None and now > self._last[0]:
+            percent = round(100 * (cpu - self._last[1]) / (now - self._last[0]), 1)
+        self._last = (now, cpu)
+        return {"cpu_percent": percent, "rss_bytes": rss, "processes": processes}
@@ -0,0 +1,212 @@
+"""Page recycling: replace a job's pages (or their contexts) before Chromium memory grows without bound."""
+
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from .login import open_context
+from .metrics import PAGE_JS_HEAP_BYTES, PAGE_RECYCLES
+
+# 1つのページで処理するリール数の上限。超えたら新しいページに切り替える（0で無効）
+PAGE_RECYCLE_REELS = int(os.getenv("PAGE_RECYCLE_REELS", "100"))
+# ページのJSヒープ使用量（CDP Performance.getMetrics の JSHeapUsedSize, MB）の上限（0で無効）
+PAGE_RECYCLE_HEAP_MB = float(os.getenv("PAGE_RECYCLE_HEAP_MB", "300"))
+# JSヒープを測る間隔（リール数）。ターゲットの切り替わりでは常に測る
+PAGE_MEMORY_SAMPLE_REELS = int(os.getenv("PAGE_MEMORY_SAMPLE_REELS", "10"))
+# "page": 同じコンテキストでページだけ開き直す / "context": 現在のCookieで新しいコンテキストを作る
+PAGE_RECYCLE_SCOPE = os.getenv("PAGE_RECYCLE_SCOPE", "page")
+# ジョブの進捗に残すメモリの推移の点数。超えたら間引く
+MEMORY_MAX_SAMPLES = 500
+
+RECYCLE_SCOPES = ("page", "context")
+
+MB = 1024 ** 2
+
+
+class PageSlot:
+    """One worker's page. The recycler swaps ``page`` in place, so a worker keeps its slot."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.page = None
+        # scope="context" で作ったこのスロット専用のコンテキスト（最初のページは共有コンテキスト）
+        self.context = None
+        self.cdp = None
+        self.reels = 0
+        self.sampled_reels = 0
+        self.pending: Optional[Dict] = None
+        # 巡回の続きを新しいページで再開できなかった（次のターゲットまで巡回中は開き直さない）
+        self.resume_failed = False
+
+
+class PageRecycler:
+    """Opens the pages of a job and replaces them after ``max_reels`` reels or above ``max_heap_mb``.
+
+    Callers report reels with ``count_reel`` and call ``checkpoint`` where the
+    page can be swapped without losing their place: between reels opened by
+    URL (grid mode), between targets, and between reels of a sequential walk,
+    whose ``resume(page)`` brings the new page to the current reel before the
+    swap (if it fails the walk stays on the old page). ``on_open(slot)`` runs
+    for every new page, to attach listeners. The JS heap is sampled every
+    ``sample_reels`` reels and at target boundaries; ``summary()`` returns
+    the samples and each recycle with the heap before and after it.
+    """
+
+    def __init__(
+        self,
+        context,
+        on_open: Optional[Callable[[PageSlot], None]] = None,
+        max_reels: Optional[int] = None,
+        max_heap_mb: Optional[float] = None,
+        sample_reels: Optional[int] = None,
+        scope: Optional[str] = None,
+    ):
+        self.context = context
+        self.on_open = on_open
+        self.max_reels = PAGE_RECYCLE_REELS if max_reels is None else max_reels
+        self.max_heap_mb = PAGE_RECYCLE_HEAP_MB if max_heap_mb is None else max_heap_mb
+        self.sample_reels = max(1, PAGE_MEMORY_SAMPLE_REELS if sample_reels is None else sample_reels)
+        self.scope = scope or PAGE_RECYCLE_SCOPE
+        if self.scope not in RECYCLE_SCOPES:
+            logger.warning("Unknown PAGE_RECYCLE_SCOPE {}, recycling pages", self.scope)
+            self.scope = "page"
+        self.slots: List[PageSlot] = []
+        self.reels = 0
+        self.samples: List[Dict] = []
+        self.recycled: List[Dict] = []
+        self.peak_heap_mb: Optional[float] = None
+
+    async def open(self, count: int) -> List[PageSlot]:
+        for index in range(count):
+            slot = PageSlot(index)
+            await self._open_page(slot, self.context)
+            self.slots.append(slot)
+        return self.slots
+
+    async def _open_page(self, slot: PageSlot, context) -> None:
+        self._use_page(slot, await context.new_page())
+
+    def _use_page(self, slot: PageSlot, page) -> None:
+        slot.page = page
+        slot.cdp = None
+        slot.reels = slot.sampled_reels = 0
+        if self.on_open is not None:
+            self.on_open(slot)
+
+    def count_reel(self, slot: PageSlot) -> None:
+        slot.reels += 1
+        self.reels += 1
+
+    async def sample(self, slot: PageSlot) -> Optional[float]:
+        """JS heap of the slot's page in MB, or None when CDP is unavailable."""
+        slot.sampled_reels = slot.reels
+        try:
+            if slot.cdp is None:
+                slot.cdp = await slot.page.context.new_cdp_session(slot.page)
+                await slot.cdp.send("Performance.enable")
+            metrics = await slot.cdp.send("Performance.getMetrics")
+        except Exception as e:
+            logger.debug("Could not read page metrics: {}", str(e))
+            return None
+        heap = next((m["value"] for m in metrics["metrics"] if m["name"] == "JSHeapUsedSize"), None)
+        if heap is None:
+            return None
+        PAGE_JS_HEAP_BYTES.observe(heap)
+        heap_mb = round(heap / MB, 1)
+        self.peak_heap_mb = max(self.peak_heap_mb or 0.0, heap_mb)
+        if len(self.samples) >= MEMORY_MAX_SAMPLES:
+            del self.samples[::2]
+        self.samples.append({"reels": self.reels, "slot": slot.index, "heap_mb": heap_mb})
+        if slot.pending is not None:
+            # 切り替え後の最初の計測を、切り替え前の値と対にして残す
+            slot.pending["heap_mb_after"] = heap_mb
+            slot.pending = None
+        return heap_mb
+
+    async def checkpoint(self, slot: PageSlot, boundary: bool = False, resume: Optional[Callable[[object], Awaitable[None]]] = None) -> bool:
+        """Recycle the slot's page if it is due; returns True when it was replaced.
+
+        After a failed ``resume`` the slot is not recycled mid-walk again until
+        the next ``boundary`` checkpoint, so each later reel does not pay for
+        another attempt.
+        """
+        heap_mb = None
+        if boundary:
+            slot.resume_failed = False
+        if boundary or slot.reels - slot.sampled_reels >= self.sample_reels:
+            heap_mb = await self.sample(slot)
+        if resume is not None and slot.resume_failed:
+            return False
+        if self.max_reels and slot.reels >= self.max_reels:
+            reason = "reels"
+        elif self.max_heap_mb and heap_mb is not None and heap_mb >= self.max_heap_mb:
+            reason = "heap"
+        else:
+            return False
+        return await self.recycle(slot, reason, heap_mb, resume)
+
+    async def recycle(self, slot: PageSlot, reason: str, heap_mb: Optional[float] = None, resume: Optional[Callable[[object], Awaitable[None]]] = None) -> bool:
+        old_page, old_context = slot.page, slot.context
+        context = old_context or self.context
+        try:
+            if self.scope == "context" and getattr(self.context, "browser", None) is not None:
+                # 現在のCookie（ジョブ中に更新されたセッションを含む）を新しいコンテキストに引き継ぐ
+                state = await context.storage_state()
+                context = await open_context(self.context.browser, state)
+            page = await context.new_page()
+            if resume is not None:
+                # 新しいページで続きから再開できることを確かめてから切り替える
+                try:
+                    await resume(page)
+                except Exception:
+                    slot.resume_failed = True
+                    await _close(page)
+                    raise
+            self._use_page(slot, page)
+        except Exception as e:
+            # 開き直せなければ今のページで続ける
+            logger.error("Could not recycle page {}: {}", slot.index, str(e))
+            if context is not (old_context or self.context):
+                await _close(context)
+            return False
+        if context is not self.context:
+            slot.context = context
+        await _close(old_page)
+        if old_context is not None and old_context is not slot.context:
+            await _close(old_context)
+
+        PAGE_RECYCLES.labels(self.scope, reason).inc()
+        entry = {"reels": self.reels, "slot": slot.index, "reason": reason, "heap_mb_before": heap_mb, "heap_mb_after": None}
+        self.recycled.append(entry)
+        slot.pending = entry
+        logger.info("Recycled {} {} ({}, heap {} MB) after {} reels in the job", self.scope, slot.index, reason, heap_mb, self.reels)
+        return True
+
+    async def close(self) -> None:
+        for slot in self.slots:
+            await _close(slot.page)
+            if slot.context is not None:
+                await _close(slot.context)
+
+    def summary(self) -> Dict:
+        reasons: Dict[str, int] = {}
+        for entry in self.recycled:
+            reasons[entry["reason"]] = reasons.get(entry["reason"], 0) + 1
+        return {
+            "scope": self.scope,
+            "max_reels": self.max_reels,
+            "max_heap_mb": self.max_heap_mb,
+            "recycles": len(self.recycled),
+            "reasons": reasons,
+            "peak_heap_mb": self.peak_heap_mb,
+            "recycled": self.recycled,
+            "samples": self.samples,
+        }
+
+
+async def _close(target) -> None:
+    try:
+        await target.close()
+    except Exception as e:
+        logger.debug("Error closing recycled page: {}", str(e))
@@ -0,0 +1,140 @@
+"""Cross-job SQLite cache of extracted reel fields with a per-column TTL."""
+
+import contextvars
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+REEL_CACHE_ENABLED = os.getenv("REEL_CACHE", "1") != "0"
+REEL_CACHE_PATH = Path(os.getenv("REEL_CACHE_PATH", "state/reel_cache.sqlite3"))
+
+# カラムごとの有効期間（秒）。数値系はすぐ古くなるが、キャプションや投稿日時はほぼ変わらない
+DEFAULT_TTL_SEC = {
+    "caption": 7 * 24 * 3600,
+    "posted_at": 30 * 24 * 3600,
+    "likes": 3600,
+    "comments": 3600,
+    "video_view_count": 3600,
+}
+
+
+def _ttl_from_env(default: Dict[str, int]) -> Dict[str, float]:
+    """Parse ``REEL_CACHE_TTL_SEC`` such as ``"likes=600,caption=86400"`` over the defaults."""
+    ttl = {field: float(sec) for field, sec in default.items()}
+    for item in os.getenv("REEL_CACHE_TTL_SEC", "").split(","):
+        if "=" in item:
+            field, sec = item.split("=", 1)
+            ttl[field.strip()] = float(sec)
+    return ttl
+
+
+REEL_CACHE_TTL_SEC = _ttl_from_env(DEFAULT_TTL_SEC)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reel_fields (
+    shortcode TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (shortcode, field)
+);
+"""
+
+# ジョブ単位のキャッシュ統計。scrape_jobのタスク内で設定され、子タスクにも引き継がれる
+_job_cache_stats: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar("job_cache_stats", default=None)
+
+
+def start_job_cache_stats() -> Dict[str, int]:
+    """Start counting cache lookups for the current job task."""
+    stats = {"field_hits": 0, "field_misses": 0, "reels_from_cache": 0}
+    _job_cache_stats.set(stats)
+    return stats
+
+
+def _count(key: str, n: int = 1) -> None:
+    stats = _job_cache_stats.get()
+    if stats is not None:
+        stats[key] += n
+
+
+def summarize_cache_stats(stats: Dict[str, int]) -> Dict:
+    lookups = stats["field_hits"] + stats["field_misses"]
+    return {**stats, "hit_rate": round(stats["field_hits"] / lookups, 3) if lookups else None}
+
+
+class ReelCache:
+    """Field values per reel shortcode, each with its own fetch time.
+
+    ``lookup`` only returns values younger than the column's TTL, so a job
+    re-extracts just the stale or missing columns of a reel it has seen.
+    The database is opened on first use.
+    """
+
+    def __init__(self, path: Path = REEL_CACHE_PATH, ttl_sec: Dict[str, float] = REEL_CACHE_TTL_SEC, enabled: bool = REEL_CACHE_ENABLED):
+        self.path = Path(path)
+        self.ttl_sec = ttl_sec
+        self.enabled = enabled
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def lookup(self, shortcode: str, fields: List[str], record: bool = True) -> Dict:
+        """Return the fresh cached values of ``fields`` for ``shortcode``.
+
+        With ``record=False`` the lookup is not counted in the job statistics.
+        """
+        if not self.enabled or not shortcode or not fields:
+            return {}
+        try:
+            rows = self._connection().execute(
+                f"SELECT field, value, fetched_at FROM reel_fields WHERE shortcode = ? AND field IN ({','.join('?' * len(fields))})",
+                (shortcode, *fields),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Reel cache lookup failed for {}: {}", shortcode, str(e))
+            return {}
+        now = time.time()
+        fresh = {}
+        for field, value, fetched_at in rows:
+            if now - fetched_at <= self.ttl_sec.get(field, 0):
+                fresh[field] = json.loads(value)
+        if record:
+            _count("field_hits", len(fresh))
+            _count("field_misses", len(fields) - len(fresh))
+        return fresh
+
+    def store(self, shortcode: str, values: Dict) -> None:
+        if not self.enabled or not shortcode or not values:
+            return
+        now = time.time()
+        try:
+            self._connection().executemany(
+                "INSERT OR REPLACE INTO reel_fields (shortcode, field, value, fetched_at) VALUES (?, ?, ?, ?)",
+                [(shortcode, field, json.dumps(value, ensure_ascii=False), now) for field, value in values.items()],
+            )
+        except sqlite3.Error as e:
+            logger.warning("Reel cache store failed for {}: {}", shortcode, str(e))
+
+    def record_reel_from_cache(self, fields: int) -> None:
+        """Count a reel whose ``fields`` were all served from the cache."""
+        _count("reels_from_cache")
+        _count("field_hits", fields)
+
+
+REEL_CACHE = ReelCache()
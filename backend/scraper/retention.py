@@ -0,0 +1,184 @@
+"""Retention: prune old job records, evict job results from output/ (age + size LRU), clean debug screenshots."""
+
+import asyncio
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from .csv_utils import OUTPUT_DIR
+from .login import DEBUG_SCREENSHOT_DIR
+from .metrics import OUTPUT_BYTES, RETENTION_EVICTIONS, RETENTION_FREED_BYTES
+
+# 終了したジョブの記録（進捗・結果のパス）を残す件数と期間
+JOB_RETENTION_MAX_JOBS = int(os.getenv("JOB_RETENTION_MAX_JOBS", "1000"))
+JOB_RETENTION_SEC = float(os.getenv("JOB_RETENTION_SEC", str(30 * 24 * 3600)))
+# 期限切れにしたジョブの記録（ダウンロードに 410 Gone を返すため）を残す件数と、終了からの期間。超えたら削除する
+JOB_TOMBSTONE_MAX_JOBS = int(os.getenv("JOB_TOMBSTONE_MAX_JOBS", "10000"))
+JOB_TOMBSTONE_SEC = float(os.getenv("JOB_TOMBSTONE_SEC", str(90 * 24 * 3600)))
+# この時間を過ぎても取り出されないジョブはエラーにする（0で無効）
+QUEUED_JOB_MAX_AGE_SEC = float(os.getenv("QUEUED_JOB_MAX_AGE_SEC", str(24 * 3600)))
+
+# output/ の上限サイズと、最後に使われて（完了・ダウンロード）から結果を残す期間。超えたら古い順に削除する
+OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", str(2 * 1024 ** 3)))
+OUTPUT_MAX_AGE_SEC = float(os.getenv("OUTPUT_MAX_AGE_SEC", str(3 * 24 * 3600)))
+# ジョブの記録がないファイルを削除するまでの猶予（秒）。ジョブ一覧を読んだ後に始まったジョブの途中結果を消さないように
+OUTPUT_ORPHAN_MIN_AGE_SEC = float(os.getenv("OUTPUT_ORPHAN_MIN_AGE_SEC", "3600"))
+
+# デバッグ用スクリーンショット（DEBUG_SCREENSHOT_DIR の debug_*.png）を残す期間と件数
+DEBUG_SCREENSHOT_MAX_AGE_SEC = float(os.getenv("DEBUG_SCREENSHOT_MAX_AGE_SEC", str(24 * 3600)))
+DEBUG_SCREENSHOT_MAX_FILES = int(os.getenv("DEBUG_SCREENSHOT_MAX_FILES", "50"))
+
+RETENTION_INTERVAL_SEC = float(os.getenv("RETENTION_INTERVAL_SEC", "600"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _size(path: Path) -> int:
+    if path.is_dir():
+        return sum(child.stat().st_size for child in path.rglob("*") if child.is_file())
+    return path.stat().st_size
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def scan_output(out_dir: Path) -> Dict[str, Tuple[List[Path], int, float]]:
+    """``job_id -> (paths, bytes, newest mtime)`` for every entry in ``out_dir``.
+
+    Every output entry is named after its job: ``<job_id>.csv``, the
+    converted ``<job_id>.<ext>`` copies, ``<job_id>.parts/`` and temp files.
+    """
+    jobs: Dict[str, Tuple[List[Path], int, float]] = {}
+    if not out_dir.exists():
+        return jobs
+    for path in out_dir.iterdir():
+        if path.name.startswith("."):
+            continue
+        try:
+            size, mtime = _size(path), path.stat().st_mtime
+        except OSError:
+            continue
+        job_id = path.name.split(".", 1)[0]
+        paths, total, newest = jobs.get(job_id, ([], 0, 0.0))
+        jobs[job_id] = (paths + [path], total + size, max(newest, mtime))
+    return jobs
+
+
+def sweep_output(jobs: Dict[str, Dict], out_dir: Optional[Path] = None, max_bytes: Optional[int] = None, max_age_sec: Optional[float] = None, now: Optional[float] = None, orphan_min_age_sec: Optional[float] = None) -> List[Tuple[str, str, int]]:
+    """Delete results that are orphaned, too old, or beyond the size quota (least recently used first).
+
+    ``jobs`` is ``JobQueue.job_files_index()``; files of queued and running
+    jobs are never touched. Files of jobs missing from ``jobs`` are deleted
+    only once untouched for ``orphan_min_age_sec``, as the job may have been
+    added after ``jobs`` was read. Returns ``(job_id, reason, bytes)`` per
+    evicted job.
+    """
+    out_dir = Path(out_dir or OUTPUT_DIR)
+    max_bytes = OUTPUT_MAX_BYTES if max_bytes is None else max_bytes
+    max_age_sec = OUTPUT_MAX_AGE_SEC if max_age_sec is None else max_age_sec
+    orphan_min_age_sec = OUTPUT_ORPHAN_MIN_AGE_SEC if orphan_min_age_sec is None else orphan_min_age_sec
+    now = now or time.time()
+    evicted = []
+    remaining = []
+    total = 0
+    for job_id, (paths, size, mtime) in scan_output(out_dir).items():
+        job = jobs.get(job_id)
+        if job is not None and job["status"] in ACTIVE_STATUSES:
+            total += size
+            continue
+        last_used = max(mtime, job["last_used"]) if job else mtime
+        if job is None and now - mtime < orphan_min_age_sec:
+            total += size
+            continue
+        if job is None:
+            # 記録のないジョブの結果や、途中で止まったジョブの残骸
+            reason = "orphaned"
+        elif job["status"] == "expired":
+            # 保持期間を過ぎて記録を期限切れにしたジョブの結果
+            reason = "retention"
+        elif max_age_sec and now - last_used > max_age_sec:
+            reason = "age"
+        else:
+            remaining.append((last_used, job_id, paths, size))
+            total += size
+            continue
+        for path in paths:
+            _remove(path)
+        evicted.append((job_id, reason, size))
+
+    # 上限を超えている間、最後に使われたのが古いジョブから削除する
+    for last_used, job_id, paths, size in sorted(remaining):
+        if not max_bytes or total <= max_bytes:
+            break
+        for path in paths:
+            _remove(path)
+        total -= size
+        evicted.append((job_id, "quota", size))
+    OUTPUT_BYTES.set(total)
+    return evicted
+
+
+def sweep_screenshots(directory: Optional[Path] = None, max_age_sec: Optional[float] = None, max_files: Optional[int] = None, now: Optional[float] = None) -> int:
+    """Delete debug screenshots older than ``max_age_sec`` and all but the newest ``max_files``."""
+    directory = Path(directory or DEBUG_SCREENSHOT_DIR)
+    max_age_sec = DEBUG_SCREENSHOT_MAX_AGE_SEC if max_age_sec is None else max_age_sec
+    max_files = DEBUG_SCREENSHOT_MAX_FILES if max_files is None else max_files
+    now = now or time.time()
+    shots = sorted(directory.glob("debug_*.png"), key=lambda path: path.stat().st_mtime, reverse=True)
+    removed = 0
+    for index, path in enumerate(shots):
+        reason = "count" if index >= max_files else "age" if now - path.stat().st_mtime > max_age_sec else None
+        if reason is None:
+            continue
+        size = path.stat().st_size
+        path.unlink(missing_ok=True)
+        RETENTION_EVICTIONS.labels("screenshot", reason).inc()
+        RETENTION_FREED_BYTES.inc(size)
+        removed += 1
+    return removed
+
+
+async def run_retention(queue) -> Dict:
+    """One retention pass; file system work runs in a thread, queue updates on the loop."""
+    expired = queue.expire_queued(QUEUED_JOB_MAX_AGE_SEC) if QUEUED_JOB_MAX_AGE_SEC else []
+    RETENTION_EVICTIONS.labels("job", "queued_too_long").inc(len(expired))
+    pruned = queue.prune_finished(JOB_RETENTION_MAX_JOBS, JOB_RETENTION_SEC)
+    RETENTION_EVICTIONS.labels("job", "retention").inc(len(pruned))
+    tombstones = queue.prune_tombstones(JOB_TOMBSTONE_MAX_JOBS, JOB_TOMBSTONE_SEC)
+    RETENTION_EVICTIONS.labels("job", "tombstone").inc(tombstones)
+
+    evicted = await asyncio.to_thread(sweep_output, queue.job_files_index())
+    for job_id, reason, size in evicted:
+        queue.expire_result(job_id, reason)
+        RETENTION_EVICTIONS.labels("output", reason).inc()
+        RETENTION_FREED_BYTES.inc(size)
+    screenshots = await asyncio.to_thread(sweep_screenshots)
+
+    summary = {
+        "queued_expired": len(expired),
+        "jobs_pruned": len(pruned),
+        "tombstones_deleted": tombstones,
+        "outputs_evicted": len(evicted),
+        "bytes_freed": sum(size for _, _, size in evicted),
+        "screenshots_removed": screenshots,
+    }
+    if any(summary.values()):
+        logger.info("Retention: {}", summary)
+    return summary
+
+
+async def retention_loop(queue, interval_sec: float = RETENTION_INTERVAL_SEC) -> None:
+    while True:
+        try:
+            await run_retention(queue)
+        except Exception as e:
+            logger.error("Retention pass failed: {}", str(e))
+        await asyncio.sleep(interval_sec)
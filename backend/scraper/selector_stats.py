@@ -0,0 +1,136 @@
+"""Selector hit/miss registry that tries recently successful selectors first."""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from .metrics import SELECTOR_ATTEMPTS
+
+SELECTOR_STATS_PATH = Path(os.getenv("SELECTOR_STATS_PATH", "state/selector_stats.json"))
+# 統計をディスクに書き出す最短間隔（秒）
+SELECTOR_STATS_FLUSH_SEC = float(os.getenv("SELECTOR_STATS_FLUSH_SEC", "30"))
+
+
+class SelectorAttempt:
+    """Times one selector attempt; recorded as a miss unless ``hit()`` is called."""
+
+    def __init__(self, registry: "SelectorRegistry", group: str, selector: str):
+        self.registry = registry
+        self.group = group
+        self.selector = selector
+        self.succeeded = False
+        self.started = 0.0
+
+    def hit(self) -> None:
+        self.succeeded = True
+
+    def __enter__(self) -> "SelectorAttempt":
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.registry.record(self.group, self.selector, self.succeeded, time.monotonic() - self.started)
+        return False
+
+
+class SelectorRegistry:
+    """Per-group selector statistics persisted to ``path``.
+
+    ``ordered`` puts selectors that have hit before first, most recent winner
+    first, followed by the never-hit candidates in their original order.
+    """
+
+    def __init__(self, path: Path = SELECTOR_STATS_PATH, flush_sec: float = SELECTOR_STATS_FLUSH_SEC):
+        self.path = Path(path)
+        self.flush_sec = flush_sec
+        self.groups: Dict[str, Dict[str, Dict]] = {}
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self.load()
+
+    def load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.groups = data.get("groups", {})
+            logger.info("Loaded selector statistics from {}", self.path)
+        except Exception as e:
+            logger.warning("Could not load selector statistics from {}: {}", self.path, str(e))
+
+    def save(self) -> None:
+        """Write statistics atomically so a crash never leaves a truncated file."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({"version": 1, "groups": self.groups}, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        except Exception as e:
+            logger.warning("Could not save selector statistics to {}: {}", self.path, str(e))
+
+    def ordered(self, group: str, candidates: List[str]) -> List[str]:
+        stats = self.groups.get(group, {})
+        position = {selector: i for i, selector in enumerate(candidates)}
+
+        def key(selector: str):
+            last_hit = stats.get(selector, {}).get("last_hit")
+            if last_hit:
+                return (0, -last_hit, position[selector])
+            return (1, 0, position[selector])
+
+        return sorted(candidates, key=key)
+
+    def attempt(self, group: str, selector: str) -> SelectorAttempt:
+        return SelectorAttempt(self, group, selector)
+
+    def record(self, group: str, selector: str, hit: bool, latency_sec: Optional[float] = None) -> None:
+        entry = self.groups.setdefault(group, {}).setdefault(selector, {
+            "hits": 0, "misses": 0, "latency_sec": 0.0, "timed": 0, "last_hit": None, "last_miss": None,
+        })
+        now = time.time()
+        SELECTOR_ATTEMPTS.labels(group, "hit" if hit else "miss").inc()
+        if hit:
+            entry["hits"] += 1
+            entry["last_hit"] = now
+        else:
+            entry["misses"] += 1
+            entry["last_miss"] = now
+        if latency_sec is not None:
+            entry["latency_sec"] += latency_sec
+            entry["timed"] += 1
+        self._dirty = True
+        if time.monotonic() - self._last_flush >= self.flush_sec:
+            self.save()
+
+    def flush(self) -> None:
+        if self._dirty:
+            self.save()
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """Per-group statistics in the order the selectors would be tried."""
+        report = {}
+        for group, selectors in self.groups.items():
+            rows = []
+            for selector in self.ordered(group, list(selectors)):
+                entry = selectors[selector]
+                attempts = entry["hits"] + entry["misses"]
+                rows.append({
+                    "selector": selector,
+                    "hits": entry["hits"],
+                    "misses": entry["misses"],
+                    "hit_rate": round(entry["hits"] / attempts, 3) if attempts else None,
+                    "avg_latency_ms": round(1000 * entry["latency_sec"] / entry["timed"], 1) if entry["timed"] else None,
+                    "last_hit": entry["last_hit"],
+                    "last_miss": entry["last_miss"],
+                })
+            report[group] = rows
+        return report
+
+
+SELECTOR_REGISTRY = SelectorRegistry()
@@ -0,0 +1,143 @@
+"""Cached Instagram session validity, so login checks stay off the job path."""
+
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger
+
+from .login import INSTAGRAM_COOKIE_DOMAIN, STATE_PATH
+
+# ログイン確認の結果を信用する時間（秒）。これを過ぎるか、ログイン画面に遭遇したら再確認する
+SESSION_VERIFY_TTL_SEC = float(os.getenv("SESSION_VERIFY_TTL_SEC", "1800"))
+# バックグラウンドでセッションを確認する間隔（秒）。0で無効
+SESSION_REFRESH_SEC = float(os.getenv("SESSION_REFRESH_SEC", "600"))
+# Cookieの残り有効期間がこれを下回ったら期限切れ扱いにする（秒）
+SESSION_COOKIE_MARGIN_SEC = float(os.getenv("SESSION_COOKIE_MARGIN_SEC", "3600"))
+
+SESSION_COOKIE = "sessionid"
+LOGIN_WALL_MARKERS = ("/accounts/login", "/challenge/")
+
+
+def is_login_wall(url: str) -> bool:
+    return any(marker in (url or "") for marker in LOGIN_WALL_MARKERS)
+
+
+def session_cookie_expiry(state_path: Path = STATE_PATH) -> Optional[float]:
+    """Expiry (epoch seconds) of the Instagram session cookie in the saved state.
+
+    Returns None when the file or the cookie is missing. A session cookie
+    without an expiry (``expires == -1``) is reported as ``inf``.
+    """
+    try:
+        state = json.loads(Path(state_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    for cookie in state.get("cookies", []):
+        if cookie.get("name") == SESSION_COOKIE and INSTAGRAM_COOKIE_DOMAIN in cookie.get("domain", ""):
+            expires = cookie.get("expires", -1)
+            return float("inf") if expires is None or expires < 0 else float(expires)
+    return None
+
+
+class SessionManager:
+    """Remembers when the login was last verified and re-verifies lazily.
+
+    ``ensure`` is what jobs call: it returns immediately while the session
+    cookie is unexpired and the last verification is younger than the TTL.
+    ``invalidate`` is called when a scrape lands on a login wall, and
+    ``refresh_loop`` re-verifies in the background before the TTL runs out.
+    """
+
+    def __init__(self, state_path: Path = STATE_PATH, verify_ttl_sec: float = SESSION_VERIFY_TTL_SEC, refresh_sec: float = SESSION_REFRESH_SEC):
+        self.state_path = Path(state_path)
+        self.verify_ttl_sec = verify_ttl_sec
+        self.refresh_sec = refresh_sec
+        self.verified_at: Optional[float] = None
+        self.invalid_reason: Optional[str] = None
+        self.verifications = 0
+        self.skipped = 0
+        self._lock = asyncio.Lock()
+
+    def cookie_valid(self) -> bool:
+        expiry = session_cookie_expiry(self.state_path)
+        return expiry is not None and expiry - time.time() > SESSION_COOKIE_MARGIN_SEC
+
+    def is_fresh(self, margin_sec: float = 0.0) -> bool:
+        if self.verified_at is None or self.invalid_reason:
+            return False
+        if time.time() - self.verified_at > self.verify_ttl_sec - margin_sec:
+            return False
+        return self.cookie_valid()
+
+    def invalidate(self, reason: str) -> None:
+        logger.warning("Session invalidated: {}", reason)
+        self.invalid_reason = reason
+
+    async def ensure(self, page, force: bool = False) -> None:
+        """Verify the login on ``page`` unless a recent verification still holds."""
+        if not force and self.is_fresh():
+            self.skipped += 1
+            logger.info("Skipping login verification (verified {:.0f}s ago)", time.time() - self.verified_at)
+            return
+        async with self._lock:
+            # 待っている間に他のジョブが確認を済ませた場合
+            if not force and self.is_fresh():
+                self.skipped += 1
+                return
+            from .fetch import verify_login_status
+            try:
+                await verify_login_status(page)
+            except Exception as e:
+                # ログインできていないまま確認済みとして扱わない
+                self.verified_at = None
+                self.invalidate(f"login failed: {e}")
+                raise
+            self.verifications += 1
+            self.verified_at = time.time()
+            self.invalid_reason = None
+            await self._save_state(page)
+
+    async def recover(self, page) -> None:
+        """Handle a login wall hit while scraping: invalidate and log in again."""
+        self.invalidate(f"login wall at {page.url}")
+        await self.ensure(page)
+
+    async def _save_state(self, page) -> None:
+        # 再ログインで更新されたCookieを保存し、新しく作るコンテキストに引き継ぐ
+        try:
+            await page.context.storage_state(path=self.state_path)
+        except Exception as e:
+            logger.debug("Could not save session state: {}", str(e))
+
+    async def refresh_loop(self, pool) -> None:
+        """Keep the session verified using a pooled context, off the job path."""
+        if self.refresh_sec <= 0:
+            return
+        while True:
+            if not self.is_fresh(margin_sec=self.refresh_sec):
+                try:
+                    async with pool.lease() as context:
+                        page = await context.new_page()
+                        await self.ensure(page, force=True)
+                    logger.info("Background session refresh complete")
+                except Exception as e:
+                    logger.error("Background session refresh failed: {}", str(e))
+            await asyncio.sleep(self.refresh_sec)
+
+    def status(self) -> Dict:
+        expiry = session_cookie_expiry(self.state_path)
+        return {
+            "verified_at": self.verified_at,
+            "fresh": self.is_fresh(),
+            "invalid_reason": self.invalid_reason,
+            "cookie_expires_at": None if expiry in (None, float("inf")) else expiry,
+            "verifications": self.verifications,
+            "skipped": self.skipped,
+        }
+
+
+SESSION = SessionManager()
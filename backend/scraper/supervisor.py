@@ -0,0 +1,177 @@
+"""Supervisor: run scrape workers in child processes, each with its own event loop and browsers."""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from .jobqueue import JOB_WORKERS, NODE_ID, JobQueue
+from .metrics import mark_process_dead
+
+# SCRAPER_ROLE=supervisor で起動するワーカープロセス数（既定は1）。
+# アカウントはプロセスごとに分けて割り当てるため、アカウント数より多くは起動しない
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1")) or 1
+# 異常終了したワーカープロセスを再起動するまでの待ち時間（秒）。連続して落ちる場合は倍にしていく
+RESTART_BACKOFF_SEC = float(os.getenv("WORKER_RESTART_BACKOFF_SEC", "2"))
+RESTART_BACKOFF_MAX_SEC = float(os.getenv("WORKER_RESTART_BACKOFF_MAX_SEC", "60"))
+# この時間（秒）以上動き続けたプロセスは正常とみなし、再起動の待ち時間を初期値に戻す
+HEALTHY_RUN_SEC = float(os.getenv("WORKER_HEALTHY_RUN_SEC", "60"))
+# 停止時に実行中ジョブをキューに戻す猶予（秒）。過ぎたら強制終了する
+STOP_TIMEOUT_SEC = float(os.getenv("WORKER_STOP_TIMEOUT_SEC", "30"))
+MONITOR_SEC = 1.0
+
+
+def run_worker_process(node_id: str, workers: int, accounts: Optional[List[str]] = None) -> None:
+    """Entry point of a worker process; SIGTERM stops it after re-queueing its jobs.
+
+    With ``accounts`` the process only uses (and logs into) those accounts.
+    """
+    from .accounts import ACCOUNT_POOL
+    from .worker import serve
+
+    if accounts is not None:
+        ACCOUNT_POOL.accounts = [account for account in ACCOUNT_POOL.accounts if account.username in accounts]
+
+    async def main():
+        task = asyncio.create_task(serve(node_id=node_id, workers=workers))
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, task.cancel)
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+
+
+class WorkerProcess:
+    """One supervised child process and its restart bookkeeping."""
+
+    def __init__(self, node_id: str, accounts: Optional[List[str]] = None):
+        self.node_id = node_id
+        self.accounts = accounts
+        self.process: Optional[multiprocessing.Process] = None
+        self.restarts = 0
+        self.failures = 0
+        self.started_at: Optional[float] = None
+        self.restart_at: Optional[float] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class Supervisor:
+    """Keeps ``processes`` worker processes running next to the API process.
+
+    Each child runs a WorkerNode (scraper/worker.py) named
+    ``<NODE_ID>-w<n>`` with ``workers_per_process`` job slots. Jobs reach
+    them through the shared queue, which spreads them by reported load;
+    crashed children are restarted with backoff and their jobs re-queued.
+
+    Reel budgets, quarantine and sessions live in each process, so every
+    account (``accounts``, by default the configured ones) is given to
+    exactly one child and there are never more children than accounts: a
+    larger ``processes`` is lowered, with a warning. Scrape metrics of the
+    children are aggregated through ``PROMETHEUS_MULTIPROC_DIR`` (see
+    scraper/metrics.py) and served by the API process's ``/metrics``.
+    """
+
+    def __init__(self, queue: JobQueue, processes: int = WORKER_PROCESSES, workers_per_process: int = JOB_WORKERS, node_prefix: str = NODE_ID, accounts: Optional[List[str]] = None):
+        self.queue = queue
+        self.workers_per_process = workers_per_process
+        if accounts is None:
+            from .accounts import ACCOUNT_POOL
+
+            accounts = [account.username for account in ACCOUNT_POOL.accounts]
+        count = max(1, min(processes, len(accounts) or 1))
+        if count < processes:
+            logger.warning(
+                "WORKER_PROCESSES={} lowered to {}: each worker process needs its own Instagram account ({} configured)",
+                processes, count, len(accounts),
+            )
+        self.children = [
+            WorkerProcess(f"{node_prefix}-w{i}", accounts[i::count] if accounts else None) for i in range(count)
+        ]
+        self._ctx = multiprocessing.get_context("spawn")
+        self._monitor: Optional[asyncio.Task] = None
+
+    def _spawn(self, child: WorkerProcess) -> None:
+        child.process = self._ctx.Process(
+            target=run_worker_process, args=(child.node_id, self.workers_per_process, child.accounts), name=child.node_id, daemon=False
+        )
+        child.process.start()
+        child.started_at = time.monotonic()
+        child.restart_at = None
+        logger.info("Started worker process {} (pid {})", child.node_id, child.process.pid)
+
+    async def start(self) -> None:
+        for child in self.children:
+            self._spawn(child)
+        self._monitor = asyncio.create_task(self._monitor_loop())
+
+    async def _monitor_loop(self) -> None:
+        while True:
+            await asyncio.sleep(MONITOR_SEC)
+            self.check()
+
+    def check(self) -> None:
+        """Restart children that exited, backing off while they keep failing.
+
+        The backoff starts over once a child has stayed up for ``HEALTHY_RUN_SEC``.
+        """
+        now = time.monotonic()
+        for child in self.children:
+            if child.alive and child.failures and now - child.started_at >= HEALTHY_RUN_SEC:
+                child.failures = 0
+            if child.alive or child.process is None:
+                continue
+            if child.restart_at is None:
+                child.failures += 1
+                delay = min(RESTART_BACKOFF_MAX_SEC, RESTART_BACKOFF_SEC * 2 ** (child.failures - 1))
+                child.restart_at = now + delay
+                logger.error("Worker process {} exited with code {}, restarting in {:.0f}s", child.node_id, child.process.exitcode, delay)
+                mark_process_dead(child.process.pid)
+                # 落ちたプロセスのジョブはリース切れを待たずにキューへ戻す
+                self.queue.recover(child.node_id)
+                self.queue.remove_worker(child.node_id)
+            elif now >= child.restart_at:
+                child.restarts += 1
+                self._spawn(child)
+
+    async def stop(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+        for child in self.children:
+            if child.alive:
+                child.process.terminate()
+        for child in self.children:
+            if child.process is None:
+                continue
+            await asyncio.to_thread(child.process.join, STOP_TIMEOUT_SEC)
+            if child.process.is_alive():
+                logger.warning("Worker process {} did not stop in {:.0f}s, killing it", child.node_id, STOP_TIMEOUT_SEC)
+                child.process.kill()
+                await asyncio.to_thread(child.process.join)
+                self.queue.recover(child.node_id)
+            mark_process_dead(child.process.pid)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-process liveness and restarts with the load each one last reported."""
+        loads = self.queue.worker_loads()
+        return {
+            child.node_id: {
+                "pid": child.process.pid if child.process else None,
+                "alive": child.alive,
+                "accounts": child.accounts,
+                "restarts": child.restarts,
+                **{key: value for key, value in loads.get(child.node_id, {}).items() if key != "pid"},
+            }
+            for child in self.children
+        }
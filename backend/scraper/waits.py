@@ -0,0 +1,98 @@
+"""Readiness waits on concrete page signals, plus the explicit politeness delay."""
+
+import asyncio
+import contextvars
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from .login import WAIT_SEC
+from .metrics import WAIT_SECONDS, observe_stage
+
+# 準備完了シグナルを待つ最大時間（URL変化・要素出現など）
+READY_TIMEOUT_SEC = float(os.getenv("READY_TIMEOUT_SEC", "10"))
+
+# リール間に入れる意図的な待機（アクセス間隔の調整用）
+POLITE_DELAY_MIN_SEC = float(os.getenv("POLITE_DELAY_MIN_SEC", str(WAIT_SEC)))
+POLITE_DELAY_MAX_SEC = float(os.getenv("POLITE_DELAY_MAX_SEC", str(WAIT_SEC * 2)))
+
+# プロセス全体の待機統計（ラベルごと）
+WAIT_STATS: Dict[str, Dict[str, float]] = {}
+
+# ジョブ単位の待機統計。scrape_jobのタスク内で設定され、子タスクにも引き継がれる
+_job_wait_stats: contextvars.ContextVar[Optional[Dict[str, Dict[str, float]]]] = contextvars.ContextVar("job_wait_stats", default=None)
+
+
+def start_job_wait_stats() -> Dict[str, Dict[str, float]]:
+    """Start collecting wait statistics for the current job task."""
+    stats: Dict[str, Dict[str, float]] = {}
+    _job_wait_stats.set(stats)
+    return stats
+
+
+def _record(stats: Dict[str, Dict[str, float]], label: str, elapsed: float, fixed_sec: float, ready: bool) -> None:
+    entry = stats.setdefault(label, {"count": 0, "timeouts": 0, "waited_sec": 0.0, "saved_sec": 0.0})
+    entry["count"] += 1
+    entry["timeouts"] += 0 if ready else 1
+    entry["waited_sec"] += elapsed
+    entry["saved_sec"] += max(0.0, fixed_sec - elapsed)
+
+
+def record_wait(label: str, elapsed: float, fixed_sec: float, ready: bool) -> None:
+    """Log one wait and add it to the process and job statistics.
+
+    ``fixed_sec`` is the fixed sleep this wait replaced, so the difference
+    shows how much idle time the readiness signal removed.
+    """
+    _record(WAIT_STATS, label, elapsed, fixed_sec, ready)
+    WAIT_SECONDS.labels(label, "ready" if ready else "timeout").observe(elapsed)
+    job_stats = _job_wait_stats.get()
+    if job_stats is not None:
+        _record(job_stats, label, elapsed, fixed_sec, ready)
+    logger.info("Wait [{}] {} after {:.0f} ms (fixed sleep was {:.0f} ms)",
+                label, "ready" if ready else "timed out", elapsed * 1000, fixed_sec * 1000)
+
+
+def summarize_wait_stats(stats: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    return {
+        "waits": sum(int(entry["count"]) for entry in stats.values()),
+        "timeouts": sum(int(entry["timeouts"]) for entry in stats.values()),
+        "waited_sec": round(sum(entry["waited_sec"] for entry in stats.values()), 3),
+        "saved_sec": round(sum(entry["saved_sec"] for entry in stats.values()), 3),
+    }
+
+
+async def wait_for_url_change(page, previous_url: str, label: str, fixed_sec: float, timeout: float = READY_TIMEOUT_SEC) -> bool:
+    """Wait until the page URL differs from ``previous_url`` (SPA navigation included)."""
+    started = time.monotonic()
+    ready = True
+    try:
+        await page.wait_for_function("(previous) => window.location.href !== previous", arg=previous_url, timeout=timeout * 1000)
+    except Exception:
+        ready = page.url != previous_url
+    record_wait(label, time.monotonic() - started, fixed_sec, ready)
+    return ready
+
+
+async def wait_for_any_selector(page, selectors: List[str], label: str, fixed_sec: float, timeout: float = READY_TIMEOUT_SEC) -> bool:
+    """Wait until any of ``selectors`` is attached to the page."""
+    started = time.monotonic()
+    ready = True
+    try:
+        await page.wait_for_selector(", ".join(selectors), state="attached", timeout=timeout * 1000)
+    except Exception:
+        ready = False
+    record_wait(label, time.monotonic() - started, fixed_sec, ready)
+    return ready
+
+
+async def politeness_delay() -> None:
+    """Sleep for the configured politeness interval between reels."""
+    delay = random.uniform(POLITE_DELAY_MIN_SEC, max(POLITE_DELAY_MIN_SEC, POLITE_DELAY_MAX_SEC))
+    if delay > 0:
+        logger.debug("Politeness delay {:.2f}s", delay)
+        await asyncio.sleep(delay)
+        observe_stage("politeness_delay", delay)
@@ -0,0 +1,143 @@
+"""Per-target watermarks for incremental ("since last run") scraping."""
+
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from .network import shortcode_from_url
+
+WATERMARK_DB_PATH = Path(os.getenv("WATERMARK_DB_PATH", "state/watermarks.sqlite3"))
+
+# プロフィール上部に固定表示されるリールの最大数。古い固定リールで巡回を止めないよう、
+# この位置より前では既知・期限切れのリールを読み飛ばすだけにする
+PINNED_REELS = int(os.getenv("PINNED_REELS", "3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    shortcode TEXT NOT NULL,
+    posted_at TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, name)
+);
+"""
+
+
+def parse_posted_at(value) -> Optional[datetime]:
+    """Parse ``posted_at`` as produced by the DOM and API extractors (ISO 8601, UTC)."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class IncrementalWindow:
+    """Decides, reel by reel, whether a target's walk has reached old content.
+
+    A reel is old when it is the watermark reel, was posted at or before the
+    watermark, or was posted before ``since``. ``classify`` returns ``"new"``,
+    ``"skip"`` (old, but possibly a pinned reel) or ``"stop"``.
+    """
+
+    def __init__(self, watermark: Optional[Dict] = None, since: Optional[datetime] = None, pinned: Optional[int] = None):
+        self.watermark = watermark
+        self.watermark_posted_at = parse_posted_at((watermark or {}).get("posted_at"))
+        self.since = since
+        self.pinned = PINNED_REELS if pinned is None else pinned
+        self.new_rows = 0
+        self.reached_known = False
+        self.newest: Optional[Dict] = None
+        self._newest_posted_at: Optional[datetime] = None
+
+    def is_old(self, row: Dict) -> bool:
+        posted_at = parse_posted_at(row.get("posted_at"))
+        if self.watermark and shortcode_from_url(row.get("url", "")) == self.watermark["shortcode"]:
+            return True
+        if posted_at and self.watermark_posted_at and posted_at <= self.watermark_posted_at:
+            return True
+        return bool(posted_at and self.since and posted_at < self.since)
+
+    def classify(self, position: int, row: Dict) -> str:
+        if self.is_old(row):
+            if position < self.pinned:
+                return "skip"
+            self.reached_known = True
+            return "stop"
+        self.new_rows += 1
+        posted_at = parse_posted_at(row.get("posted_at"))
+        if self.newest is None or (posted_at and (self._newest_posted_at is None or posted_at > self._newest_posted_at)):
+            self.newest = row
+            self._newest_posted_at = posted_at
+        return "new"
+
+    def truncate_urls(self, urls: List[str]) -> List[str]:
+        """Cut a harvested grid at the watermark reel (grid mode has no posted_at yet)."""
+        if not self.watermark:
+            return urls
+        for position, url in enumerate(urls):
+            if position >= self.pinned and shortcode_from_url(url) == self.watermark["shortcode"]:
+                self.reached_known = True
+                return urls[:position]
+        return urls
+
+    def next_watermark(self) -> Optional[Dict]:
+        """The watermark to store, or None when it must not move.
+
+        It only advances when the walk reached previously seen content (or
+        there was no watermark yet); otherwise reels between the old
+        watermark and where the walk ended would never be scraped.
+        """
+        if self.newest is None or (self.watermark and not self.reached_known):
+            return None
+        return {"shortcode": shortcode_from_url(self.newest.get("url", "")), "posted_at": self.newest.get("posted_at") or None}
+
+    def summary(self) -> Dict:
+        return {"new": self.new_rows, "reached_known": self.reached_known, "previous": self.watermark}
+
+
+class WatermarkStore:
+    """Newest reel seen per (kind, name) target; the database is opened on first use."""
+
+    def __init__(self, path: Path = WATERMARK_DB_PATH):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, kind: str, name: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT shortcode, posted_at, updated_at FROM watermarks WHERE kind = ? AND name = ?", (kind, name)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def set(self, kind: str, name: str, shortcode: str, posted_at: Optional[str]) -> None:
+        if not shortcode:
+            return
+        self._connection().execute(
+            "INSERT OR REPLACE INTO watermarks (kind, name, shortcode, posted_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, name, shortcode, posted_at, time.time()),
+        )
+        logger.info("Watermark for {} {} moved to {} ({})", kind, name, shortcode, posted_at)
+
+
+WATERMARKS = WatermarkStore()
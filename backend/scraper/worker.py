@@ -0,0 +1,223 @@
+"""Scrape workers: claim jobs from the shared queue under a lease and report progress back."""
+
+import asyncio
+import os
+import uuid
+from typing import Dict, Optional, Set
+
+from loguru import logger
+
+from .accounts import ACCOUNT_POOL, AccountQuarantinedError, refresh_account_session
+from .csv_utils import remove_attempt_output
+from .events import PROGRESS_EVENTS
+from .fetch import scrape_job
+from .jobqueue import HEARTBEAT_SEC, JOB_LEASE_SEC, JOB_WORKERS, NODE_ID, JobQueue
+from .metrics import JOBS
+from .navigation import NAVIGATION
+from .pool import BrowserPool
+from .procstats import ProcessUsage
+from .reel_cache import REEL_CACHE
+from .selector_stats import SELECTOR_REGISTRY
+from .session import SESSION
+from .watermarks import WATERMARKS
+
+# 負荷に応じた割り当て: より空いているワーカープロセスがある間、新しいジョブをこの時間（秒）だけ譲る
+DISPATCH_GRACE_SEC = float(os.getenv("DISPATCH_GRACE_SEC", "2"))
+
+
+def build_browser_pools() -> Dict[str, BrowserPool]:
+    """One pool per account (or a single pool using INSTA_USER's saved state)."""
+    return {account.username: BrowserPool(account=account) for account in ACCOUNT_POOL.accounts} or {"": BrowserPool()}
+
+
+class WorkerNode:
+    """``workers`` job loops sharing this process's browser pools and accounts.
+
+    Progress of running jobs lives in ``progress`` (updated by scrape_job) and
+    is written to the queue every ``HEARTBEAT_SEC`` together with a lease
+    renewal, so an API process on the same host can serve it. Each claim writes
+    its output under its own attempt name, and the result is published only
+    when saving the final state confirms the lease; a job whose lease was
+    taken over by another worker is cancelled and its files are deleted.
+
+    The node also reports its load (running jobs, CPU and RSS of the process
+    and its browsers) to the queue. A fresh job is left for up to
+    ``DISPATCH_GRACE_SEC`` to a node with a lower share of busy workers, so
+    jobs spread over worker processes by load instead of by who polls first.
+    """
+
+    def __init__(self, queue: JobQueue, progress: Dict[str, Dict], workers: int = JOB_WORKERS, node_id: str = NODE_ID, pools: Optional[Dict[str, BrowserPool]] = None):
+        self.queue = queue
+        self.progress = progress
+        self.workers = workers
+        self.node_id = node_id
+        self.pools = pools if pools is not None else build_browser_pools()
+        self.running: Dict[str, tuple] = {}
+        self.lost: Set[str] = set()
+        self.usage = ProcessUsage()
+        self.last_usage: Dict = {}
+        self._tasks = []
+
+    def worker_name(self, index: int) -> str:
+        return f"{self.node_id}/{index}"
+
+    async def start(self) -> None:
+        for pool in self.pools.values():
+            await pool.start()
+        self.queue.recover(self.node_id)
+        self.report_load()
+        self._tasks = [asyncio.create_task(self.run_worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self.heartbeat_loop()))
+        # ログイン確認をジョブの前ではなくバックグラウンドで行う（アカウントごと）
+        if ACCOUNT_POOL.accounts:
+            for account in ACCOUNT_POOL.accounts:
+                self._tasks.append(asyncio.create_task(refresh_account_session(account, self.pools[account.username])))
+        else:
+            self._tasks.append(asyncio.create_task(SESSION.refresh_loop(self.pools[""])))
+        logger.info("Worker node {} started {} job workers", self.node_id, self.workers)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for pool in self.pools.values():
+            await pool.stop()
+        self.queue.remove_worker(self.node_id)
+        SELECTOR_REGISTRY.flush()
+        REEL_CACHE.close()
+        WATERMARKS.close()
+
+    async def run_worker(self, index: int) -> None:
+        """キューからジョブを取り出して1件ずつ実行する"""
+        worker = self.worker_name(index)
+        while True:
+            # 遷移の失敗が続いてブレーカーが開いている間は新しいジョブを取り出さない
+            await NAVIGATION.breaker.wait_for_cooldown()
+            job_id, params = await self.queue.next_job(worker, JOB_LEASE_SEC, ready=self.has_turn)
+            logger.info("Worker {} picked up job {}", worker, job_id)
+            self.progress[job_id] = {"progress": 0, "status": "running"}
+            # リースを失ったあとも動き続けた実行が、次に取り出したワーカーのファイルを上書き・削除しないよう実行ごとに名前を分ける
+            attempt = uuid.uuid4().hex[:12]
+            # アカウントの空きを待つ間もハートビートでリースを延長するよう、取り出した直後から実行中として扱う
+            task = asyncio.create_task(self.execute(job_id, params, attempt))
+            self.running[job_id] = (worker, task)
+            self.report_load()
+            requeued = False
+            lost = False
+            try:
+                await task
+            except asyncio.CancelledError:
+                if job_id not in self.lost:
+                    # ノードの停止: ジョブをキューに戻してから終了する
+                    self.progress[job_id] = {"progress": 0, "status": "queued", "message": "worker stopped"}
+                    requeued = True
+                    raise
+                lost = True
+                logger.warning("Job {} was reassigned after worker {} lost its lease, dropping its result", job_id, worker)
+            except AccountQuarantinedError as e:
+                # 別のアカウントでやり直す
+                logger.warning("Job {} re-queued: {}", job_id, str(e))
+                self.progress[job_id] = {"progress": 0, "status": "queued", "message": str(e)}
+                JOBS.labels("requeued").inc()
+                PROGRESS_EVENTS.publish(job_id, "status", dict(self.progress[job_id]))
+                requeued = True
+            except Exception as e:
+                logger.error("Job {} failed: {}", job_id, str(e))
+                self.progress[job_id].update({"status": "error", "message": str(e)})
+                JOBS.labels("error").inc()
+                PROGRESS_EVENTS.publish(job_id, "status", dict(self.progress[job_id]))
+            finally:
+                self.running.pop(job_id, None)
+                self.report_load()
+                self.lost.discard(job_id)
+                state = self.progress.pop(job_id, None)
+                published = False
+                if requeued:
+                    self.queue.requeue(job_id, state)
+                elif not lost:
+                    # 結果のファイルは、リースを持ったまま状態を保存できたときだけ公開する
+                    published = self.queue.save_state(job_id, state, worker=worker)
+                    if not published:
+                        logger.warning("Result of job {} not recorded: worker {} no longer holds its lease", job_id, worker)
+                if not published:
+                    remove_attempt_output(job_id, attempt)
+
+    async def execute(self, job_id: str, params: Dict, attempt: str) -> None:
+        """Run a claimed job on the account with the most budget left, waiting for one if needed."""
+        # 取得予算が最も残っている、隔離されていないアカウントに割り当てる
+        account = await ACCOUNT_POOL.acquire() if ACCOUNT_POOL.accounts else None
+        try:
+            pool = self.pools[account.username if account else ""]
+            await scrape_job(job_id, progress=self.progress, pool=pool, account=account, attempt=attempt, **params)
+        finally:
+            if account is not None:
+                ACCOUNT_POOL.release(account)
+
+    def load(self) -> float:
+        return len(self.running) / max(1, self.workers)
+
+    def report_load(self, sample: bool = False) -> None:
+        if sample:
+            self.last_usage = self.usage.sample()
+        self.queue.report_worker(self.node_id, len(self.running), self.workers, self.last_usage, os.getpid())
+
+    def has_turn(self) -> bool:
+        """Whether this node should claim the next job now.
+
+        Never while every account of this node is quarantined. Otherwise
+        defers while another live node has a smaller share of busy workers (or
+        the same share and less CPU), until the job has waited
+        ``DISPATCH_GRACE_SEC``.
+        """
+        if ACCOUNT_POOL.accounts and not ACCOUNT_POOL.available():
+            return False
+        waited = self.queue.oldest_queued_age()
+        if waited is None or waited >= DISPATCH_GRACE_SEC:
+            return True
+        mine = (self.load(), self.last_usage.get("cpu_percent") or 0.0)
+        for node, other in self.queue.worker_loads().items():
+            if node == self.node_id or other["running"] >= other["capacity"]:
+                continue
+            if (other["running"] / max(1, other["capacity"]), other["cpu_percent"] or 0.0) < mine:
+                return False
+        return True
+
+    async def heartbeat_loop(self) -> None:
+        """実行中ジョブの進捗を定期的にDBへ保存し、リースを延長する（期限切れのジョブは再割り当て）"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_SEC)
+            self.heartbeat()
+
+    def heartbeat(self) -> None:
+        for job_id, (worker, task) in list(self.running.items()):
+            state = self.progress.get(job_id)
+            if state is None or self.queue.heartbeat(job_id, worker, state, JOB_LEASE_SEC):
+                continue
+            logger.error("Worker {} lost the lease on job {}, cancelling it", worker, job_id)
+            self.lost.add(job_id)
+            task.cancel()
+        reaped = self.queue.reap_expired()
+        if reaped:
+            JOBS.labels("reassigned").inc(reaped)
+        self.report_load(sample=True)
+
+    def stats(self) -> Dict:
+        return {
+            "node": self.node_id,
+            "workers": self.workers,
+            "usage": self.last_usage,
+            "running": {job_id: worker for job_id, (worker, _) in self.running.items()},
+            "browser_pools": {name: pool.stats() for name, pool in self.pools.items()},
+        }
+
+
+async def serve(queue: Optional[JobQueue] = None, node_id: str = NODE_ID, workers: int = JOB_WORKERS) -> None:
+    """Run a worker node until cancelled (worker.py and the supervisor's processes)."""
+    queue = queue or JobQueue()
+    node = WorkerNode(queue, {}, workers=workers, node_id=node_id)
+    await node.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await node.stop()
+        queue.close()
@@ -0,0 +1,68 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import accounts as accounts_module
+from scraper.accounts import (Account, AccountPool, AccountQuarantinedError, TokenBucket, current_account,
+                              handle_login_wall, load_accounts, spend_budget, use_account)
+
+
+class FakePage:
+    url = "https://www.instagram.com/challenge/?next=/someone/reels/"
+
+
+def make_account(name, tokens, tmp_path):
+    bucket = TokenBucket(capacity=10, rate_per_sec=0)
+    bucket.tokens = tokens
+    return Account(name, "secret", tmp_path / f"{name}.json", bucket=bucket)
+
+
+def test_load_accounts_parses_spec(monkeypatch):
+    monkeypatch.setattr(accounts_module, "USER", None)
+    monkeypatch.setattr(accounts_module, "PASS", None)
+    loaded = load_accounts("alice:pw1, bob:pw:2,broken")
+    assert [(a.username, a.password) for a in loaded] == [("alice", "pw1"), ("bob", "pw:2")]
+    assert loaded[0].state_path != loaded[1].state_path
+
+
+def test_pool_assigns_account_with_budget_and_skips_quarantined(tmp_path):
+    alice = make_account("alice", 2, tmp_path)
+    bob = make_account("bob", 8, tmp_path)
+    pool = AccountPool([alice, bob])
+
+    async def run():
+        assert await pool.acquire() is bob
+        pool.quarantine(bob, "challenge")
+        assert await pool.acquire() is alice
+
+        # 予算を使い切ったアカウントでは取得を続けられない（補充なし）
+        use_account(alice)
+        await spend_budget()
+        await spend_budget()
+        assert alice.reels == 2
+        assert alice.bucket.wait_time() == float("inf")
+
+    asyncio.run(run())
+    assert bob.status()["quarantined"]
+    assert not bob.session.is_fresh()
+
+
+def test_challenge_quarantines_current_account(tmp_path, monkeypatch):
+    account = make_account("carol", 5, tmp_path)
+    pool = AccountPool([account])
+    monkeypatch.setattr(accounts_module, "ACCOUNT_POOL", pool)
+
+    async def run():
+        use_account(account)
+        assert current_account() is account
+        with pytest.raises(AccountQuarantinedError):
+            await handle_login_wall(FakePage())
+        with pytest.raises(AccountQuarantinedError):
+            await spend_budget()
+
+    asyncio.run(run())
+    assert account.is_quarantined()
+    assert "challenge" in account.quarantine_reason
@@ -0,0 +1,39 @@
+import json
+import re
+import sys
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+sys.path.append(str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+from fixture_server import FixtureServer, shortcode_for  # noqa: E402
+from scraper.dom_extract import COUNT_PATTERN  # noqa: E402
+from scraper.network import iter_media  # noqa: E402
+
+
+def fetch(url: str) -> str:
+    with urllib.request.urlopen(url) as res:
+        return res.read().decode("utf-8")
+
+
+def test_fixture_server_serves_grid_reels_and_matching_json():
+    with FixtureServer(reels=3, noise=5) as server:
+        grid = fetch(server.url("/benchuser/reels/"))
+        assert re.findall(r'href="/reel/([^/]+)/"', grid) == [shortcode_for(i) for i in range(3)]
+        assert shortcode_for(0) in fetch(server.url("/explore/tags/bench/"))
+
+        reel = fetch(server.reel_url(1))
+        (media,) = iter_media(json.loads(fetch(server.url(f"/api/v1/media/{shortcode_for(1)}/info/"))))
+        assert media["caption"] in reel
+        assert f'datetime="{media["posted_at"]}"' in reel
+        likes = re.search(r'aria-label="like"><span>([^<]*)<', reel).group(1)
+        assert re.fullmatch(COUNT_PATTERN, likes) and int(likes.replace(",", "")) == media["likes"]
+        assert f"/reel/{shortcode_for(2)}/" in reel
+
+        with pytest.raises(urllib.error.HTTPError):
+            fetch(server.reel_url(3))
+        assert server.requests["reel"] == 2 and server.requests["media_info"] == 1
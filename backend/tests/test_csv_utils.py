@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper.csv_utils import StreamingCsvWriter, iter_partial_csv
+
+
+def test_streaming_writer_keeps_target_and_position_order(tmp_path):
+    output = StreamingCsvWriter("job", ["likes"], tmp_path)
+    # 位置1が先に届いても、位置0が書き込まれるまでは保留される
+    output.write_row(1, 1, {"url": "b1", "likes": "5"})
+    output.write_row(0, 0, {"url": "a0"})
+    assert output.rows == 1
+    output.skip_row(1, 0)
+    assert output.rows == 2
+
+    partial = b"".join(iter_partial_csv(output.parts_dir)).decode("utf-8").splitlines()
+    assert partial == ["url,title,caption,posted_at,likes", "a0,,,,", "b1,,,,5"]
+
+    output.write_row(0, 1, {"url": "a1", "caption": "line1\nline2"})
+    path = output.finalize()
+    assert path == tmp_path / "job.csv"
+    assert not output.parts_dir.exists()
+    assert path.read_text(encoding="utf-8").splitlines()[1:4] == ["a0,,,,", 'a1,,"line1', 'line2",,']
+
+
+def test_streaming_writer_without_rows_leaves_no_file(tmp_path):
+    output = StreamingCsvWriter("empty", [], tmp_path)
+    assert output.finalize() is None
+    assert not (tmp_path / "empty.csv").exists()
+
+
+def test_streaming_writer_keeps_unparsed_counts_as_scraped(tmp_path):
+    output = StreamingCsvWriter("raw", ["likes"], tmp_path)
+    output.write_row(0, 0, {"url": "a0", "likes": "1.2万回", "posted_at": "3日前"})
+    path = output.finalize()
+    assert path.read_text(encoding="utf-8").splitlines()[1] == "a0,,,3日前,1.2万回"
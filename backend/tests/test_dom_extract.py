@@ -0,0 +1,83 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import dom_extract
+from scraper.dom_extract import (
+    CAPTION_SELECTORS,
+    VIEW_SELECTORS,
+    build_selector_plan,
+    extract_fields_batched,
+    extract_fields_per_element,
+)
+from scraper.selector_stats import SelectorRegistry
+
+
+class FakeElement:
+    def __init__(self, text="", **attrs):
+        self.text = text
+        self.attrs = attrs
+
+    async def text_content(self):
+        return self.text
+
+    async def get_attribute(self, name):
+        return self.attrs.get(name)
+
+
+class FakePage:
+    def __init__(self, dom):
+        self.dom = dom
+        self.evaluated = []
+
+    async def query_selector_all(self, selector):
+        return self.dom.get(selector, [])
+
+    async def evaluate(self, script, arg):
+        self.evaluated.append(arg)
+        return {"values": {"caption": "from the page"}, "hits": {"caption": arg["fields"]["caption"]["selectors"][1], "video_view_count": None}}
+
+
+def use_fresh_registry(monkeypatch, tmp_path):
+    registry = SelectorRegistry(path=tmp_path / "selector_stats.json")
+    monkeypatch.setattr(dom_extract, "SELECTOR_REGISTRY", registry)
+    return registry
+
+
+def test_per_element_extraction_follows_selector_priority(monkeypatch, tmp_path):
+    use_fresh_registry(monkeypatch, tmp_path)
+    page = FakePage({
+        'article div[role="button"] span': [FakeElement("too short")],
+        'div[dir="auto"] span': [FakeElement("a caption that is long enough to count")],
+        'span:has-text("views")': [FakeElement("12 likes"), FakeElement("3.4K views")],
+        'button[aria-label*="like"] span': [FakeElement("1,024")],
+        'time': [FakeElement(title="May 1"), FakeElement(datetime="2024-05-01T00:00:00.000Z")],
+    })
+    fields = ["caption", "posted_at", "likes", "video_view_count", "comments"]
+    result = asyncio.run(extract_fields_per_element(page, fields))
+    assert result == {
+        "caption": "a caption that is long enough to count",
+        "likes": "1,024",
+        "video_view_count": "3.4K",
+        "comments": "",
+        "posted_at": "May 1",
+    }
+
+
+def test_batched_extraction_ships_plan_in_one_call(monkeypatch, tmp_path):
+    registry = use_fresh_registry(monkeypatch, tmp_path)
+    page = FakePage({})
+    result = asyncio.run(extract_fields_batched(page, ["caption", "video_view_count"]))
+    assert result == {"caption": "from the page"}
+    assert len(page.evaluated) == 1
+    plan = page.evaluated[0]
+    assert list(plan["fields"]) == ["caption", "video_view_count"]
+    assert plan["fields"]["caption"]["selectors"] == CAPTION_SELECTORS
+    assert plan["fields"]["video_view_count"]["selectors"] == VIEW_SELECTORS
+    assert plan["posted_at"] is False
+    assert build_selector_plan(["posted_at"]) == {"fields": {}, "posted_at": True}
+    # 採用されたセレクターが次回から先頭になる
+    assert registry.groups["caption"][CAPTION_SELECTORS[0]]["misses"] == 1
+    assert build_selector_plan(["caption"])["fields"]["caption"]["selectors"][0] == CAPTION_SELECTORS[1]
+    assert registry.groups["video_view_count"][VIEW_SELECTORS[-1]]["misses"] == 1
@@ -0,0 +1,29 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper.events import ProgressBroker, is_terminal
+
+
+def test_broker_fans_out_and_drops_oldest_for_slow_subscribers():
+    async def run():
+        broker = ProgressBroker(queue_size=2)
+        with broker.subscribe("job") as first, broker.subscribe("job") as second:
+            assert broker.subscriber_count("job") == 2
+            for i in range(3):
+                broker.publish("job", "reel", {"rows": i})
+            broker.publish("other", "reel", {"rows": 99})
+            first_events = [first.get_nowait(), first.get_nowait()]
+            assert first_events == [("reel", {"rows": 1}), ("reel", {"rows": 2})]
+            assert second.qsize() == 2
+        assert broker.subscriber_count("job") == 0
+
+    asyncio.run(run())
+
+
+def test_only_finished_status_events_are_terminal():
+    assert is_terminal("status", {"status": "done"})
+    assert is_terminal("status", {"status": "error"})
+    assert not is_terminal("status", {"status": "running"})
+    assert not is_terminal("scrape_error", {"message": "boom"})
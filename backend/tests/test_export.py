@@ -0,0 +1,93 @@
+import gzip
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from scraper.export import ensure_export, export_file, iter_rows, parse_count, typed_row  # noqa: E402
+
+ROWS = [
+    "url,title,caption,posted_at,likes,video_view_count",
+    "https://www.instagram.com/reel/a/,,first,2024-05-01T10:00:00.000Z,\"1,234\",1.2K",
+    "https://www.instagram.com/reel/b/,,second,,,3M",
+]
+
+
+def write_csv(tmp_path):
+    path = tmp_path / "job.csv"
+    path.write_text("\n".join(ROWS) + "\n", encoding="utf-8")
+    return path
+
+
+def test_parse_count_and_typed_row():
+    assert parse_count("1,234") == 1234
+    assert parse_count("1.2K") == 1200
+    assert parse_count("3M") == 3_000_000
+    assert parse_count("") is None
+    assert parse_count("n/a") is None
+    assert typed_row({"likes": "12", "posted_at": "2024-05-01T10:00:00+00:00", "caption": "7"}) == {
+        "likes": 12,
+        "posted_at": "2024-05-01T10:00:00.000Z",
+        "caption": "7",
+    }
+
+
+def test_unparseable_values_keep_their_scraped_text(tmp_path):
+    row = {"likes": "1.2万回", "video_view_count": "", "posted_at": "3日前"}
+    assert typed_row(row) == {"likes": "1.2万回", "video_view_count": None, "posted_at": "3日前"}
+    assert typed_row(row, keep_unparsed=False) == {"likes": None, "video_view_count": None, "posted_at": None}
+
+    source = tmp_path / "job.csv"
+    source.write_text("url,posted_at,likes\nhttps://www.instagram.com/reel/a/,3日前,1.2万回\n", encoding="utf-8")
+    jsonl = export_file(source, "jsonl")
+    assert json.loads(jsonl.read_text(encoding="utf-8"))["likes"] == "1.2万回"
+    gz = export_file(jsonl, "csv.gz")
+    assert [(row["posted_at"], row["likes"]) for row in iter_rows(gz)] == [("3日前", "1.2万回")]
+
+
+def test_export_jsonl_and_gzip_are_typed(tmp_path):
+    source = write_csv(tmp_path)
+
+    jsonl = export_file(source, "jsonl")
+    assert jsonl.name == "job.jsonl"
+    rows = [json.loads(line) for line in jsonl.read_text(encoding="utf-8").splitlines()]
+    assert rows[0]["likes"] == 1234 and rows[0]["video_view_count"] == 1200
+    assert rows[1]["likes"] is None and rows[1]["posted_at"] is None
+
+    gz = export_file(jsonl, "csv.gz")
+    assert gz.name == "job.csv.gz"
+    with gzip.open(gz, "rt", encoding="utf-8") as f:
+        assert f.readline().strip() == ROWS[0]
+    assert [row["video_view_count"] for row in iter_rows(gz)] == ["1200", "3000000"]
+
+
+def test_export_parquet_schema(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    source = write_csv(tmp_path)
+
+    path = ensure_export(source, "parquet")
+    assert ensure_export(source, "parquet") == path
+
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(path)
+    assert schema.field("likes").type == pa.int64()
+    assert schema.field("posted_at").type == pa.timestamp("ms", tz="UTC")
+    rows = list(iter_rows(path))
+    assert rows[0]["posted_at"] == "2024-05-01T10:00:00.000Z"
+    assert rows[1]["video_view_count"] == 3_000_000
+
+
+def test_concurrent_exports_of_the_same_format_do_not_collide(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    source = write_csv(tmp_path)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: export_file(source, "jsonl"), range(16)))
+    assert {path.name for path in results} == {"job.jsonl"}
+    assert len(results[0].read_text(encoding="utf-8").splitlines()) == 2
+    # 変換途中の一時ファイルは残らない
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["job.csv", "job.jsonl"]
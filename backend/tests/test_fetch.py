@@ -0,0 +1,121 @@
+import asyncio
+import csv
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import fetch
+from scraper.csv_utils import StreamingCsvWriter
+from scraper.events import PROGRESS_EVENTS
+
+
+class FakePage:
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+
+def read_rows(output):
+    with open(output.finalize(), newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_run_scrape_merges_targets_in_input_order(monkeypatch, tmp_path):
+    delays = {"alice": 0.03, "bob": 0.0, "cats": 0.01}
+    active = 0
+    peak = 0
+
+    async def fake_verify(page):
+        pass
+
+    async def fake_scrape_target(page, kind, name, max_items, columns, collector=None, on_row=None, window=None, checkpoint=None):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        for i in range(max_items):
+            await asyncio.sleep(delays[name])
+            on_row({"url": f"{name}-{i}", "title": name})
+        active -= 1
+        return []
+
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    monkeypatch.setattr(fetch, "scrape_target", fake_scrape_target)
+    monkeypatch.setattr(fetch, "MAX_CONCURRENCY", 2)
+
+    progress = {"job": {"progress": 0}}
+    context = FakeContext()
+    output = StreamingCsvWriter("job", [], tmp_path)
+    events = []
+
+    async def run():
+        with PROGRESS_EVENTS.subscribe("job") as queue:
+            written = await fetch.run_scrape(context, "job", ["alice", "bob"], ["cats"], 2, [], progress, output, concurrency=5)
+            while not queue.empty():
+                events.append(queue.get_nowait())
+        return written
+
+    written = asyncio.run(run())
+
+    results = read_rows(output)
+    assert written == 6
+    assert [row["url"] for row in results] == ["alice-0", "alice-1", "bob-0", "bob-1", "cats-0", "cats-1"]
+    assert progress["job"]["progress"] == 100
+    # 進捗はターゲット完了時だけでなくリールごとに通知される
+    assert [event for event, _ in events].count("reel") == 6
+    assert [data["target"] for event, data in events if event == "target_done"] == ["bob", "#cats", "alice"]
+    reel_progress = [data["progress"] for event, data in events if event == "reel"]
+    assert reel_progress == sorted(reel_progress) and reel_progress[0] < 50
+    # ジョブの要求値(5)ではなくサーバー上限(2)でページ数が制限される
+    assert len(context.pages) == 2
+    assert peak == 2
+
+
+def test_run_scrape_grid_mode_fetches_harvested_urls_in_parallel(monkeypatch, tmp_path):
+    grids = {"alice": ["r/a1", "r/a2", "r/a3"], "cats": ["r/c1"], "empty": []}
+    fetched_by = {}
+
+    async def fake_verify(page):
+        pass
+
+    async def fake_discover(page, kind, name, max_items):
+        return grids[name][:max_items]
+
+    async def fake_scrape_reel_url(page, url, source, columns, collector=None):
+        fetched_by[url] = id(page)
+        # 先に取得したリールほど遅く終わるようにして、結合順が完了順でないことを確認する
+        await asyncio.sleep(0.01 * (4 - int(url[-1])))
+        return {"url": url, "title": source}
+
+    async def no_delay():
+        pass
+
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    monkeypatch.setattr(fetch, "discover_target", fake_discover)
+    monkeypatch.setattr(fetch, "scrape_reel_url", fake_scrape_reel_url)
+    monkeypatch.setattr(fetch, "politeness_delay", no_delay)
+    monkeypatch.setattr(fetch, "MAX_CONCURRENCY", 3)
+
+    progress = {"job": {"progress": 0}}
+    context = FakeContext()
+    output = StreamingCsvWriter("job", [], tmp_path)
+    asyncio.run(fetch.run_scrape(context, "job", ["alice", "empty"], ["cats"], 3, [], progress, output, concurrency=3, mode="grid"))
+
+    results = read_rows(output)
+
+    assert [row["url"] for row in results] == ["r/a1", "r/a2", "r/a3", "r/c1"]
+    assert [row["title"] for row in results] == ["alice", "alice", "alice", "#cats"]
+    assert progress["job"]["progress"] == 100
+    # 1つのターゲットのリールも複数ページで分担される
+    assert len({fetched_by[url] for url in grids["alice"]}) > 1
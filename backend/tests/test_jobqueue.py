@@ -0,0 +1,70 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper.jobqueue import JobQueue, QueueFullError
+
+
+def test_claims_by_priority_then_fifo(tmp_path):
+    queue = JobQueue(path=tmp_path / "jobs.sqlite3", max_queued=10)
+    assert queue.enqueue("a", {"usernames": ["a"]}) == 1
+    assert queue.enqueue("b", {"usernames": ["b"]}) == 2
+    assert queue.enqueue("urgent", {"usernames": ["u"]}, priority=5) == 1
+    assert queue.position("a") == 2
+
+    assert [queue.claim()[0] for _ in range(3)] == ["urgent", "a", "b"]
+    assert queue.claim() is None
+
+
+def test_rejects_when_full(tmp_path):
+    queue = JobQueue(path=tmp_path / "jobs.sqlite3", max_queued=2)
+    queue.enqueue("a", {})
+    queue.enqueue("b", {})
+    with pytest.raises(QueueFullError):
+        queue.enqueue("c", {})
+    # 実行中になったジョブは上限に数えない
+    queue.claim()
+    queue.enqueue("c", {})
+
+
+def test_state_survives_restart(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    queue = JobQueue(path=path)
+    queue.enqueue("finished", {"max_items": 1})
+    queue.enqueue("interrupted", {"max_items": 2})
+    job_id, params = queue.claim()
+    queue.save_state(job_id, {"progress": 100, "status": "done", "path": "output/finished.csv"})
+    queue.claim()
+    queue.save_state("interrupted", {"progress": 50, "status": "running"})
+    queue.close()
+
+    restarted = JobQueue(path=path)
+    assert restarted.get_state("finished")["path"] == "output/finished.csv"
+    assert restarted.recover() == 1
+    assert restarted.get_state("interrupted") == {"progress": 0, "status": "queued", "position": 1}
+    assert restarted.claim() == ("interrupted", {"max_items": 2})
+    assert restarted.get_state("missing") is None
+
+
+def test_expired_leases_are_reassigned(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    api, node_a, node_b = JobQueue(path=path), JobQueue(path=path), JobQueue(path=path)
+    api.enqueue("job", {"max_items": 1})
+
+    assert node_a.claim("a/0", lease_sec=30) == ("job", {"max_items": 1})
+    assert node_a.heartbeat("job", "a/0", {"progress": 40, "status": "running"})
+    assert api.get_state("job")["progress"] == 40
+    assert api.leases()["a/0"]["running"] == 1
+    # リース中のジョブは再起動時の回収対象にならない
+    assert node_b.recover() == 0
+
+    assert node_b.reap_expired(now=time.time() + 31) == 1
+    assert node_b.claim("b/0") == ("job", {"max_items": 1})
+    # 古いワーカーの進捗と結果は書き込まれない
+    assert not node_a.heartbeat("job", "a/0", {"progress": 90, "status": "running"})
+    assert not node_a.save_state("job", {"progress": 100, "status": "done"}, worker="a/0")
+    assert node_b.save_state("job", {"progress": 100, "status": "done", "path": "out.csv"}, worker="b/0")
+    assert api.get_state("job")["path"] == "out.csv"
@@ -0,0 +1,43 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import lean
+from scraper.lean import BLOCKED_ERROR_TEXT, TrafficMeter, should_block
+
+
+def test_should_block_media_fonts_and_trackers(monkeypatch):
+    assert should_block("image", "https://scontent.cdninstagram.com/v/t51.jpg")
+    assert should_block("media", "https://scontent.cdninstagram.com/v/t50.mp4")
+    assert should_block("font", "https://static.cdninstagram.com/font.woff2")
+    assert should_block("xhr", "https://www.instagram.com/ajax/bz?__a=1")
+    assert not should_block("xhr", "https://www.instagram.com/graphql/query/")
+    assert not should_block("document", "https://www.instagram.com/reel/C1abcDEF/")
+
+    monkeypatch.setattr(lean, "ALLOW_URL_PATTERNS", ["static.cdninstagram.com"])
+    assert not should_block("font", "https://static.cdninstagram.com/font.woff2")
+
+
+class FakeRequest:
+    def __init__(self, sizes=None, failure=None):
+        self._sizes = sizes
+        self.failure = failure
+
+    async def sizes(self):
+        return self._sizes
+
+
+def test_traffic_meter_reports_bytes_per_reel():
+    meter = TrafficMeter()
+    sizes = {"requestHeadersSize": 100, "requestBodySize": 0, "responseHeadersSize": 400, "responseBodySize": 1500}
+    asyncio.run(meter._on_finished(FakeRequest(sizes)))
+    asyncio.run(meter._on_finished(FakeRequest(sizes)))
+    meter._on_failed(FakeRequest(failure=BLOCKED_ERROR_TEXT))
+    meter._on_failed(FakeRequest(failure="net::ERR_TIMED_OUT"))
+
+    summary = meter.summary(reels=2)
+    assert summary["bytes"] == 4000
+    assert summary["bytes_per_reel"] == 2000
+    assert summary["blocked_requests"] == 1
+    assert meter.summary(reels=0)["bytes_per_reel"] is None
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import fetch
+from scraper.csv_utils import StreamingCsvWriter
+from scraper.metrics import count_retry, render_metrics, span, start_job_timings, summarize_job_timings
+
+
+def test_spans_build_job_breakdown_and_prometheus_histograms():
+    async def job():
+        timings = start_job_timings()
+        with span("navigation"):
+            await asyncio.sleep(0.01)
+        with span("next_navigation") as navigation:
+            navigation.fail()
+        with pytest.raises(RuntimeError):
+            with span("next_navigation"):
+                raise RuntimeError("boom")
+        count_retry("navigation", "goto_load")
+        return summarize_job_timings(timings)
+
+    summary = asyncio.run(job())
+
+    assert summary["stages"]["navigation"]["count"] == 1
+    assert summary["stages"]["navigation"]["total_sec"] >= 0.01
+    assert summary["stages"]["next_navigation"] == {**summary["stages"]["next_navigation"], "count": 2, "errors": 2}
+    assert summary["retries"] == {"navigation:goto_load": 1}
+    body, content_type = render_metrics()
+    assert content_type.startswith("text/plain")
+    assert b'scraper_stage_seconds_bucket{le="0.025",outcome="ok",stage="navigation"}' in body
+    assert b'scraper_retries_total{reason="goto_load",stage="navigation"}' in body
+
+
+def test_run_scrape_times_login_check_and_csv_writes(monkeypatch, tmp_path):
+    class FakePage:
+        def on(self, event, handler):
+            pass
+
+        async def close(self):
+            pass
+
+    class FakeContext:
+        async def new_page(self):
+            return FakePage()
+
+    async def fake_verify(page):
+        pass
+
+    async def fake_scrape_target(page, kind, name, max_items, columns, collector=None, on_row=None, window=None, checkpoint=None):
+        for i in range(max_items):
+            on_row({"url": f"{name}-{i}", "title": name})
+        return []
+
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    monkeypatch.setattr(fetch, "scrape_target", fake_scrape_target)
+
+    async def job():
+        timings = start_job_timings()
+        output = StreamingCsvWriter("job", [], tmp_path)
+        await fetch.run_scrape(FakeContext(), "job", ["alice"], [], 3, [], {"job": {}}, output)
+        output.finalize()
+        return summarize_job_timings(timings)
+
+    stages = asyncio.run(job())["stages"]
+    assert stages["login_check"]["count"] == 1
+    assert stages["csv_write"]["count"] == 3
+
+
+SUPERVISOR_METRICS_SCRIPT = """
+import multiprocessing
+
+from scraper import metrics
+
+
+def child():
+    from scraper.metrics import REELS
+
+    REELS.inc(3)
+
+
+if __name__ == "__main__":
+    process = multiprocessing.get_context("spawn").Process(target=child)
+    process.start()
+    process.join()
+    metrics.mark_process_dead(process.pid)
+    print(metrics.render_metrics()[0].decode())
+"""
+
+
+def test_supervisor_metrics_include_worker_processes(tmp_path):
+    script = tmp_path / "supervise.py"
+    script.write_text(SUPERVISOR_METRICS_SCRIPT, encoding="utf-8")
+    backend = Path(__file__).resolve().parents[1]
+    env = dict(os.environ, PYTHONPATH=str(backend), SCRAPER_ROLE="supervisor", METRICS_MULTIPROC_DIR=str(tmp_path / "metrics"))
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    out = subprocess.run([sys.executable, str(script)], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    # 子プロセスで数えたリールがAPIプロセスの /metrics に現れる
+    assert "scraper_reels_total 3.0" in out.stdout
@@ -0,0 +1,55 @@
+import http.client
+import sys
+from pathlib import Path
+from urllib.parse import urlencode
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+sys.path.append(str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+from mock_instagram import MockInstagram  # noqa: E402
+
+
+def request(server, path, method="GET", body=None, cookie=None):
+    host, port = server.base_url.rsplit("/", 1)[1].split(":")
+    conn = http.client.HTTPConnection(host, int(port))
+    headers = {"Content-Type": "application/x-www-form-urlencoded"} if body else {}
+    if cookie:
+        headers["Cookie"] = cookie
+    conn.request(method, path, body=body, headers=headers)
+    res = conn.getresponse()
+    result = (res.status, dict(res.getheaders()), res.read().decode("utf-8"))
+    conn.close()
+    return result
+
+
+def test_login_flow_sets_session_and_unlocks_pages():
+    with MockInstagram(reels=3) as server:
+        status, headers, _ = request(server, "/benchuser/reels/")
+        assert status == 302 and headers["Location"].startswith("/accounts/login/")
+        assert request(server, "/api/v1/media/BENCH00000/info/")[0] == 401
+
+        status, _, page = request(server, "/accounts/login/")
+        assert status == 200 and 'form id="loginForm"' in page and 'name="username"' in page
+
+        status, headers, _ = request(server, "/accounts/login/ajax/", "POST", urlencode({"username": "bench", "password": "pw"}))
+        assert status == 302 and headers["Location"] == "/"
+        cookie = headers["Set-Cookie"].split(";", 1)[0]
+
+        status, _, home = request(server, "/", cookie=cookie)
+        assert status == 200 and 'nav role="navigation"' in home and "Not Now" in home
+        assert request(server, "/benchuser/reels/", cookie=cookie)[0] == 200
+
+
+def test_injected_rate_limit_challenge_and_errors():
+    with MockInstagram(reels=5, rate_limit_per_min=3, challenge_after=1) as server:
+        cookie = "sessionid=" + server.storage_state()["cookies"][0]["value"]
+        assert request(server, "/reel/BENCH00000/", cookie=cookie)[0] == 200
+        status, headers, _ = request(server, "/reel/BENCH00001/", cookie=cookie)
+        assert status == 302 and headers["Location"].startswith("/challenge/")
+        assert request(server, "/benchuser/reels/", cookie=cookie)[0] == 200
+        status, headers, _ = request(server, "/benchuser/reels/", cookie=cookie)
+        assert status == 429 and headers["Retry-After"] == "60"
+
+    with MockInstagram(reels=1, error_rate=1.0, require_login=False) as server:
+        assert request(server, "/benchuser/reels/")[0] == 500
+        assert server.stats()["errors"] == 1
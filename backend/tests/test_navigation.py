@@ -0,0 +1,110 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import fetch, navigation
+from scraper.navigation import CircuitBreaker, LatencyTracker, NavigationPolicy, TerminalPageError
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class FakePage:
+    """Answers every goto with ``status`` and reports ``terminal`` from the marker check."""
+
+    def __init__(self, status=200, terminal=None, fail=None):
+        self.status = status
+        self.terminal = terminal
+        self.fail = fail
+        self.url = "about:blank"
+        self.gotos = []
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        self.gotos.append((url, wait_until, timeout))
+        if self.fail:
+            raise self.fail
+        self.url = url
+        return FakeResponse(self.status)
+
+    async def evaluate(self, script, arg=None):
+        return self.terminal
+
+
+def test_timeout_follows_latency_percentile(monkeypatch):
+    monkeypatch.setattr(navigation, "NAV_MIN_SAMPLES", 5)
+    tracker = LatencyTracker(window=50)
+    assert tracker.timeout_sec() == navigation.NAV_TIMEOUT_DEFAULT_SEC
+    for _ in range(20):
+        tracker.observe(2.0)
+    assert tracker.timeout_sec() == pytest.approx(2.0 * navigation.NAV_TIMEOUT_MULTIPLIER)
+    for _ in range(50):
+        tracker.observe(0.1)
+    assert tracker.timeout_sec() == navigation.NAV_TIMEOUT_MIN_SEC
+
+
+def test_terminal_pages_fail_without_retries(monkeypatch):
+    policy = NavigationPolicy(breaker=CircuitBreaker(min_samples=1))
+    monkeypatch.setattr(fetch, "NAVIGATION", policy)
+
+    private = FakePage(terminal="private")
+    with pytest.raises(TerminalPageError) as excinfo:
+        asyncio.run(fetch.navigate_to_user_reels(private, "someone"))
+    assert excinfo.value.reason == "private"
+    assert len(private.gotos) == 1
+
+    with pytest.raises(TerminalPageError):
+        asyncio.run(fetch.navigate_to_hashtag_reels(FakePage(status=404), "gone"))
+    # サイト自体は応答しているのでブレーカーは開かない
+    assert policy.breaker.state == "closed"
+
+
+def test_breaker_opens_on_error_spike_and_closes_after_trial():
+    async def scenario():
+        breaker = CircuitBreaker(window=4, min_samples=4, error_rate=0.5, cooldown_sec=0.05)
+        policy = NavigationPolicy(breaker=breaker)
+        broken = FakePage(fail=RuntimeError("net::ERR_CONNECTION_RESET"))
+        for _ in range(4):
+            with pytest.raises(RuntimeError):
+                await policy.goto(broken, "https://example.test/a/")
+        assert breaker.state == "open" and breaker.trips == 1
+
+        healthy = FakePage()
+        started = asyncio.get_running_loop().time()
+        await policy.goto(healthy, "https://example.test/b/")
+        assert asyncio.get_running_loop().time() - started >= 0.04
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_breaker_trial_belongs_to_its_ticket_and_survives_cancellation():
+    class SlowPage(FakePage):
+        async def goto(self, url, wait_until=None, timeout=None):
+            await asyncio.sleep(3600)
+
+    async def scenario():
+        breaker = CircuitBreaker(window=2, min_samples=2, error_rate=0.5, cooldown_sec=0.05)
+        policy = NavigationPolicy(breaker=breaker)
+        # 開く前に始まったナビゲーションが後から成功しても、ブレーカーは閉じない
+        early = await breaker.wait_until_closed()
+        breaker.record(False, await breaker.wait_until_closed())
+        breaker.record(False, await breaker.wait_until_closed())
+        breaker.record(True, early)
+        breaker.record(True)
+        assert breaker.state == "open"
+
+        # 試行中のナビゲーションがキャンセルされても、次の呼び出しが試行を引き継ぐ
+        await asyncio.sleep(0.06)
+        trial = asyncio.create_task(policy.goto(SlowPage(), "https://example.test/slow/"))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        await asyncio.wait_for(policy.goto(FakePage(), "https://example.test/b/"), timeout=1)
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
@@ -0,0 +1,80 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper.network import ReelResponseCollector, iter_media, shortcode_from_url
+
+V1_PAYLOAD = {
+    "items": [
+        {
+            "code": "C1abcDEF",
+            "taken_at": 1700000000,
+            "like_count": 12345,
+            "comment_count": 67,
+            "play_count": 890123,
+            "caption": {"text": "  sunset over the bay  "},
+            "user": {"username": "someone"},
+        }
+    ]
+}
+
+GRAPHQL_PAYLOAD = {
+    "data": {
+        "xdt_shortcode_media": {
+            "shortcode": "C2ghiJKL",
+            "taken_at_timestamp": 1700003600,
+            "edge_media_preview_like": {"count": 42},
+            "edge_media_to_comment": {"count": 3},
+            "video_view_count": 1000,
+            "edge_media_to_caption": {"edges": []},
+        }
+    }
+}
+
+
+def test_shortcode_from_url():
+    assert shortcode_from_url("https://www.instagram.com/reel/C1abcDEF/?igsh=x") == "C1abcDEF"
+    assert shortcode_from_url("https://www.instagram.com/someone/reels/") is None
+
+
+def test_iter_media_parses_v1_and_graphql_payloads():
+    v1 = list(iter_media(V1_PAYLOAD))
+    assert v1 == [{
+        "shortcode": "C1abcDEF",
+        "caption": "sunset over the bay",
+        "likes": 12345,
+        "comments": 67,
+        "video_view_count": 890123,
+        "posted_at": "2023-11-14T22:13:20.000Z",
+    }]
+
+    graphql = list(iter_media(GRAPHQL_PAYLOAD))
+    assert graphql[0]["shortcode"] == "C2ghiJKL"
+    assert graphql[0]["likes"] == 42
+    assert graphql[0]["comments"] == 3
+    assert graphql[0]["video_view_count"] == 1000
+    assert graphql[0]["caption"] == ""
+
+
+def test_collector_merges_partial_payloads():
+    collector = ReelResponseCollector()
+    collector.add_payload({"items": [{"code": "C1abcDEF", "like_count": 1}]})
+    collector.add_payload({"items": [{"code": "C1abcDEF", "comment_count": 2}]})
+    assert collector.get("C1abcDEF")["likes"] == 1
+    assert collector.get("C1abcDEF")["comments"] == 2
+
+
+def test_collector_wait_for_resolves_when_payload_arrives():
+    async def run():
+        collector = ReelResponseCollector()
+        waiter = asyncio.create_task(collector.wait_for("C1abcDEF", timeout=1))
+        await asyncio.sleep(0)
+        collector.add_payload(V1_PAYLOAD)
+        media = await waiter
+        missing = await collector.wait_for("missing", timeout=0.01)
+        return media, missing
+
+    media, missing = asyncio.run(run())
+    assert media["likes"] == 12345
+    assert missing is None
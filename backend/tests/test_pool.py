@@ -0,0 +1,128 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import pool as pool_module
+from scraper.pool import BrowserPool
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+    async def close(self):
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+
+class FakeBrowser:
+    launched = 0
+
+    def __init__(self):
+        FakeBrowser.launched += 1
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    async def stop(self):
+        pass
+
+
+class FakeStarter:
+    async def start(self):
+        return FakePlaywright()
+
+
+async def fake_load_context(playwright, account=None):
+    return FakeBrowser(), FakeContext()
+
+
+def make_pool(monkeypatch, **kwargs):
+    FakeBrowser.launched = 0
+    monkeypatch.setattr(pool_module, "load_context", fake_load_context)
+    monkeypatch.setattr(pool_module, "async_playwright", lambda: FakeStarter())
+    return BrowserPool(health_check_sec=0, **kwargs)
+
+
+def test_pool_reuses_warm_context(monkeypatch):
+    async def run():
+        pool = make_pool(monkeypatch, size=1, max_uses=10)
+        await pool.start()
+        async with pool.lease() as first:
+            await first.new_page()
+        async with pool.lease() as second:
+            assert second is first
+            # 前のジョブのページは返却時に閉じられている
+            assert second.pages == []
+        await pool.stop()
+
+    asyncio.run(run())
+    assert FakeBrowser.launched == 1
+
+
+def test_pool_recycles_after_max_uses(monkeypatch):
+    async def run():
+        pool = make_pool(monkeypatch, size=1, max_uses=2)
+        await pool.start()
+        contexts = []
+        for _ in range(3):
+            async with pool.lease() as context:
+                contexts.append(context)
+        assert contexts[0] is contexts[1]
+        assert contexts[2] is not contexts[0]
+        assert pool.stats()["recycled"] == 1
+        await pool.stop()
+
+    asyncio.run(run())
+
+
+def test_pool_replaces_disconnected_browser(monkeypatch):
+    async def run():
+        pool = make_pool(monkeypatch, size=1, max_uses=10)
+        await pool.start()
+        pool._idle[0].browser.connected = False
+        async with pool.lease() as context:
+            assert context is not None
+        assert pool.stats()["total"] == 1
+        await pool.stop()
+
+    asyncio.run(run())
+    assert FakeBrowser.launched == 2
+
+
+def test_pool_bounds_concurrent_leases(monkeypatch):
+    async def run():
+        pool = make_pool(monkeypatch, size=2, max_uses=10)
+        await pool.start()
+        active = 0
+        peak = 0
+
+        async def job():
+            nonlocal active, peak
+            async with pool.lease():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(job() for _ in range(6)))
+        await pool.stop()
+        return peak
+
+    assert asyncio.run(run()) == 2
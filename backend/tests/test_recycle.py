@@ -0,0 +1,236 @@
+import asyncio
+import csv
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import fetch, recycle
+from scraper.csv_utils import StreamingCsvWriter
+from scraper.recycle import MB, PageRecycler
+
+
+class FakeCDPSession:
+    def __init__(self, page):
+        self.page = page
+
+    async def send(self, method):
+        if method == "Performance.getMetrics":
+            return {"metrics": [{"name": "JSHeapUsedSize", "value": self.page.heap}]}
+        return {}
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.heap = 10 * MB
+        self.closed = False
+        self.url = "about:blank"
+
+    def on(self, event, handler):
+        pass
+
+    async def wait_for_selector(self, selector, timeout=None):
+        if "/reel/" not in self.url:
+            raise TimeoutError(f"{selector} not found")
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, browser=None):
+        self.browser = browser
+        self.pages = []
+        self.closed = False
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def new_cdp_session(self, page):
+        return FakeCDPSession(page)
+
+    async def storage_state(self):
+        return {"cookies": [{"name": "sessionid"}]}
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    async def new_context(self, **kwargs):
+        context = FakeContext(self)
+        context.options = kwargs
+        self.contexts.append(context)
+        return context
+
+
+def test_heap_threshold_replaces_page_and_records_before_after():
+    context = FakeContext()
+    opened = []
+    recycler = PageRecycler(context, opened.append, max_reels=0, max_heap_mb=100, sample_reels=2, scope="page")
+
+    async def run():
+        (slot,) = await recycler.open(1)
+        first = slot.page
+        for heap_mb in (40, 80, 160):
+            first.heap = heap_mb * MB
+            recycler.count_reel(slot)
+            recycler.count_reel(slot)
+            replaced = await recycler.checkpoint(slot)
+        assert replaced and first.closed and slot.page is not first
+        # 開き直したページが最初に測られたときに、切り替え後の値として残る
+        assert not await recycler.checkpoint(slot, boundary=True)
+        await recycler.close()
+        return slot
+
+    slot = asyncio.run(run())
+    assert len(opened) == 2 and slot.page.closed
+    summary = recycler.summary()
+    assert summary["reasons"] == {"heap": 1}
+    assert summary["recycled"] == [{"reels": 6, "slot": 0, "reason": "heap", "heap_mb_before": 160.0, "heap_mb_after": 10.0}]
+    assert [sample["heap_mb"] for sample in summary["samples"]] == [40.0, 80.0, 160.0, 10.0]
+    assert summary["peak_heap_mb"] == 160.0
+
+
+def test_context_scope_carries_cookies_to_a_new_context(monkeypatch):
+    monkeypatch.setattr(recycle, "open_context", lambda browser, state: browser.new_context(storage_state=state))
+    browser = FakeBrowser()
+    shared = FakeContext(browser)
+    recycler = PageRecycler(shared, max_reels=1, max_heap_mb=0, scope="context")
+
+    async def run():
+        (slot,) = await recycler.open(1)
+        for _ in range(2):
+            recycler.count_reel(slot)
+            assert await recycler.checkpoint(slot)
+        await recycler.close()
+        return slot
+
+    slot = asyncio.run(run())
+    first, second = browser.contexts
+    assert first.options["storage_state"] == {"cookies": [{"name": "sessionid"}]}
+    # 共有コンテキスト（プールのもの）は閉じず、ジョブが作ったコンテキストだけを閉じる
+    assert not shared.closed and first.closed and second.closed
+    assert slot.context is second
+    assert recycler.summary()["reasons"] == {"reels": 2}
+
+
+def test_grid_mode_keeps_reel_order_across_recycled_pages(monkeypatch, tmp_path):
+    grids = {"alice": [f"r/a{i}" for i in range(5)], "cats": ["r/c0", "r/c1"]}
+    fetched_by = {}
+
+    async def fake_verify(page):
+        pass
+
+    async def fake_discover(page, kind, name, max_items):
+        return grids[name][:max_items]
+
+    async def fake_scrape_reel_url(page, url, source, columns, collector=None):
+        assert not page.closed
+        fetched_by[url] = page
+        return {"url": url, "title": source}
+
+    async def no_delay():
+        pass
+
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    monkeypatch.setattr(fetch, "discover_target", fake_discover)
+    monkeypatch.setattr(fetch, "scrape_reel_url", fake_scrape_reel_url)
+    monkeypatch.setattr(fetch, "politeness_delay", no_delay)
+    monkeypatch.setattr(recycle, "PAGE_RECYCLE_REELS", 2)
+    monkeypatch.setattr(recycle, "PAGE_RECYCLE_HEAP_MB", 0)
+
+    progress = {"job": {"progress": 0}}
+    context = FakeContext()
+    output = StreamingCsvWriter("job", [], tmp_path)
+    asyncio.run(fetch.run_scrape(context, "job", ["alice"], ["cats"], 5, [], progress, output, mode="grid"))
+
+    with open(output.finalize(), newline="", encoding="utf-8") as f:
+        assert [row["url"] for row in csv.DictReader(f)] == grids["alice"] + grids["cats"]
+    # 1ページあたり2リールで開き直し、終了時にはすべてのページが閉じられている
+    assert len({id(page) for page in fetched_by.values()}) == 4
+    assert all(page.closed for page in context.pages)
+    assert progress["job"]["memory"]["recycles"] == 3
+    assert progress["job"]["progress"] == 100
+
+
+class FakeNavigation:
+    def __init__(self):
+        self.urls = []
+
+    async def goto(self, page, url):
+        self.urls.append(url)
+        page.url = url
+
+
+def test_sequential_walk_resumes_from_the_current_reel_on_a_new_page(monkeypatch, tmp_path):
+    walked = []
+
+    async def fake_verify(page):
+        pass
+
+    async def fake_walk(page, kind, name, max_items, columns, collector=None, on_row=None, window=None, checkpoint=None):
+        page.url = "https://www.instagram.com/reel/r0/"
+        for i in range(max_items):
+            assert not page.closed
+            walked.append((page.url, page))
+            on_row({"url": page.url, "title": name})
+            if i < max_items - 1:
+                page = await checkpoint(page)
+                page.url = f"https://www.instagram.com/reel/r{i + 1}/"
+        return []
+
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    monkeypatch.setattr(fetch, "scrape_target", fake_walk)
+    navigation = FakeNavigation()
+    monkeypatch.setattr(fetch, "NAVIGATION", navigation)
+    monkeypatch.setattr(recycle, "PAGE_RECYCLE_REELS", 2)
+    monkeypatch.setattr(recycle, "PAGE_RECYCLE_HEAP_MB", 0)
+
+    progress = {"job": {"progress": 0}}
+    context = FakeContext()
+    output = StreamingCsvWriter("job", [], tmp_path)
+    asyncio.run(fetch.run_scrape(context, "job", ["alice"], [], 5, [], progress, output))
+
+    # 1つのターゲットの巡回中でも2リールごとに開き直し、直前のリールから続けている
+    assert [url.rsplit("/", 2)[1] for url, _ in walked] == ["r0", "r1", "r2", "r3", "r4"]
+    assert len({id(page) for _, page in walked}) == 3
+    assert navigation.urls == ["https://www.instagram.com/reel/r1/", "https://www.instagram.com/reel/r3/"]
+    assert all(page.closed for page in context.pages)
+    assert progress["job"]["memory"]["recycles"] == 2
+    with open(output.finalize(), newline="", encoding="utf-8") as f:
+        assert len(list(csv.DictReader(f))) == 5
+
+
+def test_failed_resume_keeps_the_walk_on_the_old_page():
+    context = FakeContext()
+    recycler = PageRecycler(context, max_reels=1, max_heap_mb=0)
+
+    async def resume(page):
+        # 新しいページでは続きの「次へ」が見つからない
+        await page.wait_for_selector("button[aria-label=Next]")
+
+    async def run():
+        (slot,) = await recycler.open(1)
+        first = slot.page
+        for _ in range(5):
+            recycler.count_reel(slot)
+            assert not await recycler.checkpoint(slot, resume=resume)
+        return slot, first
+
+    slot, first = asyncio.run(run())
+    assert slot.page is first and not first.closed
+    # 再開に失敗したら、そのターゲットの残りのリールでは開き直しを試さない
+    assert len(context.pages) == 2 and context.pages[1].closed
+    assert recycler.summary()["recycles"] == 0
+
+    async def next_target():
+        assert await recycler.checkpoint(slot, boundary=True)
+
+    asyncio.run(next_target())
+    assert len(context.pages) == 3 and slot.page is context.pages[2]
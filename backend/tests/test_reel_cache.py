@@ -0,0 +1,64 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import fetch
+from scraper.reel_cache import ReelCache, start_job_cache_stats, summarize_cache_stats
+
+
+class FakeReelPage:
+    url = "https://www.instagram.com/reel/C1abcDEF/"
+
+    def __init__(self):
+        self.gotos = 0
+
+    async def goto(self, url, **kwargs):
+        self.gotos += 1
+
+
+def test_lookup_honours_per_column_ttl(tmp_path, monkeypatch):
+    cache = ReelCache(tmp_path / "cache.sqlite3", ttl_sec={"caption": 100, "likes": 10})
+    now = 1000.0
+    monkeypatch.setattr("scraper.reel_cache.time.time", lambda: now)
+    cache.store("C1", {"caption": "hello", "likes": 5})
+
+    now = 1050.0
+    stats = start_job_cache_stats()
+    # キャプションは有効期限内、いいね数は期限切れ
+    assert cache.lookup("C1", ["caption", "likes"]) == {"caption": "hello"}
+    assert summarize_cache_stats(stats) == {"field_hits": 1, "field_misses": 1, "reels_from_cache": 0, "hit_rate": 0.5}
+    cache.close()
+
+
+def test_scrape_reel_details_fetches_only_stale_columns(tmp_path, monkeypatch):
+    cache = ReelCache(tmp_path / "cache.sqlite3", ttl_sec={"caption": 100, "posted_at": 100, "likes": 100})
+    cache.store("C1abcDEF", {"caption": "cached caption", "posted_at": "2024-01-01T00:00:00.000Z"})
+    requested = []
+
+    async def fake_extract(page, fields):
+        requested.append(fields)
+        return {"likes": "12"}
+
+    async def fake_wait(*args, **kwargs):
+        return True
+
+    monkeypatch.setattr(fetch, "REEL_CACHE", cache)
+    monkeypatch.setattr(fetch, "extract_dom_fields", fake_extract)
+    monkeypatch.setattr(fetch, "wait_for_any_selector", fake_wait)
+
+    async def run():
+        stats = start_job_cache_stats()
+        page = FakeReelPage()
+        row = await fetch.scrape_reel_details(page, "someone", ["likes"])
+        # 2回目は全項目がキャッシュにあるため、リールを開かずに返る
+        again = await fetch.scrape_reel_url(page, page.url, "someone", ["likes"])
+        return row, again, page.gotos, stats
+
+    row, again, gotos, stats = asyncio.run(run())
+    assert requested == [["likes"]]
+    assert row["caption"] == "cached caption" and row["likes"] == "12"
+    assert again == row
+    assert gotos == 0
+    assert stats == {"field_hits": 5, "field_misses": 1, "reels_from_cache": 1}
+    cache.close()
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import retention
+from scraper.jobqueue import JobQueue
+from scraper.retention import sweep_output
+
+
+def write(path, size, age_sec=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    stamp = time.time() - age_sec
+    os.utime(path, (stamp, stamp))
+
+
+def test_sweep_output_evicts_orphans_old_and_least_recently_used(tmp_path):
+    now = time.time()
+    write(tmp_path / "running.parts" / "0000.csv", 500)
+    write(tmp_path / "old.csv", 100, age_sec=10 * 86400)
+    write(tmp_path / "lru.csv", 300, age_sec=3600)
+    write(tmp_path / "lru.parquet", 100, age_sec=3600)
+    write(tmp_path / "recent.csv", 300, age_sec=60)
+    write(tmp_path / "gone.csv", 50, age_sec=7200)
+    write(tmp_path / "pruned.csv", 50)
+    # ジョブ一覧を読んだ後に始まったジョブの途中結果
+    write(tmp_path / "started.parts" / "0000.csv", 50)
+    write(tmp_path / ".gitkeep", 0)
+    jobs = {
+        "running": {"status": "running", "last_used": now},
+        "old": {"status": "done", "last_used": now - 10 * 86400},
+        "lru": {"status": "done", "last_used": now - 3600},
+        "recent": {"status": "done", "last_used": now - 60},
+        "pruned": {"status": "expired", "last_used": now},
+    }
+
+    evicted = sweep_output(jobs, tmp_path, max_bytes=1000, max_age_sec=86400, now=now, orphan_min_age_sec=3600)
+
+    assert sorted((job_id, reason) for job_id, reason, _ in evicted) == [("gone", "orphaned"), ("lru", "quota"), ("old", "age"), ("pruned", "retention")]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [".gitkeep", "recent.csv", "running.parts", "started.parts"]
+
+
+def test_retention_pass_expires_downloads_and_cleans_screenshots(monkeypatch, tmp_path):
+    out_dir = tmp_path / "output"
+    queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+    queue.enqueue("job", {})
+    queue.claim()
+    queue.save_state("job", {"progress": 100, "status": "done", "path": str(out_dir / "job.csv")})
+    write(out_dir / "job.csv", 2000)
+    for i in range(4):
+        write(tmp_path / f"debug_click_failed_{i}.png", 10, age_sec=i * 60)
+    write(tmp_path / "debug_login_error.png", 10, age_sec=3 * 86400)
+
+    monkeypatch.setattr(retention, "OUTPUT_DIR", out_dir)
+    monkeypatch.setattr(retention, "OUTPUT_MAX_BYTES", 1000)
+    monkeypatch.setattr(retention, "DEBUG_SCREENSHOT_DIR", tmp_path)
+    monkeypatch.setattr(retention, "DEBUG_SCREENSHOT_MAX_FILES", 2)
+    summary = asyncio.run(retention.run_retention(queue))
+
+    assert summary["outputs_evicted"] == 1 and summary["screenshots_removed"] == 3
+    state = queue.get_state("job")
+    assert state["expired"] and state["expired_reason"] == "quota" and "path" not in state
+    assert sorted(path.name for path in tmp_path.glob("debug_*.png")) == ["debug_click_failed_0.png", "debug_click_failed_1.png"]
+
+
+def test_prune_finished_keeps_newest_jobs(tmp_path):
+    queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+    for job_id in ("a", "b", "c", "waiting"):
+        queue.enqueue(job_id, {})
+    for job_id in ("a", "b", "c"):
+        queue.claim()
+        queue.save_state(job_id, {"status": "done"})
+        time.sleep(0.01)
+
+    assert queue.prune_finished(max_jobs=2, max_age_sec=3600) == ["a"]
+    # 記録は期限切れとして残り、ダウンロードは 410 Gone になる
+    state = queue.get_state("a")
+    assert state["status"] == "done" and state["expired"] and state["expired_reason"] == "retention"
+    assert queue.prune_finished(max_jobs=2, max_age_sec=3600) == []
+    assert queue.expire_queued(max_age_sec=3600, now=time.time() + 7200) == ["waiting"]
+    assert queue.get_state("waiting")["status"] == "error"
+    assert queue.counts() == {"done": 2, "error": 1, "expired": 1}
+
+
+def test_tombstones_are_bounded(tmp_path):
+    queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+    for i in range(6):
+        job_id = f"job{i}"
+        queue.enqueue(job_id, {})
+        queue.claim()
+        queue.save_state(job_id, {"status": "done"})
+        time.sleep(0.01)
+        queue.prune_finished(max_jobs=1, max_age_sec=3600)
+        queue.prune_tombstones(max_rows=2, max_age_sec=3600)
+        # 記録は残すジョブ1件と期限切れの記録2件を超えて増えない
+        assert sum(queue.counts().values()) <= 3
+
+    assert queue.counts() == {"done": 1, "expired": 2}
+    assert queue.get_state("job3")["expired"] and queue.get_state("job2") is None
+    assert queue.prune_tombstones(max_rows=2, max_age_sec=3600, now=time.time() + 7200) == 2
+    assert queue.counts() == {"done": 1}
+
+
+def test_debug_screenshots_are_kept_out_of_the_working_directory(tmp_path, monkeypatch):
+    from scraper import login
+
+    shots = tmp_path / "state" / "screenshots"
+    monkeypatch.setattr(login, "DEBUG_SCREENSHOT_DIR", shots)
+    path = Path(login.debug_screenshot_path("debug_login_error.png"))
+    write(path, 10, age_sec=3 * 86400)
+    write(tmp_path / "debug_keep_me.png", 10, age_sec=3 * 86400)
+
+    assert path.parent == shots
+    assert retention.sweep_screenshots(shots) == 1
+    assert not path.exists() and (tmp_path / "debug_keep_me.png").exists()
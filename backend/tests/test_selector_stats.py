@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper.selector_stats import SelectorRegistry
+
+CANDIDATES = ["a.first", "a.second", "a.third"]
+
+
+def test_recent_winner_is_tried_first(tmp_path):
+    registry = SelectorRegistry(path=tmp_path / "stats.json")
+    assert registry.ordered("next_button", CANDIDATES) == CANDIDATES
+
+    with registry.attempt("next_button", "a.first"):
+        pass
+    with registry.attempt("next_button", "a.third") as attempt:
+        attempt.hit()
+
+    assert registry.ordered("next_button", CANDIDATES) == ["a.third", "a.first", "a.second"]
+
+    registry.record("next_button", "a.second", True, 0.1)
+    assert registry.ordered("next_button", CANDIDATES)[0] == "a.second"
+
+
+def test_statistics_persist_across_restarts(tmp_path):
+    path = tmp_path / "stats.json"
+    registry = SelectorRegistry(path=path)
+    registry.record("caption", "span.caption", False, 3.0)
+    registry.record("caption", "div.caption", True, 0.5)
+    registry.flush()
+
+    reloaded = SelectorRegistry(path=path)
+    snapshot = reloaded.snapshot()["caption"]
+    assert [row["selector"] for row in snapshot] == ["div.caption", "span.caption"]
+    assert snapshot[0]["hit_rate"] == 1.0
+    assert snapshot[1]["misses"] == 1
+    assert snapshot[1]["avg_latency_ms"] == 3000.0
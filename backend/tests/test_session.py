@@ -0,0 +1,104 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import fetch
+from scraper.session import SessionManager, is_login_wall, session_cookie_expiry
+
+
+class FakePage:
+    url = "https://www.instagram.com/accounts/login/?next=/someone/reels/"
+
+
+def write_state(path, expires):
+    cookies = [{"name": "csrftoken", "domain": ".instagram.com", "expires": expires},
+               {"name": "sessionid", "domain": ".instagram.com", "expires": expires}]
+    path.write_text(json.dumps({"cookies": cookies, "origins": []}), encoding="utf-8")
+
+
+def test_session_cookie_expiry(tmp_path):
+    state = tmp_path / "state.json"
+    assert session_cookie_expiry(state) is None
+    write_state(state, 1234.5)
+    assert session_cookie_expiry(state) == 1234.5
+    write_state(state, -1)
+    assert session_cookie_expiry(state) == float("inf")
+    assert is_login_wall(FakePage.url)
+    assert not is_login_wall("https://www.instagram.com/someone/reels/")
+
+
+def test_ensure_verifies_once_until_ttl_or_login_wall(tmp_path, monkeypatch):
+    state = tmp_path / "state.json"
+    write_state(state, time.time() + 30 * 24 * 3600)
+    calls = []
+
+    async def fake_verify(page):
+        calls.append(page)
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    session = SessionManager(state, verify_ttl_sec=60)
+
+    async def run():
+        # 同時に始まったジョブでも確認は1回だけ
+        await asyncio.gather(session.ensure(FakePage()), session.ensure(FakePage()))
+        await session.ensure(FakePage())
+        assert len(calls) == 1
+        await session.recover(FakePage())
+        assert len(calls) == 2
+        session.verified_at -= 61
+        await session.ensure(FakePage())
+        assert len(calls) == 3
+
+    asyncio.run(run())
+    assert session.status()["fresh"]
+    assert session.skipped == 2
+
+
+def test_expiring_cookie_forces_verification(tmp_path, monkeypatch):
+    state = tmp_path / "state.json"
+    write_state(state, time.time() + 60)
+    calls = []
+
+    async def fake_verify(page):
+        calls.append(page)
+
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    session = SessionManager(state, verify_ttl_sec=3600)
+
+    async def run():
+        await session.ensure(FakePage())
+        await session.ensure(FakePage())
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_failed_login_is_not_marked_fresh(tmp_path, monkeypatch):
+    state = tmp_path / "state.json"
+    write_state(state, time.time() + 30 * 24 * 3600)
+    calls = []
+
+    async def fake_verify(page):
+        calls.append(page)
+        if len(calls) == 1:
+            raise Exception("Login did not complete, still at /accounts/login/")
+
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    session = SessionManager(state, verify_ttl_sec=3600)
+
+    async def run():
+        try:
+            await session.ensure(FakePage())
+        except Exception:
+            pass
+        assert not session.is_fresh()
+        # 次のジョブはスキップせずにもう一度確認する
+        await session.ensure(FakePage())
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert session.is_fresh()
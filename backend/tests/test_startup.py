@@ -0,0 +1,18 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ["pyarrow", "playwright", "scraper.fetch", "scraper.worker", "scraper.pool"]
+
+
+def test_api_import_does_not_load_the_scraper(tmp_path):
+    # pyarrow・Playwright・スクレイパー本体はジョブを実行するときに初めて読み込む
+    script = f"import json, sys; import main; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    env = dict(os.environ, PYTHONPATH=str(BACKEND_DIR), SCRAPER_ROLE="all", JOB_DB_PATH=str(tmp_path / "jobs.sqlite3"))
+    out = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,97 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import supervisor
+from scraper.jobqueue import JobQueue
+from scraper.supervisor import Supervisor
+from scraper.worker import WorkerNode
+
+
+class FakeProcess:
+    def __init__(self, pid):
+        self.pid = pid
+        self.exitcode = None
+
+    def is_alive(self):
+        return self.exitcode is None
+
+
+def test_fresh_jobs_go_to_the_least_loaded_process(tmp_path):
+    queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+    busy = WorkerNode(queue, {}, workers=2, node_id="busy", pools={})
+    idle = WorkerNode(queue, {}, workers=2, node_id="idle", pools={})
+    busy.running["job-1"] = ("busy/0", None)
+    busy.report_load()
+    idle.report_load()
+    queue.enqueue("new", {})
+
+    assert idle.has_turn()
+    assert not busy.has_turn()
+    # 待ち時間が猶予を超えたら負荷に関係なく取り出す
+    queue._conn.execute("UPDATE jobs SET created_at = created_at - 60")
+    assert busy.has_turn()
+
+
+def test_crashed_process_is_restarted_and_its_jobs_requeued(monkeypatch, tmp_path):
+    queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+    pids = iter(range(100, 200))
+    sup = Supervisor(queue, processes=2, workers_per_process=1, node_prefix="host", accounts=["alice", "bob"])
+
+    def fake_spawn(child):
+        child.process = FakeProcess(next(pids))
+        child.started_at = time.monotonic()
+        child.restart_at = None
+
+    monkeypatch.setattr(sup, "_spawn", fake_spawn)
+    monkeypatch.setattr(supervisor, "RESTART_BACKOFF_SEC", 0)
+    for child in sup.children:
+        sup._spawn(child)
+    queue.enqueue("job", {})
+    assert queue.claim("host-w1/0")[0] == "job"
+
+    crashed = sup.children[1]
+    crashed.process.exitcode = -9
+    sup.check()
+    assert queue.get_state("job")["status"] == "queued"
+    sup.check()
+    assert crashed.alive and crashed.restarts == 1 and crashed.process.pid == 102
+    assert sup.stats()["host-w0"]["restarts"] == 0
+
+
+def test_accounts_are_split_across_processes(tmp_path):
+    queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+    sup = Supervisor(queue, processes=2, node_prefix="host", accounts=["alice", "bob", "carol"])
+    assert [child.accounts for child in sup.children] == [["alice", "carol"], ["bob"]]
+    # アカウントより多いプロセスは起動しない（予算・隔離・ログインが重複するため）
+    sup = Supervisor(queue, processes=4, node_prefix="host", accounts=["alice"])
+    assert [child.accounts for child in sup.children] == [["alice"]]
+    sup = Supervisor(queue, processes=4, node_prefix="host", accounts=[])
+    assert [child.accounts for child in sup.children] == [None]
+
+
+def test_backoff_resets_after_a_healthy_run(monkeypatch, tmp_path):
+    queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+    sup = Supervisor(queue, processes=1, node_prefix="host", accounts=["alice"])
+    (child,) = sup.children
+
+    def fake_spawn(child):
+        child.process = FakeProcess(1)
+        child.started_at = time.monotonic()
+        child.restart_at = None
+
+    monkeypatch.setattr(sup, "_spawn", fake_spawn)
+    monkeypatch.setattr(supervisor, "RESTART_BACKOFF_SEC", 0)
+    sup._spawn(child)
+    for _ in range(3):
+        child.process.exitcode = 1
+        sup.check()
+        sup.check()
+    assert child.failures == 3
+
+    sup.check()
+    assert child.failures == 3
+    child.started_at -= supervisor.HEALTHY_RUN_SEC
+    sup.check()
+    assert child.failures == 0
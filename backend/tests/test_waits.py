@@ -0,0 +1,73 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import waits
+
+
+class FakePage:
+    def __init__(self, url, navigate_to=None):
+        self.url = url
+        self.navigate_to = navigate_to
+
+    async def wait_for_function(self, expression, arg=None, timeout=None):
+        if self.navigate_to is None:
+            await asyncio.sleep(timeout / 1000)
+            raise TimeoutError("timed out")
+        self.url = self.navigate_to
+
+
+def test_wait_for_url_change_records_saved_time():
+    async def run():
+        stats = waits.start_job_wait_stats()
+        page = FakePage("https://www.instagram.com/reel/A/", navigate_to="https://www.instagram.com/reel/B/")
+        changed = await waits.wait_for_url_change(page, page.url, "next_reel", fixed_sec=1.0)
+        stuck = await waits.wait_for_url_change(FakePage("u"), "u", "next_reel", fixed_sec=1.0, timeout=0.01)
+        return changed, stuck, stats
+
+    changed, stuck, stats = asyncio.run(run())
+    assert changed is True
+    assert stuck is False
+    assert stats["next_reel"]["count"] == 2
+    assert stats["next_reel"]["timeouts"] == 1
+    summary = waits.summarize_wait_stats(stats)
+    assert summary["waits"] == 2
+    # 固定待機(1秒×2)に比べてほぼ2秒削減されている
+    assert summary["saved_sec"] > 1.9
+
+
+def test_next_reel_gives_up_after_bounded_wait_when_url_stays(monkeypatch):
+    from scraper import fetch
+
+    class FakeButton:
+        def __init__(self, page):
+            self.page = page
+
+        async def click(self):
+            self.page.clicks += 1
+
+    class StuckPage(FakePage):
+        def __init__(self):
+            super().__init__("https://www.instagram.com/reel/LAST/")
+            self.clicks = 0
+            self.keys = []
+
+            class Keyboard:
+                async def press(inner, key):
+                    self.keys.append(key)
+
+            self.keyboard = Keyboard()
+
+        async def wait_for_selector(self, selector, timeout=None):
+            return FakeButton(self)
+
+    monkeypatch.setattr(fetch, "WAIT_SEC", 0.01)
+    page = StuckPage()
+    started = time.monotonic()
+    moved = asyncio.run(fetch.navigate_to_next_reel(page))
+    # リストの最後では最初にクリックできたボタンだけを試し、待機は WAIT_SEC * 2 まで
+    assert moved is False
+    assert page.clicks == 1 and page.keys == []
+    assert time.monotonic() - started < 1
@@ -0,0 +1,143 @@
+import asyncio
+import csv
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import fetch
+from scraper.accounts import AccountQuarantinedError
+from scraper.csv_utils import StreamingCsvWriter
+from scraper.watermarks import IncrementalWindow, WatermarkStore, parse_posted_at
+
+
+def reel(shortcode, posted_at):
+    return {"url": f"https://www.instagram.com/reel/{shortcode}/", "posted_at": posted_at}
+
+
+def test_window_skips_pinned_reels_and_stops_at_watermark():
+    window = IncrementalWindow({"shortcode": "OLD", "posted_at": "2024-05-01T00:00:00.000Z"}, pinned=1)
+    # 先頭は古い固定リールなので読み飛ばすだけ
+    assert window.classify(0, reel("PIN", "2023-01-01T00:00:00.000Z")) == "skip"
+    assert window.classify(1, reel("NEW2", "2024-05-03T00:00:00.000Z")) == "new"
+    assert window.classify(2, reel("NEW1", "2024-05-02T00:00:00.000Z")) == "new"
+    assert window.classify(3, reel("OLD", "")) == "stop"
+    assert window.next_watermark() == {"shortcode": "NEW2", "posted_at": "2024-05-03T00:00:00.000Z"}
+
+
+def test_window_does_not_advance_without_reaching_known_content():
+    window = IncrementalWindow({"shortcode": "OLD", "posted_at": "2024-05-01T00:00:00.000Z"}, pinned=0)
+    assert window.classify(0, reel("NEW", "2024-05-03T00:00:00.000Z")) == "new"
+    # max_itemsで止まった場合、前回との間のリールが未取得のため進めない
+    assert window.next_watermark() is None
+
+    since_only = IncrementalWindow(since=parse_posted_at("2024-05-02"), pinned=0)
+    assert since_only.classify(0, reel("A", "2024-05-01T12:00:00.000Z")) == "stop"
+
+
+def test_grid_run_outputs_only_new_reels_and_moves_watermark(monkeypatch, tmp_path):
+    store = WatermarkStore(tmp_path / "watermarks.sqlite3")
+    store.set("user", "alice", "r3", "2024-05-01T00:00:00.000Z")
+    posted = {"r1": "2024-05-03T00:00:00.000Z", "r2": "2024-05-02T00:00:00.000Z", "r3": "2024-05-01T00:00:00.000Z"}
+
+    async def fake_verify(page):
+        pass
+
+    async def fake_discover(page, kind, name, max_items):
+        return [f"https://www.instagram.com/reel/{code}/" for code in ("r1", "r2", "r3", "r4")]
+
+    async def fake_scrape_reel_url(page, url, source, columns, collector=None):
+        code = url.rstrip("/").rsplit("/", 1)[-1]
+        return {"url": url, "title": source, "posted_at": posted[code]}
+
+    async def no_delay():
+        pass
+
+    class FakePage:
+        def on(self, event, handler):
+            pass
+
+        async def close(self):
+            pass
+
+    class FakeContext:
+        async def new_page(self):
+            return FakePage()
+
+    monkeypatch.setattr(fetch, "WATERMARKS", store)
+    monkeypatch.setattr("scraper.watermarks.PINNED_REELS", 0)
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    monkeypatch.setattr(fetch, "discover_target", fake_discover)
+    monkeypatch.setattr(fetch, "scrape_reel_url", fake_scrape_reel_url)
+    monkeypatch.setattr(fetch, "politeness_delay", no_delay)
+
+    progress = {"job": {"progress": 0}}
+    output = StreamingCsvWriter("job", [], tmp_path)
+    asyncio.run(fetch.run_scrape(FakeContext(), "job", ["alice"], [], 10, [], progress, output, concurrency=2, mode="grid", incremental=True))
+
+    with open(output.finalize(), newline="", encoding="utf-8") as f:
+        urls = [row["url"] for row in csv.DictReader(f)]
+    assert urls == ["https://www.instagram.com/reel/r1/", "https://www.instagram.com/reel/r2/"]
+    assert progress["job"]["incremental"]["alice"]["new"] == 2
+    assert store.get("user", "alice")["shortcode"] == "r1"
+    store.close()
+
+
+def test_watermark_waits_for_the_job_output(monkeypatch, tmp_path):
+    store = WatermarkStore(tmp_path / "watermarks.sqlite3")
+    quarantined = True
+
+    async def fake_verify(page):
+        pass
+
+    async def fake_discover(page, kind, name, max_items):
+        return [f"https://www.instagram.com/reel/{name}{i}/" for i in range(2)]
+
+    async def fake_scrape_reel_url(page, url, source, columns, collector=None):
+        if quarantined and source == "bob":
+            raise AccountQuarantinedError("challenge")
+        return {"url": url, "title": source, "posted_at": "2024-05-01T00:00:00.000Z"}
+
+    async def no_delay():
+        pass
+
+    class FakePage:
+        def on(self, event, handler):
+            pass
+
+        async def close(self):
+            pass
+
+    class FakeContext:
+        async def new_page(self):
+            return FakePage()
+
+    class FakePool:
+        @asynccontextmanager
+        async def lease(self):
+            yield FakeContext()
+
+    monkeypatch.setattr(fetch, "WATERMARKS", store)
+    monkeypatch.setattr("scraper.watermarks.PINNED_REELS", 0)
+    monkeypatch.setattr(fetch, "verify_login_status", fake_verify)
+    monkeypatch.setattr(fetch, "discover_target", fake_discover)
+    monkeypatch.setattr(fetch, "scrape_reel_url", fake_scrape_reel_url)
+    monkeypatch.setattr(fetch, "politeness_delay", no_delay)
+    monkeypatch.setattr(fetch, "StreamingCsvWriter", lambda job_id, columns, attempt=None: StreamingCsvWriter(job_id, columns, tmp_path, attempt))
+
+    def run(job_id):
+        progress = {}
+        asyncio.run(fetch.scrape_job(job_id, ["alice", "bob"], [], 2, [], progress, pool=FakePool(), mode="grid", incremental=True))
+        return progress[job_id]
+
+    # alice を終えた後に隔離されたジョブは出力を破棄するので、ウォーターマークも動かさない
+    with pytest.raises(AccountQuarantinedError):
+        run("first")
+    assert store.get("user", "alice") is None
+
+    quarantined = False
+    assert run("retry")["rows"] == 4
+    assert store.get("user", "alice")["shortcode"] == "alice0"
+    store.close()
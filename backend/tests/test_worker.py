@@ -0,0 +1,133 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from scraper import csv_utils, worker
+from scraper.csv_utils import StreamingCsvWriter
+from scraper.jobqueue import JobQueue
+from scraper.worker import WorkerNode
+
+
+def test_worker_drops_job_after_losing_its_lease(monkeypatch, tmp_path):
+    async def fake_scrape_job(job_id, progress, pool=None, account=None, **params):
+        progress[job_id] = {"progress": 50, "status": "running"}
+        await asyncio.sleep(params["sleep"])
+        progress[job_id].update({"progress": 100, "status": "done", "path": f"{job_id}.csv"})
+
+    monkeypatch.setattr(worker, "scrape_job", fake_scrape_job)
+    monkeypatch.setattr(worker.ACCOUNT_POOL, "accounts", [])
+
+    async def scenario():
+        queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+        node = WorkerNode(queue, {}, workers=1, node_id="node-a", pools={"": None})
+        queue.enqueue("slow", {"sleep": 5})
+        queue.enqueue("fast", {"sleep": 0})
+        runner = asyncio.create_task(node.run_worker(0))
+        while "slow" not in node.running:
+            await asyncio.sleep(0.01)
+
+        node.heartbeat()
+        assert queue.get_state("slow")["progress"] == 50
+        # 別のノードがリース切れとして再割り当てした
+        queue.reap_expired(now=float("inf"))
+        assert queue.claim("node-b/0")[0] == "slow"
+        node.heartbeat()
+
+        while queue.get_state("fast")["status"] != "done":
+            await asyncio.sleep(0.01)
+        runner.cancel()
+        state = queue.get_state("slow")
+        assert state["status"] == "running" and "path" not in state
+        assert list(queue.leases()) == ["node-b/0"]
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+
+
+def test_stalled_worker_does_not_touch_the_new_owners_output(monkeypatch, tmp_path):
+    release = asyncio.Event()
+
+    async def fake_scrape_job(job_id, progress, pool=None, account=None, attempt=None, **params):
+        output = StreamingCsvWriter(job_id, [], tmp_path, attempt)
+        output.write_row(0, 0, {"url": "stale"})
+        progress[job_id] = {"progress": 50, "status": "running", "attempt": attempt}
+        await release.wait()
+        progress[job_id].update({"progress": 100, "status": "done", "path": str(output.finalize())})
+
+    monkeypatch.setattr(worker, "scrape_job", fake_scrape_job)
+    monkeypatch.setattr(worker, "remove_attempt_output", lambda job_id, attempt: csv_utils.remove_attempt_output(job_id, attempt, tmp_path))
+    monkeypatch.setattr(worker.ACCOUNT_POOL, "accounts", [])
+
+    async def scenario():
+        queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+        node = WorkerNode(queue, {}, workers=1, node_id="node-a", pools={"": None})
+        queue.enqueue("job", {})
+        runner = asyncio.create_task(node.run_worker(0))
+        while "job" not in node.running:
+            await asyncio.sleep(0.01)
+
+        # ハートビートが止まっている間に別のノードが再割り当てし、自分の途中結果を書き始めた
+        queue.reap_expired(now=float("inf"))
+        assert queue.claim("node-b/0")[0] == "job"
+        owner = StreamingCsvWriter("job", [], tmp_path, "owner")
+        owner.write_row(0, 0, {"url": "fresh"})
+        owner.close()
+
+        # 止まっていたワーカーがリースを失ったことに気づかないまま完了する
+        release.set()
+        while "job" in node.running:
+            await asyncio.sleep(0.01)
+        runner.cancel()
+        return queue.get_state("job")
+
+    state = asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    assert "path" not in state
+    # 古い実行のファイルは消え、新しい実行のパートファイルは残っている
+    assert sorted(p.name for p in tmp_path.iterdir() if p.name.startswith("job.")) == ["job.owner.parts"]
+
+
+class SlowAccountPool:
+    """Every account busy: ``acquire`` takes longer than a job lease."""
+
+    def __init__(self, wait_sec):
+        self.accounts = [type("Account", (), {"username": "alice"})()]
+        self.wait_sec = wait_sec
+        self.released = 0
+
+    def available(self):
+        return True
+
+    async def acquire(self):
+        await asyncio.sleep(self.wait_sec)
+        return self.accounts[0]
+
+    def release(self, account):
+        self.released += 1
+
+
+def test_job_keeps_its_lease_while_waiting_for_an_account(monkeypatch, tmp_path):
+    async def fake_scrape_job(job_id, progress, pool=None, account=None, **params):
+        progress[job_id] = {"progress": 100, "status": "done", "path": f"{job_id}.csv", "account": account.username}
+
+    accounts = SlowAccountPool(wait_sec=0.5)
+    monkeypatch.setattr(worker, "scrape_job", fake_scrape_job)
+    monkeypatch.setattr(worker, "ACCOUNT_POOL", accounts)
+    monkeypatch.setattr(worker, "JOB_LEASE_SEC", 0.1)
+
+    async def scenario():
+        queue = JobQueue(path=tmp_path / "jobs.sqlite3")
+        node = WorkerNode(queue, {}, workers=1, node_id="node-a", pools={"alice": None})
+        queue.enqueue("job", {})
+        runner = asyncio.create_task(node.run_worker(0))
+        while "job" not in node.running:
+            await asyncio.sleep(0.01)
+        while queue.get_state("job")["status"] != "done":
+            # アカウントを待つ間もリースが延長され、別のノードに再割り当てされない
+            node.heartbeat()
+            assert queue.claim("node-b/0", lease_sec=0.1) is None
+            await asyncio.sleep(0.03)
+        runner.cancel()
+        return queue.get_state("job")
+
+    state = asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    assert state["account"] == "alice" and accounts.released == 1
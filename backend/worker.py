@@ -0,0 +1,23 @@
+"""Run scrape workers without the API.
+
+Workers claim jobs from the shared queue (JOB_DB_PATH) and write results to
+OUTPUT_DIR; start the API with SCRAPER_ROLE=api to only accept jobs and serve
+progress and downloads. The queue is a SQLite database in WAL mode, so the
+API and all workers must run on the same machine (not over NFS or another
+network filesystem).
+
+    SCRAPER_ROLE=api python run.py
+    NODE_ID=worker-1 python worker.py
+"""
+
+import asyncio
+
+from loguru import logger
+
+from scraper.worker import serve
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        logger.info("Worker stopped")
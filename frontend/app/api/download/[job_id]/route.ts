@@ -4,12 +4,17 @@ export async function GET(
   req: NextRequest,
   { params }: { params: { job_id: string } }
 ) {
-  const res = await fetch(`http://127.0.0.1:8000/download/${params.job_id}`);
-  const blob = await res.blob();
-  return new Response(blob, {
+  const res = await fetch(
+    `http://127.0.0.1:8000/download/${params.job_id}${req.nextUrl.search}`
+  );
+  // 形式（csv / csv.gz / jsonl / parquet）に応じたヘッダーをそのまま返す
+  return new Response(res.body, {
+    status: res.status,
     headers: {
-      "Content-Type": "text/csv",
-      "Content-Disposition": `attachment; filename=instagram_reels_${params.job_id}.csv`,
+      "Content-Type": res.headers.get("Content-Type") ?? "text/csv",
+      "Content-Disposition":
+        res.headers.get("Content-Disposition") ??
+        `attachment; filename=instagram_reels_${params.job_id}.csv`,
     },
   });
 }
@@ -0,0 +1,22 @@
+import { NextRequest } from "next/server";
+
+export const dynamic = "force-dynamic";
+
+export async function GET(
+  req: NextRequest,
+  { params }: { params: { job_id: string } }
+) {
+  const res = await fetch(`http://127.0.0.1:8000/progress/${params.job_id}/events`, {
+    cache: "no-store",
+    signal: req.signal,
+  });
+  // バックエンドのSSEストリームをそのまま中継する
+  return new Response(res.body, {
+    status: res.status,
+    headers: {
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache",
+      Connection: "keep-alive",
+    },
+  });
+}
@@ -7,6 +7,7 @@ export async function POST(req: NextRequest) {
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(data),
   });
-  const json = await res.json();
-  return NextResponse.json(json);
+  // JSON 以外のエラー応答（500 など）もステータスを保ったまま返す
+  const json = await res.json().catch(() => ({ detail: res.statusText }));
+  return NextResponse.json(json, { status: res.status });
 }
@@ -12,6 +12,9 @@ export default function ResultPage() {
   const [status, setStatus] = useState('running')
   const [error, setError] = useState('')
   const [debugInfo, setDebugInfo] = useState('')
+  const [rows, setRows] = useState(0)
+  const [eta, setEta] = useState<number | null>(null)
+  const [lastEvent, setLastEvent] = useState('')
 
   useEffect(() => {
     if (!jobId) {
@@ -21,27 +24,71 @@ export default function ResultPage() {
 
     setDebugInfo(`Job ID: ${jobId}`)
 
-    const interval = setInterval(async () => {
-      try {
-        const data = await checkProgress(jobId)
-        if (data) {
-          setProgress(data.progress || 0)
-          setStatus(data.status || 'unknown')
-          setDebugInfo(`Job ID: ${jobId}, Progress: ${data.progress}%, Status: ${data.status}`)
-          if (data.status === 'done') {
-            clearInterval(interval)
-          }
-        } else {
-          setError('プログレス情報を取得できませんでした')
-          setDebugInfo(`Job ID: ${jobId} - データなし`)
+    let interval: ReturnType<typeof setInterval> | undefined
+    let finished = false
+
+    const applyState = (data: any) => {
+      if (data.progress !== undefined) setProgress(data.progress || 0)
+      if (data.rows !== undefined) setRows(data.rows || 0)
+      if (data.eta_sec !== undefined) setEta(data.eta_sec)
+      if (data.status) {
+        setStatus(data.status)
+        setDebugInfo(`Job ID: ${jobId}, Progress: ${data.progress}%, Status: ${data.status}`)
+        if (data.status === 'done' || data.status === 'error') {
+          finished = true
         }
-      } catch (err) {
-        setError(`エラー: ${err}`)
-        clearInterval(interval)
       }
-    }, 1000)
+    }
+
+    // SSEが使えない場合は従来のポーリングに切り替える
+    const startPolling = () => {
+      interval = setInterval(async () => {
+        try {
+          const data = await checkProgress(jobId)
+          if (data) {
+            applyState(data)
+            if (finished) {
+              clearInterval(interval)
+            }
+          } else {
+            setError('プログレス情報を取得できませんでした')
+            setDebugInfo(`Job ID: ${jobId} - データなし`)
+          }
+        } catch (err) {
+          setError(`エラー: ${err}`)
+          clearInterval(interval)
+        }
+      }, 1000)
+    }
 
-    return () => clearInterval(interval)
+    const source = new EventSource(`/api/progress/${jobId}/events`)
+    source.addEventListener('status', (e) => {
+      applyState(JSON.parse((e as MessageEvent).data))
+      if (finished) source.close()
+    })
+    source.addEventListener('reel', (e) => {
+      const data = JSON.parse((e as MessageEvent).data)
+      applyState(data)
+      setLastEvent(`${data.target}: ${data.url}`)
+    })
+    source.addEventListener('target_done', (e) => {
+      const data = JSON.parse((e as MessageEvent).data)
+      applyState(data)
+      setLastEvent(`${data.target} 完了`)
+    })
+    source.addEventListener('scrape_error', (e) => {
+      const data = JSON.parse((e as MessageEvent).data)
+      setLastEvent(`${data.target} エラー: ${data.message}`)
+    })
+    source.onerror = () => {
+      source.close()
+      if (!finished && !interval) startPolling()
+    }
+
+    return () => {
+      source.close()
+      if (interval) clearInterval(interval)
+    }
   }, [jobId])
 
   return (
@@ -68,6 +115,10 @@ export default function ResultPage() {
               <div className="text-lg">進捗: {progress}%</div>
               <ProgressBar progress={progress} />
               <div className="text-gray-600">ステータス: {status}</div>
+              <div className="text-gray-600">
+                取得済み: {rows}件{eta !== null && status === 'running' ? ` / 残り約${Math.ceil(eta)}秒` : ''}
+              </div>
+              {lastEvent && <div className="text-sm text-gray-500">{lastEvent}</div>}
             </>
           )}
         </>
@@ -1,13 +1,21 @@
 'use client'
 
 import { saveAs } from 'file-saver'
-import { useEffect } from 'react'
+import { useEffect, useState } from 'react'
 import { downloadResult } from '../services/api'
 
 export default function DownloadCard({ jobId }: { jobId: string }) {
+  const [error, setError] = useState<string | null>(null)
+
   const handleDownload = async () => {
-    const blob = await downloadResult(jobId)
-    saveAs(blob, `instagram_reels_${jobId}.csv`)
+    try {
+      const { blob, filename } = await downloadResult(jobId)
+      setError(null)
+      saveAs(blob, filename)
+    } catch (e) {
+      // 410（結果の期限切れ）などはメッセージをそのまま表示する
+      setError(e instanceof Error ? e.message : 'Download failed')
+    }
   }
 
   useEffect(() => {
@@ -17,8 +25,9 @@ export default function DownloadCard({ jobId }: { jobId: string }) {
   return (
     <div className="p-4 border">
       <button className="px-4 py-2 bg-green-500 text-white" onClick={handleDownload}>
-        Download CSV
+        Download
       </button>
+      {error && <p className="mt-2 text-red-600">{error}</p>}
     </div>
   )
 }
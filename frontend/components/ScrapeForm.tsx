@@ -7,18 +7,31 @@ export default function ScrapeForm() {
   const [usernames, setUsernames] = useState('')
   const [hashtags, setHashtags] = useState('')
   const [maxItems, setMaxItems] = useState(10)
+  const [concurrency, setConcurrency] = useState(1)
   const [columns, setColumns] = useState<string[]>([])
+  const [incremental, setIncremental] = useState(false)
+  const [since, setSince] = useState('')
+  const [format, setFormat] = useState('csv')
+  const [error, setError] = useState<string | null>(null)
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault()
-    const res = await startScrape({
-      usernames: usernames.split('\n').filter(Boolean),
-      hashtags: hashtags.split(',').map(h => h.trim()).filter(Boolean),
-      max_items: maxItems,
-      columns,
-    })
-    if (res?.job_id) {
+    setError(null)
+    try {
+      const res = await startScrape({
+        usernames: usernames.split('\n').filter(Boolean),
+        hashtags: hashtags.split(',').map(h => h.trim()).filter(Boolean),
+        max_items: maxItems,
+        concurrency,
+        columns,
+        incremental,
+        since: since || null,
+        format,
+      })
       window.location.href = `/result?job_id=${res.job_id}`
+    } catch (err) {
+      // ジョブが作られなかったときは結果ページに移動せず、理由をフォームに表示する
+      setError(err instanceof Error ? err.message : 'Failed to start the job')
     }
   }
 
@@ -50,6 +63,14 @@ export default function ScrapeForm() {
         value={maxItems}
         onChange={e => setMaxItems(Number(e.target.value))}
       />
+      <input
+        type="number"
+        min={1}
+        className="w-full border p-2"
+        placeholder="同時にスクレイピングするアカウント・ハッシュタグ数 (例: 1)"
+        value={concurrency}
+        onChange={e => setConcurrency(Number(e.target.value))}
+      />
       <div>
         {['likes', 'comments', 'video_view_count'].map(col => (
           <label key={col} className="mr-4">
@@ -62,6 +83,39 @@ export default function ScrapeForm() {
           </label>
         ))}
       </div>
+      <div className="space-x-4">
+        <label>
+          <input
+            type="checkbox"
+            checked={incremental}
+            onChange={e => setIncremental(e.target.checked)}
+          />{' '}
+          前回以降の新しいリールのみ取得
+        </label>
+        <label>
+          この日以降の投稿のみ:{' '}
+          <input
+            type="date"
+            className="border p-1"
+            value={since}
+            onChange={e => setSince(e.target.value)}
+          />
+        </label>
+        <label>
+          出力形式:{' '}
+          <select
+            className="border p-1"
+            value={format}
+            onChange={e => setFormat(e.target.value)}
+          >
+            <option value="csv">CSV</option>
+            <option value="csv.gz">CSV (gzip)</option>
+            <option value="jsonl">JSON Lines</option>
+            <option value="parquet">Parquet</option>
+          </select>
+        </label>
+      </div>
+      {error && <p className="text-red-600">{error}</p>}
       <button className="px-4 py-2 bg-blue-500 text-white" type="submit">
         Start Scraping
       </button>
@@ -4,18 +4,35 @@ export async function startScrape(data: any) {
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
   })
-  if (!res.ok) return null
+  // 400（パラメータの誤り）・429・503 などはバックエンドの detail をそのまま伝える
+  if (!res.ok) throw new Error(await errorDetail(res, 'Failed to start the job'))
   return res.json()
 }
 
+async function errorDetail(res: Response, fallback: string) {
+  const body = await res.json().catch(() => null)
+  const detail = body?.detail
+  if (typeof detail === 'string') return detail
+  // 422: FastAPI の検証エラーは { msg } の配列で返る
+  if (Array.isArray(detail)) return detail.map((d: any) => d?.msg ?? String(d)).join(', ')
+  return `${fallback} (${res.status})`
+}
+
 export async function checkProgress(jobId: string) {
   const res = await fetch(`/api/progress/${jobId}`)
   if (!res.ok) return null
   return res.json()
 }
 
-export async function downloadResult(jobId: string) {
-  const res = await fetch(`/api/download/${jobId}`)
+export async function downloadResult(jobId: string, format?: string) {
+  const query = format ? `?format=${encodeURIComponent(format)}` : ''
+  const res = await fetch(`/api/download/${jobId}${query}`)
+  // 410: 保持期間・容量の上限を超えて結果が削除された
+  if (res.status === 410) {
+    throw new Error(`This result has expired, please run the job again. ${await errorDetail(res, 'Result expired')}.`)
+  }
   if (!res.ok) throw new Error('Download failed')
-  return res.blob()
+  const disposition = res.headers.get('Content-Disposition') ?? ''
+  const filename = disposition.match(/filename="?([^";]+)"?/)?.[1] ?? `instagram_reels_${jobId}.csv`
+  return { blob: await res.blob(), filename }
 }
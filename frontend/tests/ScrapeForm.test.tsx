@@ -1,7 +1,18 @@
-import { render } from '@testing-library/react'
+import { fireEvent, render } from '@testing-library/react'
 import ScrapeForm from '../components/ScrapeForm'
 
 test('renders form', () => {
   const { getByText } = render(<ScrapeForm />)
   expect(getByText('Start Scraping')).toBeInTheDocument()
 })
+
+test('shows the error detail instead of leaving the form', async () => {
+  global.fetch = jest.fn().mockResolvedValue({
+    ok: false,
+    status: 400,
+    json: () => Promise.resolve({ detail: 'concurrency must be at least 1' }),
+  }) as any
+  const { getByText, findByText } = render(<ScrapeForm />)
+  fireEvent.click(getByText('Start Scraping'))
+  expect(await findByText('concurrency must be at least 1')).toBeInTheDocument()
+})